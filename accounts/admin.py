@@ -9,7 +9,7 @@ from django.utils.html import format_html
 from django.contrib.admin.widgets import FilteredSelectMultiple
 from .models import (
     User, CompanyInfo, Branch, Notification, Department, Salesperson,
-    Role, UserRole, SystemSettings
+    Role, UserRole, SystemSettings, Sequence
 )
 
 class DepartmentFilter(admin.SimpleListFilter):
@@ -399,3 +399,14 @@ class SystemSettingsAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # السماح للموظفين بحذف إعدادات النظام
         return request.user.is_staff
+
+
+@admin.register(Sequence)
+class SequenceAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'last_value', 'updated_at')
+    search_fields = ('scope',)
+    readonly_fields = ('scope', 'updated_at')
+
+    def has_add_permission(self, request):
+        # العدادات تُنشأ تلقائياً عند أول رقم في النطاق
+        return False
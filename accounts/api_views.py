@@ -37,7 +37,7 @@ def user_info(request):
     user_data = UserSerializer(user).data
     
     # إضافة معلومات إضافية
-    user_data['unread_notifications_count'] = getattr(user, 'notifications', []).filter(is_read=False).count()
+    user_data['unread_notifications_count'] = user.unread_notifications_count
     
     # إضافة الصلاحيات والمجموعات
     permissions = list(user.get_all_permissions())
@@ -307,5 +307,8 @@ def dashboard_trends(request):
     Return trends data for charts
     """
     days = int(request.GET.get('days', 30))
-    data = DashboardService.get_trends_data(days=days)
+    period = request.GET.get('period', 'day')
+    if period not in ('day', 'week', 'month'):
+        return JsonResponse({'error': 'period must be day, week or month'}, status=400)
+    data = DashboardService.get_trends_data(days=days, period=period)
     return JsonResponse(data)
\ No newline at end of file
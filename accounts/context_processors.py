@@ -1,103 +1,75 @@
-from .models import Department, CompanyInfo, SystemSettings
+from .models import SystemSettings
 from .utils import get_user_notifications
 from django.utils import timezone
-from accounts.models import FooterSettings
+from django.utils.functional import SimpleLazyObject
 from django.core.cache import cache
 
+from accounts.services.template_context import (
+    SYSTEM_SETTINGS_CACHE_KEY,
+    get_company_info,
+    get_department_tree,
+    get_footer_settings,
+    request_cached,
+)
+
+
+def _lazy(request, key, func):
+    """
+    قيمة كسولة لا تُحسب إلا إذا استخدمها القالب، وتُحسب مرة واحدة في الطلب
+    """
+    return SimpleLazyObject(lambda: request_cached(request, key, func))
+
 def departments(request):
     """
     Context processor to add departments to all templates in a hierarchical structure
+    The department tree is cached across requests and only evaluated if a template uses it
     """
-    # Get all active departments
-    all_departments = Department.objects.filter(is_active=True).order_by('order')
-
-    # Create hierarchical structure for parent/child departments
-    parent_departments = all_departments.filter(parent__isnull=True)
-
-    # Get user-accessible departments
-    user_departments = []
-    user_parent_departments = []
-
-    if request.user.is_authenticated:
-        if request.user.is_superuser:
-            user_departments = all_departments
-            user_parent_departments = parent_departments
-        else:
-            user_departments = request.user.departments.filter(is_active=True).order_by('order')
-            # Get unique parent departments
-            user_parent_ids = set()
-            for dept in user_departments:
-                if dept.parent:
-                    user_parent_ids.add(dept.parent.id)
-                else:
-                    user_parent_ids.add(dept.id)
-
-            user_parent_departments = Department.objects.filter(id__in=user_parent_ids, is_active=True).order_by('order')
+    def tree():
+        return request_cached(request, 'department_tree', lambda: get_department_tree(request.user))
 
     return {
-        'all_departments': all_departments,
-        'parent_departments': parent_departments,
-        'user_departments': user_departments,
-        'user_parent_departments': user_parent_departments,
+        'all_departments': _lazy(request, 'all_departments', lambda: tree()[0]),
+        'parent_departments': _lazy(request, 'parent_departments', lambda: tree()[1]),
+        'user_departments': _lazy(request, 'user_departments', lambda: tree()[2]),
+        'user_parent_departments': _lazy(request, 'user_parent_departments', lambda: tree()[3]),
     }
 
 def notifications(request):
     """
     Context processor to add notifications to all templates
     """
-    unread_notifications = []
-    recent_notifications = []
-    notifications_count = 0
+    user = request.user
 
-    if request.user.is_authenticated:
-        # Get unread notifications for the user
-        unread_notifications = get_user_notifications(request.user, unread_only=True, limit=5)
-        notifications_count = unread_notifications.count()
+    def unread():
+        if not user.is_authenticated:
+            return []
+        return list(get_user_notifications(user, unread_only=True, limit=5))
 
-        # Get recent notifications (both read and unread)
-        recent_notifications = get_user_notifications(request.user, unread_only=False, limit=5)
+    def recent():
+        if not user.is_authenticated:
+            return []
+        return list(get_user_notifications(user, unread_only=False, limit=5))
+
+    def count():
+        if not user.is_authenticated:
+            return 0
+        # العداد محفوظ على المستخدم نفسه فلا يحتاج إلى استعلام
+        return user.unread_notifications_count
 
     return {
-        'unread_notifications': unread_notifications,
-        'recent_notifications': recent_notifications,
-        'notifications_count': notifications_count,
+        'unread_notifications': _lazy(request, 'unread_notifications', unread),
+        'recent_notifications': _lazy(request, 'recent_notifications', recent),
+        'notifications_count': _lazy(request, 'notifications_count', count),
     }
 
 def company_info(request):
-    """توفير معلومات الشركة لجميع القوالب"""
-    try:
-        company = CompanyInfo.objects.first()
-        if not company:
-            # إنشاء كائن بقيم افتراضية إذا لم يكن موجوداً
-            company = CompanyInfo(
-                name="نظام الخواجه",
-                address="",
-                phone="",
-                email="",
-            )
-            # نحن لا نحفظ الكائن في قاعدة البيانات، لكن نستخدمه فقط لتجنب الأخطاء
-    except Exception:
-        # في حالة حدوث أي خطأ، إنشاء كائن بقيم افتراضية
-        company = CompanyInfo(
-            name="نظام الخواجه",
-            address="",
-            phone="",
-            email="",
-        )
-    return {'company_info': company}
+    """توفير معلومات الشركة لجميع القوالب (مخزنة مؤقتاً بين الطلبات)"""
+    return {'company_info': _lazy(request, 'company_info', get_company_info)}
 
 def footer_settings(request):
-    """توفير إعدادات التذييل لجميع القوالب"""
-    try:
-        footer_settings = FooterSettings.objects.first()
-        if not footer_settings:
-            footer_settings = FooterSettings.objects.create()
-    except Exception:
-        # في حالة حدوث أي خطأ، إنشاء كائن بقيم افتراضية
-        footer_settings = FooterSettings()
-
+    """توفير إعدادات التذييل لجميع القوالب (مخزنة مؤقتاً بين الطلبات)"""
     return {
-        'footer_settings': footer_settings,
+        'footer_settings': _lazy(request, 'footer_settings', get_footer_settings),
         'current_year': timezone.now().year
     }
 
@@ -106,14 +78,14 @@ def system_settings(request):
     توفير إعدادات النظام لجميع القوالب
     """
     # محاولة الحصول على الإعدادات من الذاكرة المؤقتة
-    settings = cache.get('system_settings')
+    settings = cache.get(SYSTEM_SETTINGS_CACHE_KEY)
 
     if not settings:
         try:
             # الحصول على الإعدادات أو إنشاؤها إذا لم تكن موجودة
             settings, created = SystemSettings.objects.get_or_create(pk=1)
             # تخزين في الذاكرة المؤقتة لمدة ساعة
-            cache.set('system_settings', settings, 3600)
+            cache.set(SYSTEM_SETTINGS_CACHE_KEY, settings, 3600)
         except Exception:
             # إرجاع قيم افتراضية في حالة حدوث خطأ
             return {
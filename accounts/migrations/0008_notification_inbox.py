@@ -0,0 +1,82 @@
+# Generated by Django 4.2.21 on 2025-06-08 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_notification_inbox(apps, schema_editor):
+    """توزيع الإشعارات الموجودة على صناديق مستلميها وحساب عدادات غير المقروء"""
+    from django.db.models import Count, Q
+
+    Notification = apps.get_model('accounts', 'Notification')
+    NotificationRecipient = apps.get_model('accounts', 'NotificationRecipient')
+    User = apps.get_model('accounts', 'User')
+
+    superusers = list(User.objects.filter(is_superuser=True, is_active=True).values_list('pk', flat=True))
+    for notification in Notification.objects.select_related('target_department').iterator():
+        condition = Q(pk__in=[])
+        if notification.target_department_id and notification.target_department.is_active:
+            condition |= Q(departments=notification.target_department_id)
+        if notification.target_branch_id:
+            condition |= Q(branch_id=notification.target_branch_id)
+        condition |= Q(received_notifications=notification.pk)
+        user_ids = set(superusers)
+        user_ids.update(User.objects.filter(condition, is_active=True).values_list('pk', flat=True))
+        # حالة القراءة العامة السابقة تُنقل لكل المستلمين
+        read_at = (notification.read_at or notification.updated_at) if notification.is_read else None
+        NotificationRecipient.objects.bulk_create(
+            [
+                NotificationRecipient(
+                    notification_id=notification.pk,
+                    user_id=user_id,
+                    created_at=notification.created_at,
+                    read_at=read_at,
+                )
+                for user_id in user_ids
+            ],
+            batch_size=1000,
+        )
+
+    unread = (
+        NotificationRecipient.objects.filter(read_at__isnull=True)
+        .order_by().values('user_id').annotate(total=Count('id'))
+    )
+    for row in unread:
+        User.objects.filter(pk=row['user_id']).update(unread_notifications_count=row['total'])
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_remove_branch_branch_is_active_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='إشعارات غير مقروءة'),
+        ),
+        migrations.CreateModel(
+            name='NotificationRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='accounts.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'مستلم إشعار',
+                'verbose_name_plural': 'مستلمو الإشعارات',
+                'indexes': [models.Index(fields=['user', '-created_at'], name='notif_inbox_user_idx'), models.Index(fields=['user', 'read_at'], name='notif_inbox_unread_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationrecipient',
+            constraint=models.UniqueConstraint(fields=('notification', 'user'), name='notification_recipient_unique'),
+        ),
+        migrations.RunPython(populate_notification_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.21 on 2025-06-09 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_notification_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100, unique=True, verbose_name='النطاق')),
+                ('last_value', models.BigIntegerField(default=0, verbose_name='آخر قيمة')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'عداد أرقام',
+                'verbose_name_plural': 'عدادات الأرقام',
+                'ordering': ['scope'],
+            },
+        ),
+    ]
@@ -14,6 +14,8 @@ class User(AbstractUser):
     branch = models.ForeignKey('Branch', on_delete=models.SET_NULL, null=True, blank=True, related_name='users', verbose_name=_('الفرع'))
     departments = models.ManyToManyField('Department', blank=True, related_name='users', verbose_name=_('الأقسام'))
     is_inspection_technician = models.BooleanField(default=False, verbose_name=_('فني معاينة'))
+    # عداد الإشعارات غير المقروءة (يُحدّث ذرياً عند التوزيع والقراءة ويُقرأ مع المستخدم دون استعلام إضافي)
+    unread_notifications_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('إشعارات غير مقروءة'))
 
     class Meta:
         verbose_name = _('مستخدم')
@@ -157,11 +159,16 @@ class Notification(models.Model):
     def mark_as_read(self, user):
         """
         Mark notification as read by a specific user
+        حالة القراءة لكل مستخدم في صندوقه؛ الحقول العامة تسجل أول من قرأ الإشعار فقط
         """
-        self.is_read = True
-        self.read_at = timezone.now()
-        self.read_by = user
-        self.save()
+        from accounts.services.notification_inbox import mark_read
+
+        mark_read(user, [self.pk])
+        if not self.is_read:
+            self.is_read = True
+            self.read_at = timezone.now()
+            self.read_by = user
+            self.save(update_fields=['is_read', 'read_at', 'read_by', 'updated_at'])
 
     def __str__(self):
         return self.title
@@ -171,6 +178,34 @@ class Notification(models.Model):
         verbose_name_plural = 'الإشعارات'
         ordering = ['-created_at']
 
+class NotificationRecipient(models.Model):
+    """
+    صندوق إشعارات المستخدم: صف لكل (إشعار، مستلم) يُنشأ عند إرسال الإشعار مع حالة قراءة خاصة به
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='recipients')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_inbox')
+    # نسخة من تاريخ الإشعار لترتيب الصندوق من الفهرس دون الربط بجدول الإشعارات
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_read(self):
+        return self.read_at is not None
+
+    def __str__(self):
+        return f"{self.user} - {self.notification}"
+
+    class Meta:
+        verbose_name = 'مستلم إشعار'
+        verbose_name_plural = 'مستلمو الإشعارات'
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'user'], name='notification_recipient_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notif_inbox_user_idx'),
+            models.Index(fields=['user', 'read_at'], name='notif_inbox_unread_idx'),
+        ]
+
 class CompanyInfo(models.Model):
     # حقول مخصصة للنظام - لا يمكن تغييرها إلا من المبرمج
     version = models.CharField(max_length=50, blank=True, default='1.0.0', verbose_name='إصدار النظام', editable=False)
@@ -527,3 +562,21 @@ class SystemSettings(models.Model):
         """الحصول على إعدادات النظام (إنشاء إذا لم تكن موجودة)"""
         settings, created = cls.objects.get_or_create(pk=1)
         return settings
+
+
+class Sequence(models.Model):
+    """
+    عداد أرقام لكل نطاق (مثل أكواد عملاء فرع أو أرقام طلبات عميل)
+    يُحجز الرقم التالي بتحديث صف النطاق مع قفله، فلا تتكرر الأرقام مع الطلبات المتزامنة
+    """
+    scope = models.CharField(_('النطاق'), max_length=100, unique=True)
+    last_value = models.BigIntegerField(_('آخر قيمة'), default=0)
+    updated_at = models.DateTimeField(_('تاريخ التحديث'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('عداد أرقام')
+        verbose_name_plural = _('عدادات الأرقام')
+        ordering = ['scope']
+
+    def __str__(self):
+        return f"{self.scope}: {self.last_value}"
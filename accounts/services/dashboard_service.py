@@ -1,11 +1,13 @@
 from django.db.models import Count, Sum, F, Q
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from django.core.cache import cache
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 
 from customers.models import Customer
 from orders.models import Order
-from inventory.models import Product, StockTransaction
+from inventory.models import StockTransaction
+from inventory.stock_ledger import get_inventory_valuation
 from factory.models import ProductionOrder
 
 class DashboardService:
@@ -40,14 +42,10 @@ class DashboardService:
             orders_last_month_count = orders_last_month.count()
             order_growth = f"{(orders_last_month_count / total_orders * 100):.1f}%" if total_orders > 0 else "0%"
             
-            # إحصائيات المخزون
-            products = Product.objects.all()
-            current_inventory_value = sum(
-                (p.current_stock or 0) * p.price 
-                for p in products
-            )
-            
-            prev_month_value = current_inventory_value  # سيتم تحسينه لاحقاً
+            # إحصائيات المخزون: القيمة الحالية وقيمتها قبل شهر من سجل الحركات
+            valuation = get_inventory_valuation(last_month)
+            current_inventory_value = valuation['current']
+            prev_month_value = valuation['points'][last_month]
             inventory_growth = f"{((current_inventory_value - prev_month_value) / prev_month_value * 100):.1f}%" if prev_month_value > 0 else "0%"
             
             # إحصائيات الإيرادات
@@ -147,46 +145,130 @@ class DashboardService:
         return recent_orders
 
     @staticmethod
-    def get_trends_data(days=30):
+    def get_trends_data(days=30, period='day'):
         """
         الحصول على بيانات الاتجاهات للرسم البياني
+
+        Args:
+            days: عدد الأيام السابقة المشمولة (بالإضافة إلى اليوم الحالي)
+            period: حجم الفترة: 'day' أو 'week' أو 'month'
         """
-        end_date = timezone.now()
+        if period not in TREND_PERIODS:
+            raise ValueError(f'Unsupported trend period: {period}')
+
+        end_date = timezone.localdate()
         start_date = end_date - timedelta(days=days)
-        dates = []
-        customers_data = []
-        orders_data = []
-        revenue_data = []
-        
-        current_date = start_date
-        while current_date <= end_date:
-            next_date = current_date + timedelta(days=1)
-            dates.append(current_date.strftime('%Y-%m-%d'))
-            
-            # عدد العملاء الجدد
-            customers_data.append(
-                Customer.objects.filter(
-                    created_at__date=current_date.date()
-                ).count()
-            )
-            
-            # عدد الطلبات
-            daily_orders = Order.objects.filter(
-                created_at__date=current_date.date()
-            )
-            orders_data.append(daily_orders.count())
-            
-            # الإيرادات
-            daily_revenue = daily_orders.aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
-            revenue_data.append(float(daily_revenue))
-            
-            current_date = next_date
-        
+
+        series = {
+            metric: get_trend_series(metric, start_date, end_date, period)
+            for metric in TREND_METRICS
+        }
+        labels = [bucket.strftime('%Y-%m-%d') for bucket in series['orders']]
+
         return {
-            'labels': dates,
-            'customers': customers_data,
-            'orders': orders_data,
-            'revenue': revenue_data
-        }
\ No newline at end of file
+            'labels': labels,
+            'customers': list(series['customers'].values()),
+            'orders': list(series['orders'].values()),
+            'revenue': [float(value) for value in series['revenue'].values()],
+        }
+
+
+# المقاييس المتاحة: (النموذج، دالة التجميع)
+TREND_METRICS = {
+    'customers': (Customer, Count('id')),
+    'orders': (Order, Count('id')),
+    'revenue': (Order, Sum('total_amount')),
+}
+
+TREND_PERIODS = ('day', 'week', 'month')
+
+# الأيام المنتهية لا تتغير إلا عند تعديل السجلات، ويتم حذف مفاتيحها عبر الإشارات
+TREND_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def trend_cache_key(metric, day):
+    """
+    مفتاح التخزين المؤقت لقيمة مقياس في يوم واحد
+    """
+    return f'dashboard_trend:{metric}:{day.isoformat()}'
+
+
+def invalidate_trend_day(model, created_at):
+    """
+    حذف القيم المخزنة لمقاييس النموذج في اليوم الذي أنشئ فيه السجل
+    """
+    if created_at is None:
+        return
+    day = timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date()
+    metrics = [metric for metric, (metric_model, _) in TREND_METRICS.items() if metric_model is model]
+    cache.delete_many([trend_cache_key(metric, day) for metric in metrics])
+
+
+def _day_start(day):
+    """
+    بداية اليوم المحلي كتاريخ ووقت مع المنطقة الزمنية
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _query_daily_values(metric, first_day, last_day):
+    """
+    تجميع قيم المقياس لكل يوم في الفترة باستعلام واحد
+    """
+    model, aggregate = TREND_METRICS[metric]
+    rows = model.objects.filter(
+        created_at__gte=_day_start(first_day),
+        created_at__lt=_day_start(last_day + timedelta(days=1)),
+    ).annotate(
+        day=TruncDate('created_at')
+    ).order_by().values('day').annotate(value=aggregate).values_list('day', 'value')
+    return {day: value or 0 for day, value in rows}
+
+
+def _bucket_start(day, period):
+    """
+    بداية الفترة التي يقع فيها اليوم (الأسبوع يبدأ يوم الاثنين كما في TruncWeek)
+    """
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_trend_series(metric, start_date, end_date, period='day'):
+    """
+    سلسلة قيم مقياس بين تاريخين مع ملء الفترات الفارغة بالصفر
+
+    تُقرأ الأيام المنتهية من التخزين المؤقت اليومي، ويُحسب الباقي (اليوم الحالي
+    على الأقل) باستعلام واحد مجمّع حسب التاريخ، ثم تُجمع الأيام في أسابيع أو أشهر
+
+    Returns:
+        قاموس مرتب: بداية الفترة -> القيمة
+    """
+    today = timezone.localdate()
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+    closed_keys = {trend_cache_key(metric, day): day for day in days if day < today}
+    cached = cache.get_many(list(closed_keys))
+    daily = {closed_keys[key]: value for key, value in cached.items()}
+
+    missing = [day for day in days if day not in daily]
+    if missing:
+        first_missing = missing[0]
+        computed = _query_daily_values(metric, first_missing, end_date)
+        to_cache = {}
+        for day in days:
+            if day < first_missing or day in daily:
+                continue
+            daily[day] = computed.get(day, 0)
+            if day < today:
+                to_cache[trend_cache_key(metric, day)] = daily[day]
+        if to_cache:
+            cache.set_many(to_cache, TREND_CACHE_TIMEOUT)
+
+    series = {}
+    for day in days:
+        bucket = _bucket_start(day, period)
+        series[bucket] = series.get(bucket, 0) + daily[day]
+    return series
@@ -0,0 +1,124 @@
+"""
+صندوق الإشعارات لكل مستخدم (التوزيع عند الكتابة)
+عند إرسال الإشعار يُحدد مستلموه مرة واحدة ويُنشأ لهم صف في الصندوق دفعة واحدة مع زيادة
+عداد غير المقروء لكل منهم، لذلك عرض القائمة والعداد لا يحتاج إلى حساب الأقسام والفروع
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from accounts.models import Notification, NotificationRecipient, User
+
+BULK_BATCH_SIZE = 1000
+
+
+def resolve_recipients(notification, user_ids=None):
+    """
+    معرفات المستخدمين الذين يستلمون الإشعار: المديرون، أعضاء القسم المستهدف (إذا كان نشطاً)،
+    مستخدمو الفرع المستهدف، والمستخدمون المحددون مباشرة
+
+    Args:
+        user_ids: قصر المستلمين على هؤلاء المستخدمين (للإضافة المباشرة عبر target_users)
+    """
+    if user_ids is not None:
+        return list(User.objects.filter(pk__in=user_ids, is_active=True).values_list('pk', flat=True))
+
+    condition = Q(is_superuser=True)
+    department = notification.target_department
+    if department is not None and department.is_active:
+        condition |= Q(departments=department)
+    if notification.target_branch_id:
+        condition |= Q(branch_id=notification.target_branch_id)
+    if notification.pk:
+        condition |= Q(received_notifications=notification)
+
+    return list(
+        User.objects.filter(condition, is_active=True).values_list('pk', flat=True).distinct()
+    )
+
+
+def deliver(notification, user_ids=None):
+    """
+    إنشاء صفوف الصندوق لمستلمي الإشعار وزيادة عدادات غير المقروء
+
+    Returns:
+        عدد المستلمين الجدد
+    """
+    recipients = set(resolve_recipients(notification, user_ids))
+    if not recipients:
+        return 0
+
+    with transaction.atomic():
+        existing = set(
+            NotificationRecipient.objects.filter(
+                notification=notification, user_id__in=recipients
+            ).values_list('user_id', flat=True)
+        )
+        new_recipients = sorted(recipients - existing)
+        NotificationRecipient.objects.bulk_create(
+            [
+                NotificationRecipient(
+                    notification=notification, user_id=user_id, created_at=notification.created_at
+                )
+                for user_id in new_recipients
+            ],
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        User.objects.filter(pk__in=new_recipients).update(
+            unread_notifications_count=F('unread_notifications_count') + 1
+        )
+    return len(new_recipients)
+
+
+def get_inbox(user, unread_only=False):
+    """
+    إشعارات المستخدم من صندوقه مع حالة قراءته في user_read_at (الأحدث أولاً)
+    """
+    filters = {'recipients__user': user}
+    if unread_only:
+        filters['recipients__read_at__isnull'] = True
+    # شروط الصندوق في استدعاء filter واحد حتى يستخدم الترتيب وحالة القراءة نفس الربط
+    return (
+        Notification.objects.filter(**filters)
+        .annotate(user_read_at=F('recipients__read_at'))
+        .select_related('sender', 'sender_department', 'target_branch')
+        .order_by('-recipients__created_at')
+    )
+
+
+def mark_read(user, notification_ids=None):
+    """
+    تعليم إشعارات المستخدم كمقروءة (كلها إذا لم تُحدد) وإنقاص العداد بعدد ما تغير فعلاً
+
+    Returns:
+        عدد الإشعارات التي أصبحت مقروءة
+    """
+    rows = NotificationRecipient.objects.filter(user=user, read_at__isnull=True)
+    if notification_ids is not None:
+        rows = rows.filter(notification_id__in=notification_ids)
+
+    with transaction.atomic():
+        updated = rows.update(read_at=timezone.now())
+        if updated:
+            User.objects.filter(pk=user.pk).update(
+                unread_notifications_count=Greatest(F('unread_notifications_count') - updated, 0)
+            )
+    if updated and isinstance(user, User):
+        user.unread_notifications_count = max(user.unread_notifications_count - updated, 0)
+    return updated
+
+
+def forget(notification):
+    """
+    إنقاص عدادات من لم يقرأ الإشعار قبل حذفه
+    """
+    user_ids = list(
+        NotificationRecipient.objects.filter(
+            notification=notification, read_at__isnull=True
+        ).values_list('user_id', flat=True)
+    )
+    User.objects.filter(pk__in=user_ids).update(
+        unread_notifications_count=Greatest(F('unread_notifications_count') - 1, 0)
+    )
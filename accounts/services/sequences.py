@@ -0,0 +1,123 @@
+"""
+مولد الأرقام المتسلسلة (أكواد العملاء، أرقام الطلبات، أوامر الشراء وأوامر الإنتاج)
+لكل نطاق صف عداد واحد يُزاد بعبارة UPDATE واحدة (مع RETURNING إذا دعمتها قاعدة البيانات)،
+فيُقفل الصف حتى نهاية المعاملة ولا يحصل طلبان متزامنان على نفس الرقم، وزمن التوليد ثابت
+مهما كبرت الجداول لأنه لا يبحث عن آخر رقم مستخدم
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+from accounts.models import Sequence
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def get_block_size(scope):
+    """
+    عدد الأرقام التي تحجزها العملية دفعة واحدة للنطاق (SEQUENCE_BLOCK_SIZES حسب بادئة النطاق)
+    القيمة 1 (الافتراضية) تعطي أرقاماً متتالية بلا فجوات
+    """
+    block_sizes = getattr(settings, 'SEQUENCE_BLOCK_SIZES', {})
+    return max(int(block_sizes.get(scope.split(':', 1)[0], 1)), 1)
+
+
+def parse_sequence(value, separator='-'):
+    """
+    الجزء الرقمي الأخير من رقم مثل '001-0012'، أو None إذا لم يكن رقماً
+    """
+    tail = str(value or '').rsplit(separator, 1)[-1]
+    return int(tail) if tail.isdigit() else None
+
+
+def highest_sequence(values, separator='-'):
+    """
+    أكبر جزء رقمي بين الأرقام الموجودة (لبدء عداد نطاق جديد بعد البيانات القديمة)
+    """
+    numbers = [parse_sequence(value, separator) for value in values]
+    return max([number for number in numbers if number is not None], default=0)
+
+
+def _increment(scope, count, using):
+    """
+    زيادة عداد النطاق وإرجاع القيمة الجديدة، أو None إذا لم يكن للنطاق عداد بعد
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(Sequence._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+            cursor.execute(
+                f'UPDATE {table} SET last_value = last_value + %s WHERE scope = %s RETURNING last_value',
+                [count, scope],
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    with transaction.atomic(using=using):
+        updated = Sequence.objects.using(using).filter(scope=scope).select_for_update().values_list(
+            'last_value', flat=True
+        ).first()
+        if updated is None:
+            return None
+        Sequence.objects.using(using).filter(scope=scope).update(last_value=updated + count)
+        return updated + count
+
+
+def _create(scope, initial, using):
+    start = initial() if initial is not None else 0
+    try:
+        with transaction.atomic(using=using):
+            Sequence.objects.using(using).create(scope=scope, last_value=start or 0)
+    except IntegrityError:
+        # عملية أخرى أنشأت العداد في نفس الوقت
+        pass
+
+
+def reserve(scope, count=1, initial=None, using=DEFAULT_DB_ALIAS):
+    """
+    حجز count رقماً من النطاق
+
+    Args:
+        initial: دالة تُرجع أكبر رقم مستخدم حالياً في النطاق؛ تُستدعى مرة واحدة عند إنشاء العداد
+
+    Returns:
+        آخر رقم محجوز (الأرقام المحجوزة من last - count + 1 إلى last)
+    """
+    last = _increment(scope, count, using)
+    if last is None:
+        _create(scope, initial, using)
+        last = _increment(scope, count, using)
+    return last
+
+
+def next_value(scope, initial=None, using=DEFAULT_DB_ALIAS):
+    """
+    الرقم التالي في النطاق
+
+    داخل معاملة يُحجز الرقم في نفس المعاملة (يُلغى مع إلغائها). خارج المعاملات، إذا كان للنطاق
+    حجم دفعة أكبر من 1 تُحجز دفعة كاملة وتُوزع أرقامها من الذاكرة، مع احتمال فجوات عند إعادة التشغيل
+    """
+    block_size = get_block_size(scope)
+    if block_size == 1 or connections[using].in_atomic_block:
+        return reserve(scope, 1, initial, using)
+
+    key = (using, scope)
+    with _blocks_lock:
+        block = _blocks.get(key)
+        if block is None or block[0] > block[1]:
+            last = reserve(scope, block_size, initial, using)
+            block = _blocks[key] = [last - block_size + 1, last]
+        value = block[0]
+        block[0] += 1
+    return value
+
+
+def set_value(scope, value, using=DEFAULT_DB_ALIAS):
+    """
+    ضبط آخر قيمة للنطاق (بعد استيراد بيانات مثلاً) وإلغاء الدفعة المحجوزة في هذه العملية
+    """
+    Sequence.objects.using(using).update_or_create(scope=scope, defaults={'last_value': value})
+    with _blocks_lock:
+        _blocks.pop((using, scope), None)
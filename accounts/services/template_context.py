@@ -0,0 +1,131 @@
+"""
+بيانات القوالب المشتركة (الأقسام، معلومات الشركة، إعدادات التذييل)
+تُخزن مؤقتاً بين الطلبات وتُحذف عبر الإشارات عند تعديلها، وتُشارك داخل الطلب الواحد
+حتى لا تتكرر الاستعلامات عند عرض أكثر من قالب في نفس الطلب
+"""
+from django.core.cache import cache
+
+from accounts.models import CompanyInfo, Department, FooterSettings
+
+CACHE_TIMEOUT = 3600
+
+DEPARTMENTS_CACHE_KEY = 'template_context:departments'
+COMPANY_INFO_CACHE_KEY = 'template_context:company_info'
+FOOTER_SETTINGS_CACHE_KEY = 'template_context:footer_settings'
+SYSTEM_SETTINGS_CACHE_KEY = 'system_settings'
+
+
+def user_departments_cache_key(user_id):
+    return f'template_context:user_departments:{user_id}'
+
+
+def request_cached(request, key, func):
+    """
+    حساب القيمة مرة واحدة لكل طلب وحفظها على كائن الطلب
+    """
+    if request is None:
+        return func()
+    values = request.__dict__.setdefault('_template_context_cache', {})
+    if key not in values:
+        values[key] = func()
+    return values[key]
+
+
+def get_active_departments():
+    """
+    الأقسام النشطة مرتبة (قائمة مخزنة مؤقتاً)
+    """
+    departments = cache.get(DEPARTMENTS_CACHE_KEY)
+    if departments is None:
+        departments = list(Department.objects.filter(is_active=True).order_by('order'))
+        cache.set(DEPARTMENTS_CACHE_KEY, departments, CACHE_TIMEOUT)
+    return departments
+
+
+def get_user_department_ids(user):
+    """
+    معرفات أقسام المستخدم (مخزنة مؤقتاً لكل مستخدم)
+    """
+    key = user_departments_cache_key(user.pk)
+    department_ids = cache.get(key)
+    if department_ids is None:
+        department_ids = list(user.departments.values_list('id', flat=True))
+        cache.set(key, department_ids, CACHE_TIMEOUT)
+    return department_ids
+
+
+def get_department_tree(user):
+    """
+    شجرة الأقسام للقوالب: كل الأقسام، الأقسام الرئيسية، وأقسام المستخدم ورؤوسها
+    """
+    all_departments = get_active_departments()
+    parent_departments = [dept for dept in all_departments if dept.parent_id is None]
+
+    if not user.is_authenticated:
+        return all_departments, parent_departments, [], []
+    if user.is_superuser:
+        return all_departments, parent_departments, all_departments, parent_departments
+
+    department_ids = set(get_user_department_ids(user))
+    user_departments = [dept for dept in all_departments if dept.id in department_ids]
+    parent_ids = {dept.parent_id or dept.id for dept in user_departments}
+    user_parent_departments = [dept for dept in all_departments if dept.id in parent_ids]
+    return all_departments, parent_departments, user_departments, user_parent_departments
+
+
+def _default_company_info():
+    return CompanyInfo(
+        name="نظام الخواجه",
+        address="",
+        phone="",
+        email="",
+    )
+
+
+def get_company_info():
+    """
+    معلومات الشركة، أو كائن بقيم افتراضية (غير محفوظ) إذا لم تكن موجودة
+    """
+    company = cache.get(COMPANY_INFO_CACHE_KEY)
+    if company is None:
+        try:
+            company = CompanyInfo.objects.first() or _default_company_info()
+        except Exception:
+            # في حالة حدوث أي خطأ نستخدم القيم الافتراضية دون تخزينها
+            return _default_company_info()
+        cache.set(COMPANY_INFO_CACHE_KEY, company, CACHE_TIMEOUT)
+    return company
+
+
+def get_footer_settings():
+    """
+    إعدادات التذييل، أو كائن بالقيم الافتراضية (غير محفوظ) إذا لم تكن موجودة
+    """
+    footer_settings = cache.get(FOOTER_SETTINGS_CACHE_KEY)
+    if footer_settings is None:
+        try:
+            footer_settings = FooterSettings.objects.first() or FooterSettings()
+        except Exception:
+            return FooterSettings()
+        cache.set(FOOTER_SETTINGS_CACHE_KEY, footer_settings, CACHE_TIMEOUT)
+    return footer_settings
+
+
+def invalidate_departments():
+    cache.delete(DEPARTMENTS_CACHE_KEY)
+
+
+def invalidate_user_departments(user_ids):
+    cache.delete_many([user_departments_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_company_info():
+    cache.delete(COMPANY_INFO_CACHE_KEY)
+
+
+def invalidate_footer_settings():
+    cache.delete(FOOTER_SETTINGS_CACHE_KEY)
+
+
+def invalidate_system_settings():
+    cache.delete(SYSTEM_SETTINGS_CACHE_KEY)
@@ -2,3 +2,6 @@
 تحميل إشارات تطبيق الحسابات
 """
 from accounts.signals.post_migrate import create_core_departments_after_migrate
+from accounts.signals.dashboard_trends import invalidate_trend_rollup
+from accounts.signals.template_context import invalidate_department_tree
+from accounts.signals.notifications import deliver_new_notification
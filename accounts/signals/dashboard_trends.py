@@ -0,0 +1,18 @@
+"""
+إشارات إبطال التخزين المؤقت اليومي لبيانات اتجاهات لوحة التحكم
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.services.dashboard_service import invalidate_trend_day
+from customers.models import Customer
+from orders.models import Order
+
+
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_trend_rollup(sender, instance, **kwargs):
+    """
+    حذف قيم اليوم الذي أنشئ فيه السجل حتى يعاد حسابها عند الطلب التالي
+    """
+    invalidate_trend_day(sender, instance.created_at)
@@ -0,0 +1,36 @@
+"""
+إشارات توزيع الإشعارات على صناديق المستخدمين
+"""
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import Notification
+from accounts.services.notification_inbox import deliver, forget
+
+
+@receiver(post_save, sender=Notification)
+def deliver_new_notification(sender, instance, created, raw=False, **kwargs):
+    """
+    توزيع الإشعار الجديد على مستلميه (يشمل send_notification والإنشاء المباشر ولوحة الإدارة)
+    """
+    if created and not raw:
+        deliver(instance)
+
+
+@receiver(m2m_changed, sender=Notification.target_users.through)
+def deliver_to_target_users(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    توزيع الإشعار على المستخدمين المضافين مباشرة بعد إنشائه
+    """
+    if action != 'post_add' or not pk_set:
+        return
+    if not reverse:
+        deliver(instance, user_ids=pk_set)
+    else:
+        for notification in Notification.objects.filter(pk__in=pk_set):
+            deliver(notification, user_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Notification)
+def forget_deleted_notification(sender, instance, **kwargs):
+    forget(instance)
@@ -0,0 +1,49 @@
+"""
+إشارات حذف البيانات المخزنة مؤقتاً للقوالب عند تعديل الأقسام والإعدادات
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import CompanyInfo, Department, FooterSettings, SystemSettings, User
+from accounts.services.template_context import (
+    invalidate_company_info,
+    invalidate_departments,
+    invalidate_footer_settings,
+    invalidate_system_settings,
+    invalidate_user_departments,
+)
+
+
+@receiver([post_save, post_delete], sender=Department)
+def invalidate_department_tree(sender, **kwargs):
+    invalidate_departments()
+
+
+@receiver(m2m_changed, sender=User.departments.through)
+def invalidate_user_department_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    حذف أقسام المستخدمين المخزنة عند تغيير ارتباطهم بالأقسام
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_user_departments([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_user_departments(instance.users.values_list('pk', flat=True))
+    else:
+        invalidate_user_departments(pk_set)
+
+
+@receiver([post_save, post_delete], sender=CompanyInfo)
+def invalidate_company_info_cache(sender, **kwargs):
+    invalidate_company_info()
+
+
+@receiver([post_save, post_delete], sender=FooterSettings)
+def invalidate_footer_settings_cache(sender, **kwargs):
+    invalidate_footer_settings()
+
+
+@receiver([post_save, post_delete], sender=SystemSettings)
+def invalidate_system_settings_cache(sender, **kwargs):
+    invalidate_system_settings()
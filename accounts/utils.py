@@ -1,6 +1,7 @@
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
 from .models import Notification, Department, User
+from .services.notification_inbox import get_inbox
 
 def send_notification(
     title, 
@@ -50,6 +51,7 @@ def send_notification(
             notification.content_type = content_type
             notification.object_id = related_object.pk
         
+        # الحفظ يوزع الإشعار على صناديق المستلمين دفعة واحدة (accounts.signals.notifications)
         notification.save()
         return notification
     
@@ -64,51 +66,25 @@ def send_notification(
 
 def get_user_notifications(user, department_code=None, unread_only=False, limit=None):
     """
-    Get notifications for a user
+    Get notifications for a user from the user's inbox
     
     Args:
         user (User): User to get notifications for
         department_code (str, optional): Filter by department code. Defaults to None.
-        unread_only (bool, optional): Only return unread notifications. Defaults to False.
+        unread_only (bool, optional): Only return notifications unread by this user. Defaults to False.
         limit (int, optional): Limit number of notifications. Defaults to None.
     
     Returns:
-        QuerySet: Notifications for the user
+        QuerySet: Notifications for the user (newest first), with the user's read time in user_read_at
     """
-    # Base query - get notifications for user's departments
-    if user.is_superuser:
-        # Superuser can see all notifications
-        notifications = Notification.objects.all()
-    else:
-        # Regular user can only see notifications for their departments
-        user_departments = user.departments.filter(is_active=True)
-        notifications = Notification.objects.filter(target_department__in=user_departments)
-        
-        # If user has a branch, also filter by branch
-        if user.branch:
-            branch_notifications = Notification.objects.filter(
-                target_branch=user.branch
-            )
-            # Combine department and branch notifications
-            notifications = (notifications | branch_notifications).distinct()
-    
+    notifications = get_inbox(user, unread_only=unread_only)
+
     # Apply filters
     if department_code:
-        try:
-            department = Department.objects.get(code=department_code)
-            notifications = notifications.filter(target_department=department)
-        except Department.DoesNotExist:
-            # Return empty queryset if department doesn't exist
-            return Notification.objects.none()
-    
-    if unread_only:
-        notifications = notifications.filter(is_read=False)
-    
-    # Order by created_at (newest first)
-    notifications = notifications.order_by('-created_at')
-    
+        notifications = notifications.filter(target_department__code=department_code)
+
     # Apply limit if provided
     if limit:
         notifications = notifications[:limit]
-    
+
     return notifications
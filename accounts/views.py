@@ -7,9 +7,11 @@ from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Q
+from django.utils import timezone
 
 from .models import Notification, CompanyInfo, FormField, Department, Salesperson, Branch, Role, UserRole
 from .utils import get_user_notifications
+from .services.notification_inbox import mark_read
 from .forms import CompanyInfoForm, FormFieldForm, DepartmentForm, SalespersonForm, RoleForm, RoleAssignForm
 
 # الحصول على نموذج المستخدم المخصص
@@ -129,11 +131,11 @@ def notifications_list(request):
     # Get all notifications for the user
     all_notifications = get_user_notifications(request.user)
 
-    # Filter notifications based on read status
+    # Filter notifications based on this user's read status
     if filter_type == 'unread':
-        notifications = all_notifications.filter(is_read=False)
+        notifications = all_notifications.filter(user_read_at__isnull=True)
     elif filter_type == 'read':
-        notifications = all_notifications.filter(is_read=True)
+        notifications = all_notifications.filter(user_read_at__isnull=False)
     else:  # 'all'
         notifications = all_notifications
 
@@ -154,18 +156,17 @@ def notification_detail(request, notification_id):
     """
     View for notification detail
     """
-    # Get notification
-    notification = get_object_or_404(Notification, id=notification_id)
-
-    # Check if user has access to this notification
-    user_notifications = get_user_notifications(request.user)
-    if notification not in user_notifications:
+    # Get notification from the user's inbox (checks access)
+    notification = get_user_notifications(request.user).filter(id=notification_id).first()
+    if notification is None:
+        get_object_or_404(Notification, id=notification_id)
         messages.error(request, 'ليس لديك صلاحية للوصول إلى هذا الإشعار.')
         return redirect('accounts:notifications')
 
     # Mark notification as read
-    if not notification.is_read:
+    if notification.user_read_at is None:
         notification.mark_as_read(request.user)
+        notification.user_read_at = timezone.now()
 
     context = {
         'notification': notification,
@@ -179,12 +180,10 @@ def mark_notification_read(request, notification_id):
     View for marking notification as read
     """
     if request.method == 'POST':
-        # Get notification
-        notification = get_object_or_404(Notification, id=notification_id)
-
-        # Check if user has access to this notification
-        user_notifications = get_user_notifications(request.user)
-        if notification not in user_notifications:
+        # Get notification from the user's inbox (checks access)
+        notification = get_user_notifications(request.user).filter(id=notification_id).first()
+        if notification is None:
+            get_object_or_404(Notification, id=notification_id)
             return JsonResponse({'success': False, 'message': 'ليس لديك صلاحية للوصول إلى هذا الإشعار.'})
 
         # Mark notification as read
@@ -200,14 +199,10 @@ def mark_all_notifications_read(request):
     View for marking all notifications as read
     """
     if request.method == 'POST':
-        # Get all unread notifications for the user
-        unread_notifications = get_user_notifications(request.user, unread_only=True)
-
-        # Mark all as read
-        for notification in unread_notifications:
-            notification.mark_as_read(request.user)
+        # Mark all of the user's unread notifications as read in one update
+        count = mark_read(request.user)
 
-        return JsonResponse({'success': True, 'count': unread_notifications.count()})
+        return JsonResponse({'success': True, 'count': count})
 
     return JsonResponse({'success': False, 'message': 'طريقة غير صالحة.'})
 
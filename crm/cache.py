@@ -0,0 +1,244 @@
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import DatabaseError
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# الإعدادات الافتراضية للطبقة المحلية والطبقة المشتركة
+DEFAULT_L1_MAX_ENTRIES = 1000
+DEFAULT_L1_TIMEOUT = 30
+DEFAULT_L2 = 'shared'
+# أقل فترة بين رسالتين لخطأ الطبقة المشتركة (بالثواني)
+L2_ERROR_LOG_INTERVAL = 60
+
+
+class TieredCache(BaseCache):
+    """
+    تخزين مؤقت على طبقتين:
+    L1 في ذاكرة العملية (LRU مع مدة صلاحية قصيرة) أمام L2 مشترك بين كل العمليات
+    (جدول في قاعدة البيانات افتراضياً، فلا يحتاج إلى خدمة خارجية)
+
+    الكتابة والحذف يمران على الطبقتين؛ العمليات الأخرى ترى التغيير في L2 فوراً وفي L1 بعد
+    انتهاء L1_TIMEOUT على الأكثر. مفاتيح الإصدارات (L2_ONLY_PREFIXES) لا تُخزن في L1 أبداً،
+    لذلك الإبطال عبر زيادة الإصدار (مثل inventory.cache_utils) يصل لكل العمليات فوراً
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', DEFAULT_L1_MAX_ENTRIES))
+        self.l1_timeout = options.get('L1_TIMEOUT', DEFAULT_L1_TIMEOUT)
+        self.l2_only_prefixes = tuple(options.get('L2_ONLY_PREFIXES', ()))
+
+        # L2 إما اسم تخزين آخر في CACHES (حتى يُنشئ createcachetable جدوله) أو إعداداته مباشرة
+        self._l2_config = options.get('L2', DEFAULT_L2)
+        self._l2 = None
+
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ('l1_hits', 'l2_hits', 'misses', 'l1_evictions', 'l1_expirations', 'l2_errors'), 0
+        )
+        self._last_error_log = 0
+
+    # ---- الطبقة المحلية ----
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _use_l1(self, key):
+        return not (self.l2_only_prefixes and key.startswith(self.l2_only_prefixes))
+
+    def _l1_expiry(self, timeout):
+        """
+        وقت انتهاء المدخل في L1: الأقرب بين صلاحيته الأصلية و L1_TIMEOUT
+        """
+        expires = self.get_backend_timeout(timeout)
+        if self.l1_timeout is None:
+            return expires
+        local_expires = time.time() + self.l1_timeout
+        return local_expires if expires is None else min(expires, local_expires)
+
+    def _l1_get(self, full_key):
+        with self._lock:
+            entry = self._l1.get(full_key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires is not None and expires <= time.time():
+                del self._l1[full_key]
+                self._stats['l1_expirations'] += 1
+                return _MISSING
+            self._l1.move_to_end(full_key)
+            self._stats['l1_hits'] += 1
+        return pickle.loads(data)
+
+    def _l1_set(self, full_key, value, timeout):
+        expires = self._l1_expiry(timeout)
+        if expires is not None and expires <= time.time():
+            self._l1_delete(full_key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[full_key] = (expires, data)
+            self._l1.move_to_end(full_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+                self._stats['l1_evictions'] += 1
+
+    def _l1_delete(self, full_key):
+        with self._lock:
+            return self._l1.pop(full_key, None) is not None
+
+    # ---- الطبقة المشتركة ----
+
+    @property
+    def l2(self):
+        if self._l2 is None:
+            config = self._l2_config
+            if isinstance(config, str):
+                from django.core.cache import caches
+
+                self._l2 = caches[config]
+            else:
+                params = {key: value for key, value in config.items() if key not in ('BACKEND', 'LOCATION')}
+                self._l2 = import_string(config['BACKEND'])(config.get('LOCATION', ''), params)
+        return self._l2
+
+    def _l2_call(self, method, *args, default=None, **kwargs):
+        """
+        استدعاء L2 مع الاستمرار بـ L1 فقط إذا كانت غير متاحة (مثلاً قبل createcachetable)
+        """
+        try:
+            return getattr(self.l2, method)(*args, **kwargs)
+        except DatabaseError as e:
+            self._count('l2_errors')
+            now = time.monotonic()
+            if now - self._last_error_log > L2_ERROR_LOG_INTERVAL:
+                self._last_error_log = now
+                logger.warning(f"التخزين المؤقت المشترك غير متاح ({method}): {str(e)}")
+            return default
+
+    # ---- واجهة Django ----
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        use_l1 = self._use_l1(key)
+        if use_l1:
+            value = self._l1_get(full_key)
+            if value is not _MISSING:
+                return value
+
+        value = self._l2_call('get', key, _MISSING, version=version, default=_MISSING)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('l2_hits')
+        if use_l1:
+            self._l1_set(full_key, value, self.default_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            full_key = self.make_and_validate_key(key, version=version)
+            value = self._l1_get(full_key) if self._use_l1(key) else _MISSING
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        if remaining:
+            from_l2 = self._l2_call('get_many', remaining, version=version, default={})
+            self._count('l2_hits', len(from_l2))
+            self._count('misses', len(remaining) - len(from_l2))
+            for key, value in from_l2.items():
+                if self._use_l1(key):
+                    self._l1_set(self.make_key(key, version=version), value, self.default_timeout)
+            found.update(from_l2)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._l2_call('set', key, value, timeout, version=version)
+        if self._use_l1(key):
+            self._l1_set(full_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._l2_call('set_many', data, timeout, version=version, default=[])
+        for key, value in data.items():
+            if self._use_l1(key):
+                self._l1_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        added = self._l2_call('add', key, value, timeout, version=version, default=False)
+        if added and self._use_l1(key):
+            self._l1_set(full_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self._l2_call('touch', key, timeout, version=version, default=False)
+
+    def delete(self, key, version=None):
+        deleted = self._l1_delete(self.make_and_validate_key(key, version=version))
+        return bool(self._l2_call('delete', key, version=version, default=False)) or deleted
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._l1_delete(self.make_and_validate_key(key, version=version))
+        self._l2_call('delete_many', keys, version=version)
+
+    def has_key(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        if self._use_l1(key) and self._l1_get(full_key) is not _MISSING:
+            return True
+        return bool(self._l2_call('has_key', key, version=version, default=False))
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        value = self._l2_call('incr', key, delta, version=version, default=_MISSING)
+        if value is _MISSING:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self._l2_call('clear')
+
+    def clear_local(self):
+        """
+        مسح L1 في هذه العملية فقط
+        """
+        with self._lock:
+            self._l1.clear()
+
+    def stats(self):
+        """
+        مقاييس الطبقتين في هذه العملية: الإصابات، الإخفاقات، نسبة الإصابة والطرد
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['l1_entries'] = len(self._l1)
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['l1_hits'] + stats['l2_hits']) / lookups, 4) if lookups else 0
+        stats['l1_hit_ratio'] = round(stats['l1_hits'] / lookups, 4) if lookups else 0
+        stats['l1_max_entries'] = self.l1_max_entries
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
@@ -2,7 +2,6 @@ import json
 import traceback
 import time
 import logging
-import re
 from django.http import HttpResponse
 from django.conf import settings
 from django.db import connection
@@ -12,6 +11,8 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth.middleware import get_user
 from rest_framework_simplejwt.tokens import AccessToken
 
+from .profiling import RequestProfiler, get_setting, profile_store, should_sample
+
 # إعداد السجل الخاص بالاستعلامات البطيئة
 slow_queries_logger = logging.getLogger('slow_queries')
 
@@ -119,6 +120,35 @@ class QueryPerformanceMiddleware:
         
         return response
 
+class RequestProfilingMiddleware:
+    """
+    وسيط قياس الطلبات في الإنتاج (لا يحتاج DEBUG)
+    يقيس عينة من الطلبات عبر connection.execute_wrapper: عدد الاستعلامات وزمنها والأبطأ منها
+    والاستعلامات المتكررة (N+1)، ويجمعها حسب اسم المسار في مخزن دائري داخل العملية
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_sample(request):
+            return self.get_response(request)
+
+        with RequestProfiler() as profiler:
+            response = self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        is_staff = bool(user is not None and user.is_authenticated and user.is_staff)
+        # معامل الإجبار متاح للموظفين فقط حتى لا يُستخدم لتشويه الإحصائيات
+        if get_setting('FORCE_PARAM') in request.GET and not is_staff:
+            return response
+
+        entry = profiler.entry(request, response)
+        profile_store.add(entry['route'], entry)
+        if is_staff and get_setting('SERVER_TIMING'):
+            response['Server-Timing'] = profiler.server_timing()
+        return response
+
 class PerformanceCookiesMiddleware:
     """
     وسيط لإضافة معلومات الأداء إلى ملفات تعريف الارتباط للمستخدمين المسؤولين
@@ -204,43 +234,6 @@ class PerformanceMiddleware:
 
         return response
 
-class LazyLoadMiddleware:
-    """
-    وسيط لتطبيق التحميل الكسول للصور
-    """
-    def __init__(self, get_response):
-        self.get_response = get_response
-        self.img_pattern = re.compile(r'<img([^>]+)>')
-
-    def __call__(self, request):
-        response = self.get_response(request)
-        
-        # تجاهل FileResponse و StreamingResponse
-        if hasattr(response, 'streaming_content'):
-            return response
-        
-        if 'text/html' not in response.get('Content-Type', ''):
-            return response
-            
-        # تطبيق loading="lazy" على الصور
-        try:
-            if isinstance(response.content, bytes):
-                content = response.content.decode('utf-8')
-            else:
-                content = response.content
-                
-            def add_lazy_loading(match):
-                if 'loading=' not in match.group(1):
-                    return f'<img{match.group(1)} loading="lazy">'
-                return match.group(0)
-                
-            modified_content = self.img_pattern.sub(add_lazy_loading, content)
-            response.content = modified_content.encode('utf-8')
-        except (AttributeError, ValueError):
-            return response
-        
-        return response
-
 class JWTAuthenticationMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
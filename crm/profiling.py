@@ -0,0 +1,208 @@
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# الإعدادات الافتراضية (يمكن تغييرها عبر REQUEST_PROFILING في الإعدادات)
+DEFAULTS = {
+    'ENABLED': True,
+    # نسبة الطلبات التي يتم قياسها
+    'SAMPLE_RATE': 0.05,
+    # عدد الطلبات المحفوظة لكل مسار
+    'RING_SIZE': 200,
+    # عدد الاستعلامات الأبطأ المحفوظة لكل طلب
+    'SLOWEST': 5,
+    # تكرار نفس الاستعلام هذا العدد من المرات في طلب واحد يعتبر N+1 محتملاً
+    'DUPLICATE_THRESHOLD': 3,
+    # إضافة رأس Server-Timing للطلبات المقاسة
+    'SERVER_TIMING': True,
+    # معامل يسمح للموظفين بقياس طلب معين دون انتظار العينة (?_profile=1)
+    'FORCE_PARAM': '_profile',
+}
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def get_setting(name):
+    return getattr(settings, 'REQUEST_PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """
+    بصمة الاستعلام بعد إزالة القيم الثابتة وتوحيد قوائم IN،
+    بحيث تتطابق الاستعلامات التي لا تختلف إلا في المعاملات
+    """
+    if ' IN (' in sql:
+        sql = _IN_LIST_RE.sub('IN (...)', sql)
+    if "'" in sql or any(char.isdigit() for char in sql):
+        sql = _LITERAL_RE.sub('?', sql)
+    return sql
+
+
+class QueryRecorder:
+    """
+    مُغلف تنفيذ الاستعلامات (connection.execute_wrapper) يسجل العدد والزمن لكل طلب
+    ويعمل بدون DEBUG لأنه لا يعتمد على connection.queries
+    """
+
+    def __init__(self, slowest=5):
+        self.slowest_limit = slowest
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            self.fingerprints[fingerprint(sql)] += 1
+            if len(self.slowest) < self.slowest_limit or duration > self.slowest[-1][0]:
+                self.slowest.append((duration, sql[:500]))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[self.slowest_limit:]
+
+    def duplicates(self, threshold):
+        """
+        الاستعلامات المتكررة في نفس الطلب (مؤشر على مشكلة N+1)
+        """
+        return [
+            {'sql': sql[:500], 'count': count}
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+class ProfileStore:
+    """
+    مخزن دائري داخل العملية لنتائج القياس مجمعة حسب اسم المسار
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, entry):
+        with self._lock:
+            ring = self._routes.get(route)
+            if ring is None:
+                ring = self._routes[route] = deque(maxlen=get_setting('RING_SIZE'))
+            ring.append(entry)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def entries(self, route):
+        with self._lock:
+            return list(self._routes.get(route, ()))
+
+    def summary(self):
+        """
+        ملخص كل مسار: عدد الطلبات المقاسة، متوسط وأقصى الزمن وعدد الاستعلامات،
+        وأكثر الاستعلامات المتكررة
+        """
+        with self._lock:
+            routes = {route: list(ring) for route, ring in self._routes.items()}
+
+        summary = []
+        for route, entries in routes.items():
+            durations = sorted(entry['duration_ms'] for entry in entries)
+            duplicates = Counter()
+            for entry in entries:
+                for duplicate in entry['duplicates']:
+                    duplicates[duplicate['sql']] += duplicate['count']
+            count = len(entries)
+            summary.append({
+                'route': route,
+                'samples': count,
+                'avg_ms': round(sum(durations) / count, 2),
+                'p95_ms': durations[min(count - 1, int(count * 0.95))],
+                'max_ms': durations[-1],
+                'avg_queries': round(sum(entry['queries'] for entry in entries) / count, 1),
+                'max_queries': max(entry['queries'] for entry in entries),
+                'avg_db_ms': round(sum(entry['db_ms'] for entry in entries) / count, 2),
+                'duplicates': [
+                    {'sql': sql, 'count': total} for sql, total in duplicates.most_common(5)
+                ],
+            })
+        summary.sort(key=lambda item: item['avg_ms'] * item['samples'], reverse=True)
+        return summary
+
+
+profile_store = ProfileStore()
+
+
+class RequestProfiler:
+    """
+    قياس طلب واحد: تسجيل الاستعلامات على كل اتصالات قاعدة البيانات أثناء تنفيذ الطلب
+    """
+
+    def __init__(self):
+        self.recorder = QueryRecorder(slowest=get_setting('SLOWEST'))
+        self.start = None
+        self.duration = 0.0
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self.recorder))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.start
+        self._stack.close()
+        return False
+
+    def entry(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'time': time.time(),
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(self.duration * 1000, 2),
+            'queries': self.recorder.count,
+            'db_ms': round(self.recorder.duration * 1000, 2),
+            'slowest': [
+                {'sql': sql, 'ms': round(duration * 1000, 2)}
+                for duration, sql in self.recorder.slowest
+            ],
+            'duplicates': self.recorder.duplicates(get_setting('DUPLICATE_THRESHOLD')),
+            'route': (match.view_name if match and match.view_name else None) or '<unresolved>',
+        }
+
+    def server_timing(self):
+        """
+        قيمة رأس Server-Timing (تظهر في أدوات المطور بالمتصفح)
+        """
+        db_ms = self.recorder.duration * 1000
+        total_ms = self.duration * 1000
+        return (
+            f'db;dur={db_ms:.1f};desc="{self.recorder.count} queries", '
+            f'app;dur={max(total_ms - db_ms, 0):.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+
+
+def should_sample(request):
+    """
+    هل يتم قياس هذا الطلب (حسب نسبة العينة أو معامل الإجبار)
+    """
+    if not get_setting('ENABLED'):
+        return False
+    if get_setting('FORCE_PARAM') in request.GET:
+        return True
+    rate = get_setting('SAMPLE_RATE')
+    return rate >= 1 or random.random() < rate
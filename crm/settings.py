@@ -63,6 +63,7 @@ AUTH_USER_MODEL = 'accounts.User'
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'crm.middleware.RequestProfilingMiddleware',  # وسيط قياس عينة من الطلبات في الإنتاج
     'crm.middleware.CustomGZipMiddleware',  # وسيط الضغط المخصص
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -72,7 +73,6 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'crm.middleware.PerformanceMiddleware',  # وسيط قياس وتحسين الأداء
-    'crm.middleware.LazyLoadMiddleware',  # وسيط التحميل الكسول للصور
 ]
 
 # إضافة middleware إضافي في وضع التطوير
@@ -88,8 +88,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # التحميل الكسول للصور يُضاف عند تحميل القالب ويُخزن مع القالب المترجم
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'crm.template_loaders.FilesystemLoader',
+                    'crm.template_loaders.AppDirectoriesLoader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -199,6 +205,10 @@ DBBACKUP_STORAGE = 'django.core.files.storage.FileSystemStorage'
 DBBACKUP_STORAGE_OPTIONS = {'location': BACKUP_ROOT}
 DBBACKUP_CLEANUP_KEEP = 5  # الاحتفاظ بآخر 5 نسخ احتياطية فقط
 
+# مهام النسخ والاستعادة الخلفية تُنفذ في عملية worker مستقلة (python manage.py run_backup_jobs)
+# لأن عمال gunicorn يُعاد تشغيلهم دورياً؛ BACKUP_JOBS_IN_PROCESS=1 لتنفيذها داخل الخادم عند التطوير
+BACKUP_JOBS_IN_PROCESS = os.environ.get('BACKUP_JOBS_IN_PROCESS', '0') == '1'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -208,16 +218,28 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Cache settings
+# طبقتان: L1 صغيرة في ذاكرة كل عملية أمام L2 مشترك بين العمليات في جدول crm_cache
+# (يُنشأ بالأمر createcachetable)؛ مفاتيح إصدارات المخزون تُقرأ من L2 دائماً ليصل الإبطال لكل العمليات
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'crm.cache.TieredCache',
         'TIMEOUT': 300,  # 5 minutes
         'OPTIONS': {
-            'MAX_ENTRIES': 500,  # تقليل عدد العناصر المخزنة لتوفير الذاكرة
-            'CULL_FREQUENCY': 2,  # زيادة تكرار التنظيف
-        }
-    }
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 30,  # أقصى مدة لبقاء قيمة قديمة في عملية أخرى بعد تعديلها
+            'L2_ONLY_PREFIXES': ['inventory:tag:'],
+            'L2': 'shared',
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'crm_cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
 }
 
 # REST Framework settings
@@ -376,6 +398,12 @@ SESSION_CLEANUP_SCHEDULE = {
 # تقليل عدد الاستعلامات المسموح بها في صفحة واحدة
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
 
+# قياس عينة من الطلبات في الإنتاج (crm.profiling)؛ النتائج في /admin/profiling/
+REQUEST_PROFILING = {
+    'ENABLED': os.environ.get('REQUEST_PROFILING', 'True').lower() == 'true',
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', '0.05')),
+}
+
 # تعطيل التسجيل المفصل في الإنتاج
 if not DEBUG:
     LOGGING = {
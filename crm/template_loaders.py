@@ -0,0 +1,42 @@
+import re
+
+from django.template.loaders import app_directories, filesystem
+
+# وسم img مع السماح بوسوم القوالب داخله مثل {% static '...' %} و {{ obj.url }}
+_IMG_TAG_RE = re.compile(r'<img\b((?:\{%.*?%\}|\{\{.*?\}\}|[^>])*?)(\s*/?)>', re.IGNORECASE)
+
+
+def add_lazy_loading(source):
+    """
+    إضافة loading="lazy" لوسوم الصور في نص القالب نفسه
+    يتم التحويل مرة واحدة عند تحميل القالب، ومع محمل القوالب المخزن (cached.Loader)
+    لا توجد أي تكلفة إضافية على الطلبات
+    """
+    if '<img' not in source and '<IMG' not in source:
+        return source
+
+    def replace(match):
+        attrs, end = match.groups()
+        if 'loading=' in attrs:
+            return match.group(0)
+        return f'<img{attrs} loading="lazy"{end}>'
+
+    return _IMG_TAG_RE.sub(replace, source)
+
+
+class FilesystemLoader(filesystem.Loader):
+    """
+    محمل قوالب المجلدات (DIRS) مع التحميل الكسول للصور
+    """
+
+    def get_contents(self, origin):
+        return add_lazy_loading(super().get_contents(origin))
+
+
+class AppDirectoriesLoader(app_directories.Loader):
+    """
+    محمل قوالب التطبيقات مع التحميل الكسول للصور
+    """
+
+    def get_contents(self, origin):
+        return add_lazy_loading(super().get_contents(origin))
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from . import views
 from .views_health import health_check
+from .views_profiling import profiling_stats
 from accounts.views import admin_logout_view
 from inventory.views import dashboard_view
 from accounts.api_views import dashboard_stats
@@ -31,6 +32,7 @@ urlpatterns = [
     path('api/customers/<int:pk>/', customer_detail, name='customer_detail'),
 
     # مسارات لوحة التحكم
+    path('admin/profiling/', profiling_stats, name='profiling_stats'),
     path('admin/', admin.site.urls),
     path('admin/logout/', admin_logout_view, name='admin_logout'),
 
@@ -181,7 +181,7 @@ def dashboard_api(request):
         },
         'inventory': {
             'total_products': Product.objects.count(),
-            'low_stock': Product.objects.filter(current_stock__lte=F('minimum_stock')).count()
+            'low_stock': Product.objects.with_stock_level().filter(current_stock_calc__lte=F('minimum_stock')).count()
         },
         'production': {
             'active_orders': ProductionOrder.objects.exclude(status__in=['completed', 'cancelled']).count(),
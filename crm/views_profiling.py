@@ -0,0 +1,27 @@
+from django.contrib.auth.decorators import user_passes_test
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from .profiling import get_setting, profile_store
+
+
+@user_passes_test(lambda user: user.is_active and user.is_superuser, login_url='admin:login')
+@require_http_methods(['GET', 'POST'])
+def profiling_stats(request):
+    """
+    نتائج قياس الطلبات مجمعة حسب المسار (للمدير فقط)
+    GET ?route=<اسم المسار> يعرض آخر الطلبات المقاسة لهذا المسار، و POST يمسح النتائج
+    """
+    if request.method == 'POST':
+        profile_store.clear()
+        return JsonResponse({'cleared': True})
+
+    data = {
+        'enabled': get_setting('ENABLED'),
+        'sample_rate': get_setting('SAMPLE_RATE'),
+        'routes': profile_store.summary(),
+    }
+    route = request.GET.get('route')
+    if route:
+        data['recent'] = profile_store.entries(route)[-50:]
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
@@ -4,6 +4,7 @@ from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from accounts.models import Branch
+from accounts.services.sequences import highest_sequence, next_value
 
 User = get_user_model()
 
@@ -140,19 +141,13 @@ class Customer(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.code:
-            # Get the latest customer code for this branch
-            latest_customer = Customer.objects.filter(
-                branch=self.branch
-            ).order_by('-code').first()
-
-            if latest_customer:
-                # Extract the sequence number and increment
-                try:
-                    sequence = int(latest_customer.code.split('-')[1]) + 1
-                except (IndexError, ValueError):
-                    sequence = 1
-            else:
-                sequence = 1
+            # الرقم التالي من عداد الفرع (بدلاً من البحث عن آخر كود)
+            sequence = next_value(
+                f'customers.code:{self.branch_id}',
+                initial=lambda: highest_sequence(
+                    Customer.objects.filter(branch_id=self.branch_id).values_list('code', flat=True)
+                ),
+            )
 
             # Generate new code in format '001-0001'
             self.code = f"{self.branch.code}-{str(sequence).zfill(4)}"
@@ -12,14 +12,14 @@ class ProductionLineAdmin(admin.ModelAdmin):
 
 @admin.register(ProductionOrder)
 class ProductionOrderAdmin(admin.ModelAdmin):
-    list_display = ('order', 'production_line', 'status', 'start_date', 'end_date')
+    list_display = ('production_number', 'order', 'production_line', 'status', 'start_date', 'end_date')
     list_filter = ('status', 'start_date', 'end_date')
-    search_fields = ('order__order_number', 'notes')
-    readonly_fields = ('created_at', 'created_by')
+    search_fields = ('production_number', 'order__order_number', 'notes')
+    readonly_fields = ('production_number', 'created_at', 'created_by')
     
     fieldsets = (
         (_('معلومات أمر الإنتاج'), {
-            'fields': ('order', 'production_line', 'status')
+            'fields': ('production_number', 'order', 'production_line', 'status')
         }),
         (_('التواريخ'), {
             'fields': ('start_date', 'end_date', 'estimated_completion')
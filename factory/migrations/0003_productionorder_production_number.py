@@ -0,0 +1,32 @@
+# Generated by Django 4.2.21 on 2025-06-09 11:15
+
+from django.db import migrations, models
+
+
+def populate_production_numbers(apps, schema_editor):
+    """ترقيم أوامر الإنتاج الموجودة حسب سنة وتاريخ إنشائها"""
+    ProductionOrder = apps.get_model('factory', 'ProductionOrder')
+
+    counters = {}
+    production_orders = ProductionOrder.objects.filter(production_number__isnull=True).order_by('created_at', 'id')
+    for production_order in production_orders.iterator():
+        year = production_order.created_at.year
+        counters[year] = counters.get(year, 0) + 1
+        production_order.production_number = f"PRD-{year}-{counters[year]:05d}"
+        production_order.save(update_fields=['production_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0002_alter_productionissue_reported_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productionorder',
+            name='production_number',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True, verbose_name='رقم أمر الإنتاج'),
+        ),
+        migrations.RunPython(populate_production_numbers, migrations.RunPython.noop),
+    ]
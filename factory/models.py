@@ -1,6 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from accounts.models import User
+from accounts.services.sequences import highest_sequence, next_value
 from orders.models import Order
 
 class ProductionLine(models.Model):
@@ -38,6 +40,14 @@ class ProductionOrder(models.Model):
         related_name='production_orders',
         verbose_name=_('الطلب')
     )
+    production_number = models.CharField(
+        _('رقم أمر الإنتاج'),
+        max_length=20,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
     production_line = models.ForeignKey(
         ProductionLine,
         on_delete=models.SET_NULL,
@@ -72,6 +82,21 @@ class ProductionOrder(models.Model):
     def __str__(self):
         return f"أمر إنتاج - {self.order.order_number}"
 
+    def save(self, *args, **kwargs):
+        if not self.production_number:
+            year = timezone.now().year
+            prefix = f"PRD-{year}-"
+            sequence = next_value(
+                f'factory.production_order:{year}',
+                initial=lambda: highest_sequence(
+                    ProductionOrder.objects.filter(production_number__startswith=prefix).values_list(
+                        'production_number', flat=True
+                    )
+                ),
+            )
+            self.production_number = f"{prefix}{sequence:05d}"
+        super().save(*args, **kwargs)
+
 class ProductionStage(models.Model):
     """
     Model for tracking different stages of production
@@ -18,7 +18,7 @@ class Command(BaseCommand):
         for inspection in inspections_with_orders:
             if inspection.order and inspection.order.notes:
                 inspection.order_notes = inspection.order.notes
-                inspection.save(update_fields=['order_notes'])
+                inspection.save(update_fields=['order_notes', 'updated_at'])
                 count += 1
         
         # طباعة النتائج
@@ -258,7 +258,7 @@ class InspectionCreateView(LoginRequiredMixin, CreateView):
         if order_id and hasattr(form.instance, 'order') and form.instance.order and form.instance.order.salesperson:
             if not form.instance.responsible_employee:
                 form.instance.responsible_employee = form.instance.order.salesperson
-                form.instance.save(update_fields=['responsible_employee'])
+                form.instance.save(update_fields=['responsible_employee', 'updated_at'])
 
         return response
 
@@ -1,9 +1,9 @@
 from django.contrib import admin
-from django.db.models import Sum
 from django.utils.translation import gettext_lazy as _
 from .models import (
     Category, Product, StockTransaction, Supplier, PurchaseOrder, PurchaseOrderItem,
-    Warehouse, WarehouseLocation, ProductBatch, InventoryAdjustment, StockAlert
+    Warehouse, WarehouseLocation, ProductBatch, InventoryAdjustment, StockAlert,
+    StockBalance, WarehouseStock
 )
 
 @admin.register(Category)
@@ -18,6 +18,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('category', 'created_at')
     search_fields = ('name', 'code', 'description')
     readonly_fields = ('get_current_stock', 'created_at', 'updated_at')
+    list_select_related = ('category', 'stock_balance')
 
     fieldsets = (
         (_('معلومات المنتج'), {
@@ -33,9 +34,7 @@ class ProductAdmin(admin.ModelAdmin):
     )
 
     def get_current_stock(self, obj):
-        stock = obj.transactions.filter(transaction_type='in').aggregate(Sum('quantity'))['quantity__sum'] or 0
-        stock -= obj.transactions.filter(transaction_type='out').aggregate(Sum('quantity'))['quantity__sum'] or 0
-        return stock
+        return obj.current_stock
     get_current_stock.short_description = _('المخزون الحالي')
 
     def get_stock_status(self, obj):
@@ -49,14 +48,14 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(StockTransaction)
 class StockTransactionAdmin(admin.ModelAdmin):
-    list_display = ('product', 'transaction_type', 'reason', 'quantity', 'date')
-    list_filter = ('transaction_type', 'reason', 'date')
+    list_display = ('product', 'warehouse', 'transaction_type', 'reason', 'quantity', 'date')
+    list_filter = ('transaction_type', 'reason', 'warehouse', 'date')
     search_fields = ('product__name', 'reference', 'notes')
     readonly_fields = ('date', 'created_by')
 
     fieldsets = (
         (_('معلومات الحركة'), {
-            'fields': ('product', 'transaction_type', 'reason', 'quantity')
+            'fields': ('product', 'warehouse', 'transaction_type', 'reason', 'quantity')
         }),
         (_('التفاصيل'), {
             'fields': ('reference', 'notes')
@@ -146,3 +145,18 @@ class StockAlertAdmin(admin.ModelAdmin):
     list_filter = ('alert_type', 'status', 'created_at')
     search_fields = ('product__name', 'message')
     readonly_fields = ('created_at', 'resolved_at', 'resolved_by')
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'quantity', 'updated_at')
+    search_fields = ('product__name', 'product__code')
+    readonly_fields = ('product', 'quantity', 'updated_at')
+    list_select_related = ('product',)
+
+@admin.register(WarehouseStock)
+class WarehouseStockAdmin(admin.ModelAdmin):
+    list_display = ('product', 'warehouse', 'quantity', 'updated_at')
+    list_filter = ('warehouse',)
+    search_fields = ('product__name', 'product__code')
+    readonly_fields = ('product', 'warehouse', 'quantity', 'updated_at')
+    list_select_related = ('product', 'warehouse')
@@ -1,253 +1,459 @@
 """
 Utilidades para el manejo de caché en el módulo de inventario.
+
+Todas las claves de caché del inventario se construyen aquí. Cada entrada depende de
+una o varias etiquetas (``products``, ``product:<id>``, ``category:<id>``, ``stock``...)
+y la clave incluye la versión actual de cada etiqueta. Invalidar una etiqueta es un
+único incremento de su versión (O(1)), sin recorrer ni borrar claves: las entradas
+antiguas dejan de ser alcanzables y expiran solas.
 """
+import base64
+import binascii
+import threading
+import time
+from collections import Counter
+
 from django.core.cache import cache
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from .models import (
     Product, Category, Supplier, Warehouse, StockTransaction,
-    PurchaseOrder, StockAlert
+    PurchaseOrder, StockAlert, StockBalance
 )
+from .stock_ledger import ZERO, get_stock_level
 
 # Tiempos de caché en segundos
 CACHE_TIMEOUT_SHORT = 60 * 5  # 5 minutos
 CACHE_TIMEOUT_MEDIUM = 60 * 30  # 30 minutos
 CACHE_TIMEOUT_LONG = 60 * 60 * 12  # 12 horas
 
-def get_cached_dashboard_stats():
+CACHE_PREFIX = 'inventory'
+
+# Etiquetas de las que dependen las estadísticas del dashboard
+DASHBOARD_TAGS = (
+    'dashboard', 'products', 'stock', 'categories', 'suppliers', 'warehouses',
+    'purchase_orders', 'alerts',
+)
+
+# Contadores de aciertos/fallos por nombre de entrada (por proceso)
+_stats_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def _tag_version_key(tag):
+    return f'{CACHE_PREFIX}:tag:{tag}'
+
+
+def _new_version():
+    # Una versión basada en el tiempo evita reutilizar versiones si la clave se expulsa
+    return int(time.time() * 1000)
+
+
+def get_tag_versions(tags):
     """
-    Obtiene las estadísticas del dashboard desde la caché o las calcula si no están en caché.
+    Obtiene la versión actual de cada etiqueta en una sola operación de caché.
+    """
+    keys = {tag: _tag_version_key(tag) for tag in tags}
+    stored = cache.get_many(list(keys.values()))
+    versions = {}
+    missing = {}
+    for tag, key in keys.items():
+        if key in stored:
+            versions[tag] = stored[key]
+        else:
+            missing[key] = versions[tag] = _new_version()
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def make_key(name, tags=(), *parts):
+    """
+    Construye la clave versionada de una entrada de caché.
+    """
+    versions = get_tag_versions(tags)
+    tag_part = '.'.join(f'{tag}={versions[tag]}' for tag in sorted(versions))
+    part = ':'.join(str(p) for p in parts)
+    return f'{CACHE_PREFIX}:{name}:{part}:{tag_part}'
+
+
+def invalidate(*tags):
+    """
+    Invalida todas las entradas que dependen de las etiquetas indicadas (O(1) por etiqueta).
+    """
+    for tag in tags:
+        key = _tag_version_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def _record(name, hit):
+    with _stats_lock:
+        (_hits if hit else _misses)[name] += 1
+
+
+def get_or_set(name, tags, compute, timeout=CACHE_TIMEOUT_SHORT, parts=()):
+    """
+    Devuelve la entrada de caché o la calcula con ``compute`` y la guarda.
+    """
+    key = make_key(name, tags, *parts)
+    value = cache.get(key)
+    if value is None:
+        _record(name, False)
+        value = compute()
+        cache.set(key, value, timeout)
+    else:
+        _record(name, True)
+    return value
+
+
+def get_cache_stats():
     """
-    cache_key = 'inventory_dashboard_stats'
-    stats = cache.get(cache_key)
-    
-    if stats is None:
-        # Calcular estadísticas
-        total_products = Product.objects.count()
-        total_categories = Category.objects.count()
-        total_suppliers = Supplier.objects.count()
-        total_warehouses = Warehouse.objects.count()
-        
-        # Productos con stock bajo
-        low_stock_count = 0
-        products = Product.objects.all()
-        for product in products:
-            current_stock = get_cached_stock_level(product.id)
-            if 0 < current_stock <= product.minimum_stock:
-                low_stock_count += 1
-        
-        # Productos sin stock
-        out_of_stock_count = 0
-        for product in products:
-            current_stock = get_cached_stock_level(product.id)
-            if current_stock <= 0:
-                out_of_stock_count += 1
-        
-        # Órdenes de compra pendientes
-        pending_orders = PurchaseOrder.objects.filter(
-            status__in=['draft', 'pending', 'approved', 'partial']
-        ).count()
-        
-        # Alertas activas
-        active_alerts = StockAlert.objects.filter(status='active').count()
-        
-        # Transacciones recientes
-        recent_transactions = StockTransaction.objects.select_related(
-            'product', 'created_by'
-        ).order_by('-date')[:10]
-        
-        # Productos más vendidos (últimos 30 días)
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        top_products = Product.objects.annotate(
-            total_out=Sum('transactions__quantity', 
-                         filter=Q(transactions__transaction_type='out') & 
-                                Q(transactions__date__date__gte=start_date) & 
-                                Q(transactions__date__date__lte=end_date))
-        ).filter(total_out__gt=0).order_by('-total_out')[:5]
-        
-        # Guardar estadísticas en caché
-        stats = {
-            'total_products': total_products,
-            'total_categories': total_categories,
-            'total_suppliers': total_suppliers,
-            'total_warehouses': total_warehouses,
-            'low_stock_count': low_stock_count,
-            'out_of_stock_count': out_of_stock_count,
-            'pending_orders': pending_orders,
-            'active_alerts': active_alerts,
-            'recent_transactions': list(recent_transactions.values(
-                'id', 'product__name', 'transaction_type', 'quantity', 
-                'date', 'created_by__first_name', 'created_by__last_name'
-            )),
-            'top_products': list(top_products.values('id', 'name', 'total_out'))
+    Devuelve los contadores de aciertos y fallos de la caché del inventario.
+    """
+    with _stats_lock:
+        names = sorted(set(_hits) | set(_misses))
+        entries = {
+            name: {'hits': _hits[name], 'misses': _misses[name]}
+            for name in names
         }
-        
-        cache.set(cache_key, stats, CACHE_TIMEOUT_MEDIUM)
-    
+        hits = sum(_hits.values())
+        misses = sum(_misses.values())
+    total = hits + misses
+    stats = {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0,
+        'entries': entries,
+    }
+    # Métricas del backend de dos niveles (L1 local / L2 compartido) si está disponible
+    if hasattr(cache, 'stats'):
+        stats['backend'] = cache.stats()
     return stats
 
+
+def reset_cache_stats():
+    """
+    Reinicia los contadores de aciertos y fallos.
+    """
+    with _stats_lock:
+        _hits.clear()
+        _misses.clear()
+
+def get_cached_dashboard_stats():
+    """
+    Obtiene las estadísticas del dashboard desde la caché o las calcula si no están en caché.
+    El número de consultas es constante: los contadores de stock se calculan con una sola
+    agregación sobre los saldos persistidos, sin recorrer los productos.
+    """
+    return get_or_set('dashboard_stats', DASHBOARD_TAGS, _compute_dashboard_stats, CACHE_TIMEOUT_MEDIUM)
+
+def _compute_dashboard_stats():
+    # Contadores de productos en una sola consulta agregada
+    low_stock_filter = Q(current_stock_calc__gt=0, current_stock_calc__lte=F('minimum_stock'))
+    product_stats = Product.objects.with_stock_level().aggregate(
+        total_products=Count('id'),
+        low_stock_count=Count('id', filter=low_stock_filter),
+        out_of_stock_count=Count('id', filter=Q(current_stock_calc__lte=0)),
+        total_value=Sum(F('current_stock_calc') * F('price')),
+    )
+
+    total_categories = Category.objects.count()
+    total_suppliers = Supplier.objects.count()
+    total_warehouses = Warehouse.objects.count()
+
+    # Órdenes de compra pendientes
+    pending_orders = PurchaseOrder.objects.filter(
+        status__in=['draft', 'pending', 'approved', 'partial']
+    ).count()
+
+    # Alertas activas
+    active_alerts = StockAlert.objects.filter(status='active').count()
+
+    # Transacciones recientes
+    recent_transactions = StockTransaction.objects.select_related(
+        'product', 'created_by'
+    ).order_by('-date')[:10]
+
+    # Productos más vendidos (últimos 30 días), agrupados sobre las transacciones del periodo
+    start_date = timezone.now() - timedelta(days=30)
+    top_products = StockTransaction.objects.filter(
+        transaction_type='out', date__gte=start_date
+    ).values('product_id', 'product__name').annotate(
+        total_out=Sum('quantity')
+    ).order_by('-total_out')[:5]
+
+    return {
+        'total_products': product_stats['total_products'],
+        'total_categories': total_categories,
+        'total_suppliers': total_suppliers,
+        'total_warehouses': total_warehouses,
+        'low_stock_count': product_stats['low_stock_count'],
+        'out_of_stock_count': product_stats['out_of_stock_count'],
+        'total_value': product_stats['total_value'] or 0,
+        'pending_orders': pending_orders,
+        'active_alerts': active_alerts,
+        'recent_transactions': list(recent_transactions.values(
+            'id', 'product__name', 'transaction_type', 'quantity',
+            'date', 'created_by__first_name', 'created_by__last_name'
+        )),
+        'top_products': [
+            {'id': row['product_id'], 'name': row['product__name'], 'total_out': row['total_out']}
+            for row in top_products
+        ]
+    }
+
+def invalidate_dashboard_cache():
+    """
+    Invalida la caché de las estadísticas del dashboard.
+    """
+    invalidate('dashboard')
+
 def get_cached_stock_level(product_id):
     """
     Obtiene el nivel de stock de un producto desde la caché o lo calcula si no está en caché.
     """
-    cache_key = f'product_stock_{product_id}'
-    stock_level = cache.get(cache_key)
-    
-    if stock_level is None:
-        # Calcular nivel de stock
-        transactions = StockTransaction.objects.filter(product_id=product_id)
-        
-        stock_in = transactions.filter(transaction_type='in').aggregate(
-            total=Sum('quantity'))['total'] or 0
-        stock_out = transactions.filter(transaction_type='out').aggregate(
-            total=Sum('quantity'))['total'] or 0
-        
-        stock_level = stock_in - stock_out
-        
-        # Guardar en caché
-        cache.set(cache_key, stock_level, CACHE_TIMEOUT_SHORT)
-    
-    return stock_level
+    return get_or_set(
+        'product_stock', (f'product:{product_id}',),
+        lambda: get_stock_level(product_id),
+        CACHE_TIMEOUT_SHORT, parts=(product_id,)
+    )
 
 def invalidate_product_stock_cache(product_id):
     """
     Invalida la caché de nivel de stock de un producto.
     """
-    cache_key = f'product_stock_{product_id}'
-    cache.delete(cache_key)
-    
-    # También invalidar la caché del dashboard
-    cache.delete('inventory_dashboard_stats')
+    invalidate(f'product:{product_id}', 'stock')
+
+def _category_filter(category_id):
+    # La categoría incluye los productos de sus subcategorías directas
+    return Q(category_id=category_id) | Q(category__parent_id=category_id)
+
+def attach_stock_levels(products):
+    """
+    Añade ``current_stock_calc`` y ``stock_percentage`` a una página de productos
+    con una sola consulta sobre los saldos persistidos de esos productos.
+    """
+    products = list(products)
+    balances = dict(
+        StockBalance.objects.filter(
+            product_id__in=[product.pk for product in products]
+        ).values_list('product_id', 'quantity')
+    ) if products else {}
+
+    for product in products:
+        product.current_stock_calc = balances.get(product.pk, ZERO)
+        # Calcular porcentaje de stock
+        if product.minimum_stock > 0:
+            product.stock_percentage = min(
+                int((product.current_stock_calc / product.minimum_stock) * 100),
+                100
+            )
+        else:
+            product.stock_percentage = 100
+    return products
 
 def get_cached_product_list(category_id=None, include_stock=False):
     """
     Obtiene la lista de productos desde la caché o la calcula si no está en caché.
+    Para catálogos grandes usar ``get_cached_product_page``.
     """
-    cache_key = f'product_list_{category_id}_{include_stock}'
-    products = cache.get(cache_key)
-    
-    if products is None:
+    tags = ['products', 'categories']
+    if include_stock:
+        tags.append('stock')
+
+    def compute():
         # Obtener productos
         queryset = Product.objects.select_related('category')
-        
+
         if category_id:
-            queryset = queryset.filter(
-                Q(category_id=category_id) | 
-                Q(category__parent_id=category_id)
-            )
-        
+            queryset = queryset.filter(_category_filter(category_id))
+
         products = list(queryset)
-        
+
         # Calcular nivel de stock si es necesario
         if include_stock:
-            for product in products:
-                product.current_stock_calc = get_cached_stock_level(product.id)
-                
-                # Calcular porcentaje de stock
-                if product.minimum_stock > 0:
-                    product.stock_percentage = min(
-                        int((product.current_stock_calc / product.minimum_stock) * 100), 
-                        100
-                    )
-                else:
-                    product.stock_percentage = 100
-        
-        # Guardar en caché
-        cache.set(cache_key, products, CACHE_TIMEOUT_SHORT)
-    
-    return products
+            attach_stock_levels(products)
+        return products
+
+    return get_or_set(
+        'product_list', tags, compute, CACHE_TIMEOUT_SHORT,
+        parts=(category_id or 'all', include_stock)
+    )
+
+PRODUCT_PAGE_SIZE = 50
+PRODUCT_PAGE_MAX_SIZE = 500
+
+def encode_product_cursor(product):
+    """
+    Codifica la posición (created_at, id) de un producto como cursor opaco.
+    """
+    raw = f'{product.created_at.isoformat()}|{product.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_product_cursor(cursor):
+    """
+    Decodifica un cursor; devuelve None si no es válido.
+    """
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+def get_cached_product_page(category_id=None, include_stock=True, cursor=None, page_size=PRODUCT_PAGE_SIZE,
+                            category_name=None):
+    """
+    Obtiene una página de productos ordenada por (-created_at, -id) usando paginación por
+    clave (keyset). Solo se leen las filas de la página y el stock se obtiene para esos
+    productos en una única consulta, por lo que la memoria no depende del tamaño del catálogo.
+    Cada página se guarda en caché por separado.
+
+    Args:
+        category_name: filtra por el nombre exacto de la categoría (tipo de producto)
+
+    Returns:
+        diccionario con ``products``, ``next_cursor`` y ``has_next``
+
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    page_size = max(1, min(int(page_size), PRODUCT_PAGE_MAX_SIZE))
+    position = decode_product_cursor(cursor) if cursor else None
+    if cursor and position is None:
+        raise ValueError('Cursor no válido')
+    tags = ['products', 'categories']
+    if include_stock:
+        tags.append('stock')
+
+    def compute():
+        queryset = Product.objects.select_related('category').order_by('-created_at', '-id')
+        if category_id:
+            queryset = queryset.filter(_category_filter(category_id))
+        if category_name:
+            queryset = queryset.filter(category__name=category_name)
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+
+        products = list(queryset[:page_size + 1])
+        has_next = len(products) > page_size
+        products = products[:page_size]
+        if include_stock:
+            attach_stock_levels(products)
+
+        return {
+            'products': products,
+            'has_next': has_next,
+            'next_cursor': encode_product_cursor(products[-1]) if has_next else None,
+        }
+
+    return get_or_set(
+        'product_page', tags, compute, CACHE_TIMEOUT_SHORT,
+        parts=(category_id or 'all', category_name or 'any', include_stock, cursor or 'first', page_size)
+    )
+
+def get_cached_product(product_id):
+    """
+    Obtiene un producto con sus datos relacionados desde la caché.
+    """
+    return get_or_set(
+        'product_detail', (f'product:{product_id}', 'categories'),
+        lambda: Product.objects.with_related().get(id=product_id),
+        CACHE_TIMEOUT_LONG, parts=(product_id,)
+    )
+
+def get_cached_category_stats(category_id, compute):
+    """
+    Obtiene las estadísticas de una categoría desde la caché.
+    """
+    return get_or_set(
+        'category_stats', (f'category:{category_id}', 'products', 'stock'),
+        compute, CACHE_TIMEOUT_MEDIUM, parts=(category_id,)
+    )
+
+def invalidate_product_cache(product_id, category_id=None):
+    """
+    Invalida todas las entradas que dependen de un producto.
+    """
+    tags = ['products', f'product:{product_id}']
+    if category_id:
+        tags.append(f'category:{category_id}')
+    invalidate(*tags)
 
 def get_cached_category_list():
     """
     Obtiene la lista de categorías desde la caché o la calcula si no está en caché.
     """
-    cache_key = 'category_list'
-    categories = cache.get(cache_key)
-    
-    if categories is None:
-        # Obtener categorías con prefetch de productos y categorías hijas
-        categories = list(Category.objects.prefetch_related('children', 'products'))
-        
-        # Guardar en caché
-        cache.set(cache_key, categories, CACHE_TIMEOUT_MEDIUM)
-    
-    return categories
+    # Obtener categorías con prefetch de productos y categorías hijas
+    return get_or_set(
+        'category_list', ('categories', 'products'),
+        lambda: list(Category.objects.prefetch_related('children', 'products')),
+        CACHE_TIMEOUT_MEDIUM
+    )
 
-def invalidate_category_cache():
+def invalidate_category_cache(category_id=None):
     """
-    Invalida la caché de categorías.
+    Invalida la caché de categorías (y de las listas de productos que las muestran).
     """
-    cache.delete('category_list')
-    
-    # También invalidar la caché de productos
-    for key in cache.keys('product_list_*'):
-        cache.delete(key)
+    tags = ['categories']
+    if category_id:
+        tags.append(f'category:{category_id}')
+    invalidate(*tags)
 
 def get_cached_supplier_list():
     """
     Obtiene la lista de proveedores desde la caché o la calcula si no está en caché.
     """
-    cache_key = 'supplier_list'
-    suppliers = cache.get(cache_key)
-    
-    if suppliers is None:
-        # Obtener proveedores
-        suppliers = list(Supplier.objects.all())
-        
-        # Guardar en caché
-        cache.set(cache_key, suppliers, CACHE_TIMEOUT_MEDIUM)
-    
-    return suppliers
+    return get_or_set(
+        'supplier_list', ('suppliers',),
+        lambda: list(Supplier.objects.all()),
+        CACHE_TIMEOUT_MEDIUM
+    )
 
 def invalidate_supplier_cache():
     """
     Invalida la caché de proveedores.
     """
-    cache.delete('supplier_list')
+    invalidate('suppliers')
 
 def get_cached_warehouse_list():
     """
     Obtiene la lista de almacenes desde la caché o la calcula si no está en caché.
     """
-    cache_key = 'warehouse_list'
-    warehouses = cache.get(cache_key)
-    
-    if warehouses is None:
-        # Obtener almacenes
-        warehouses = list(Warehouse.objects.select_related('branch', 'manager'))
-        
-        # Guardar en caché
-        cache.set(cache_key, warehouses, CACHE_TIMEOUT_MEDIUM)
-    
-    return warehouses
+    return get_or_set(
+        'warehouse_list', ('warehouses',),
+        lambda: list(Warehouse.objects.select_related('branch', 'manager')),
+        CACHE_TIMEOUT_MEDIUM
+    )
 
-def invalidate_warehouse_cache():
+def invalidate_warehouse_cache(warehouse_id=None):
     """
     Invalida la caché de almacenes.
     """
-    cache.delete('warehouse_list')
+    tags = ['warehouses']
+    if warehouse_id:
+        tags.append(f'warehouse:{warehouse_id}')
+    invalidate(*tags)
 
 def get_cached_alert_count():
     """
     Obtiene el número de alertas activas desde la caché o lo calcula si no está en caché.
     """
-    cache_key = 'active_alerts_count'
-    count = cache.get(cache_key)
-    
-    if count is None:
-        # Calcular número de alertas activas
-        count = StockAlert.objects.filter(status='active').count()
-        
-        # Guardar en caché
-        cache.set(cache_key, count, CACHE_TIMEOUT_SHORT)
-    
-    return count
+    return get_or_set(
+        'active_alerts_count', ('alerts',),
+        lambda: StockAlert.objects.filter(status='active').count(),
+        CACHE_TIMEOUT_SHORT
+    )
 
 def invalidate_alert_cache():
     """
     Invalida la caché de alertas.
     """
-    cache.delete('active_alerts_count')
+    invalidate('alerts')
@@ -1,5 +1,6 @@
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import F, Sum
 from .models import Product, PurchaseOrder
 
 class InventoryDashboardView(LoginRequiredMixin, TemplateView):
@@ -8,9 +9,11 @@ class InventoryDashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['total_products'] = Product.objects.count()
-        context['low_stock_count'] = sum(1 for p in Product.objects.all() if p.current_stock <= p.minimum_stock and p.current_stock > 0)
+        context['low_stock_count'] = Product.objects.low_stock().count()
         context['purchase_orders_count'] = PurchaseOrder.objects.filter(status='ordered').count()
-        context['inventory_value'] = sum(p.current_stock * p.price for p in Product.objects.all())
+        context['inventory_value'] = Product.objects.with_stock_level().aggregate(
+            total=Sum(F('current_stock_calc') * F('price'))
+        )['total'] or 0
         context['recent_products'] = Product.objects.order_by('-created_at')[:10]
         return context
 
@@ -21,8 +24,8 @@ class InventoryDashboardView(LoginRequiredMixin, TemplateView):
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Sum, Case, When, IntegerField, F, Count, Value
-from .models import Product, Category, StockTransaction
+from django.db.models import Case, When, IntegerField, Count, Value
+from .models import Category, StockTransaction
 from .inventory_utils import get_cached_stock_level
 
 @login_required
@@ -0,0 +1,72 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from inventory.cache_utils import get_cached_dashboard_stats, invalidate_dashboard_cache
+from inventory.models import Category, Product, StockBalance, StockTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks inventory dashboard statistics against growing product counts '
+        'and fails if the number of queries grows with the catalogue size'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='Product counts to benchmark (default: 10 100 1000)',
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        for size in sorted(options['sizes']):
+            query_count, elapsed = self._measure(size)
+            results.append((size, query_count, elapsed))
+            self.stdout.write(f'{size:>8} products: {query_count} queries, {elapsed * 1000:.1f} ms')
+
+        counts = {query_count for _, query_count, _ in results}
+        if len(counts) > 1:
+            raise CommandError(f'Query count grows with product count: {sorted(counts)}')
+        self.stdout.write(self.style.SUCCESS(f'Query count is constant ({counts.pop()} queries)'))
+
+    def _measure(self, size):
+        """Seeds `size` products inside a rolled back transaction and times a cold stats load"""
+        with transaction.atomic():
+            category = Category.objects.create(name=f'benchmark-{size}')
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f'benchmark product {index}',
+                    code=f'BENCH-{size}-{index}',
+                    price=Decimal('10.00'),
+                    category=category,
+                    minimum_stock=5,
+                )
+                for index in range(size)
+            ], batch_size=1000)
+            # بيانات متنوعة: نافد، منخفض، ومتوفر
+            StockBalance.objects.bulk_create([
+                StockBalance(product=product, quantity=Decimal(index % 10))
+                for index, product in enumerate(products)
+            ], batch_size=1000)
+            StockTransaction.objects.bulk_create([
+                StockTransaction(product=product, transaction_type='out', quantity=Decimal(index % 7 + 1))
+                for index, product in enumerate(products)
+            ], batch_size=1000)
+
+            invalidate_dashboard_cache()
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                get_cached_dashboard_stats()
+            elapsed = time.perf_counter() - started
+
+            invalidate_dashboard_cache()
+            transaction.set_rollback(True)
+
+        return len(queries), elapsed
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from inventory.stock_ledger import rebuild_stock_balances
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds or reconciles persisted stock balances from the stock transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report balances that differ from the transaction history without changing them',
+        )
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            dest='product_ids',
+            help='Limit the operation to the given product id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        apply = not options['check']
+        result = rebuild_stock_balances(product_ids=options['product_ids'], apply=apply)
+
+        for row in result['products']:
+            self.stdout.write(
+                f"Product {row['product_id']}: stored {row['stored']} / expected {row['expected']}"
+            )
+        for row in result['warehouses']:
+            self.stdout.write(
+                f"Product {row['product_id']} @ warehouse {row['warehouse_id']}: "
+                f"stored {row['stored']} / expected {row['expected']}"
+            )
+
+        total = len(result['products']) + len(result['warehouses'])
+        if not total:
+            self.stdout.write(self.style.SUCCESS('All stock balances match the transaction history'))
+        elif apply:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {total} stock balances'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Found {total} mismatched stock balances'))
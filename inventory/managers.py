@@ -1,50 +1,46 @@
 from django.db import models
-from django.db.models import F, Sum, Case, When, IntegerField
-from django.core.cache import cache
+from django.db.models import F, Q, Sum
 
 class ProductQuerySet(models.QuerySet):
     def with_stock_level(self):
         """
-        إضافة حساب مستوى المخزون الحالي للمنتجات
-        """
-        return self.annotate(
-            stock_in=Sum(
-                Case(
-                    When(transactions__transaction_type='in', then='transactions__quantity'),
-                    default=0,
-                    output_field=IntegerField()
-                )
-            ),
-            stock_out=Sum(
-                Case(
-                    When(transactions__transaction_type='out', then='transactions__quantity'),
-                    default=0,
-                    output_field=IntegerField()
-                )
-            ),
-            current_stock=F('stock_in') - F('stock_out')
-        )
+        إضافة مستوى المخزون الحالي من الرصيد المحفوظ للمنتجات
+        """
+        from .stock_ledger import stock_level_expression
+
+        return self.annotate(current_stock_calc=stock_level_expression())
 
     def low_stock(self):
         """
         تصفية المنتجات ذات المخزون المنخفض
         """
         return self.with_stock_level().filter(
-            current_stock__gt=0,
-            current_stock__lte=F('minimum_stock')
+            current_stock_calc__gt=0,
+            current_stock_calc__lte=F('minimum_stock')
         )
 
     def out_of_stock(self):
         """
         تصفية المنتجات التي نفدت من المخزون
         """
-        return self.with_stock_level().filter(current_stock__lte=0)
+        return self.with_stock_level().filter(current_stock_calc__lte=0)
 
     def in_stock(self):
         """
         تصفية المنتجات المتوفرة في المخزون
         """
-        return self.with_stock_level().filter(current_stock__gt=0)
+        return self.with_stock_level().filter(current_stock_calc__gt=0)
+
+    def search(self, query):
+        """
+        البحث في الاسم والكود والوصف
+        (في PostgreSQL تستخدم فهارس trigram على UPPER() التي ينشئها الترحيل 0010)
+        """
+        if not query:
+            return self
+        return self.filter(
+            Q(name__icontains=query) | Q(code__icontains=query) | Q(description__icontains=query)
+        )
 
     def with_related(self):
         """
@@ -70,6 +66,9 @@ class ProductManager(models.Manager):
     def in_stock(self):
         return self.get_queryset().in_stock()
 
+    def search(self, query):
+        return self.get_queryset().search(query)
+
     def with_related(self):
         return self.get_queryset().with_related()
 
@@ -77,32 +76,25 @@ class ProductManager(models.Manager):
         """
         الحصول على منتج من الذاكرة المؤقتة
         """
-        cache_key = f'product_detail_{product_id}'
-        product = cache.get(cache_key)
-        
-        if product is None:
-            product = self.with_related().get(id=product_id)
-            cache.set(cache_key, product, 3600)  # تخزين لمدة ساعة
-            
-        return product
+        from .cache_utils import get_cached_product
+
+        return get_cached_product(product_id)
 
     def get_category_stats(self, category_id):
         """
         الحصول على إحصائيات فئة معينة
         """
-        cache_key = f'category_stats_{category_id}'
-        stats = cache.get(cache_key)
-        
-        if stats is None:
+        from .cache_utils import get_cached_category_stats
+
+        def compute():
             products = self.filter(category_id=category_id).with_stock_level()
-            stats = {
+            return {
                 'total_products': products.count(),
                 'low_stock_count': products.low_stock().count(),
                 'out_of_stock_count': products.out_of_stock().count(),
                 'total_value': products.aggregate(
-                    total=Sum(F('current_stock') * F('price'))
+                    total=Sum(F('current_stock_calc') * F('price'))
                 )['total'] or 0
             }
-            cache.set(cache_key, stats, 1800)  # تخزين لمدة 30 دقيقة
-            
-        return stats
\ No newline at end of file
+
+        return get_cached_category_stats(category_id, compute)
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.9 on 2025-05-28 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_stock_balances(apps, schema_editor):
+    """حساب الأرصدة الحالية من سجل الحركات الموجود"""
+    from django.db.models import Case, DecimalField, F, Sum, Value, When
+
+    StockTransaction = apps.get_model('inventory', 'StockTransaction')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+
+    signed_quantity = Case(
+        When(transaction_type='in', then=F('quantity')),
+        When(transaction_type='out', then=-F('quantity')),
+        default=Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    totals = StockTransaction.objects.order_by().values('product_id').annotate(total=Sum(signed_quantity))
+    StockBalance.objects.bulk_create(
+        [StockBalance(product_id=row['product_id'], quantity=row['total'] or 0) for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_alter_product_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_transactions', to='inventory.warehouse', verbose_name='المستودع'),
+        ),
+        migrations.CreateModel(
+            name='WarehouseStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='الكمية')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='warehouse_stocks', to='inventory.product', verbose_name='المنتج')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_stocks', to='inventory.warehouse', verbose_name='المستودع')),
+            ],
+            options={
+                'verbose_name': 'رصيد مستودع',
+                'verbose_name_plural': 'أرصدة المستودعات',
+                'indexes': [models.Index(fields=['warehouse', 'quantity'], name='warehouse_stock_qty_idx')],
+                'unique_together': {('product', 'warehouse')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='الكمية')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balance', to='inventory.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'رصيد مخزون',
+                'verbose_name_plural': 'أرصدة المخزون',
+                'indexes': [models.Index(fields=['quantity'], name='balance_quantity_idx')],
+            },
+        ),
+        migrations.RunPython(populate_stock_balances, migrations.RunPython.noop),
+    ]
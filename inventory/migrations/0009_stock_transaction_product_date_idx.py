@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2025-05-29 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stock_balances'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['product', 'date'], name='transaction_product_date_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.9 on 2025-06-01 10:15
+
+from django.db import migrations
+
+# فهارس trigram على UPPER() لأن icontains في PostgreSQL يُترجم إلى UPPER(col) LIKE UPPER('%...%')
+SEARCH_INDEXES = {
+    'product_name_trgm_idx': 'name',
+    'product_code_trgm_idx': 'code',
+    'product_description_trgm_idx': 'description',
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in SEARCH_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON inventory_product '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stock_transaction_product_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,10 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from accounts.models import User, Branch
+from accounts.services.sequences import highest_sequence, next_value
 import uuid
 from datetime import datetime
 from .managers import ProductManager
-from django.db.models import Sum
 
 class Category(models.Model):
     """
@@ -68,10 +68,11 @@ class Product(models.Model):
 
     @property
     def current_stock(self):
-        """Get current stock level"""
-        stock_in = self.transactions.filter(transaction_type='in').aggregate(Sum('quantity'))['quantity__sum'] or 0
-        stock_out = self.transactions.filter(transaction_type='out').aggregate(Sum('quantity'))['quantity__sum'] or 0
-        return stock_in - stock_out
+        """Get current stock level from the persisted stock balance"""
+        try:
+            return self.stock_balance.quantity
+        except StockBalance.DoesNotExist:
+            return 0
 
     @property
     def needs_restock(self):
@@ -79,9 +80,6 @@ class Product(models.Model):
         return 0 < self.current_stock <= self.minimum_stock
 
     def save(self, *args, **kwargs):
-        # تنظيف ذاكرة التخزين المؤقت عند حفظ المنتج
-        from django.core.cache import cache
-
         # إذا لم يكن هناك فئة، حاول العثور على فئة افتراضية
         if not self.category:
             from django.db import transaction
@@ -97,26 +95,9 @@ class Product(models.Model):
             except Exception as e:
                 print(f"Error assigning default category: {e}")
 
-        # تحديد مفاتيح ذاكرة التخزين المؤقت
-        cache_keys = [
-            f'product_detail_{self.id}',
-            'product_list_all',
-            'inventory_dashboard_stats'
-        ]
-
-        # إضافة مفاتيح متعلقة بالفئة إذا كانت موجودة
-        if self.category_id:
-            cache_keys.extend([
-                f'category_stats_{self.category_id}',
-                f'product_list_{self.category_id}',
-            ])
-
-        # حفظ المنتج
+        # حفظ المنتج (يتم إلغاء صلاحية الذاكرة المؤقتة عبر الإشارات في inventory.signals)
         super().save(*args, **kwargs)
 
-        # حذف مفاتيح ذاكرة التخزين المؤقت
-        cache.delete_many(cache_keys)
-
 class Supplier(models.Model):
     """
     Model for suppliers
@@ -268,6 +249,14 @@ class StockTransaction(models.Model):
     transaction_type = models.CharField(_('نوع الحركة'), max_length=10, choices=TRANSACTION_TYPES)
     reason = models.CharField(_('السبب'), max_length=20, choices=REASON_CHOICES, default='other')
     quantity = models.DecimalField(_('الكمية'), max_digits=10, decimal_places=2)
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_transactions',
+        verbose_name=_('المستودع')
+    )
     reference = models.CharField(_('المرجع'), max_length=100, blank=True)
     date = models.DateTimeField(_('التاريخ'), auto_now_add=True)
     notes = models.TextField(_('ملاحظات'), blank=True)
@@ -287,11 +276,32 @@ class StockTransaction(models.Model):
             models.Index(fields=['product'], name='transaction_product_idx'),
             models.Index(fields=['transaction_type'], name='transaction_type_idx'),
             models.Index(fields=['date'], name='transaction_date_idx'),
+            models.Index(fields=['product', 'date'], name='transaction_product_date_idx'),
         ]
 
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.product.name} ({self.quantity})"
 
+    def save(self, *args, **kwargs):
+        # تحديث رصيد المخزون المحفوظ في نفس المعاملة مع حفظ الحركة
+        from .stock_ledger import apply_transaction_change
+
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = StockTransaction.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('product_id', 'warehouse_id', 'transaction_type', 'quantity').first()
+            super().save(*args, **kwargs)
+            apply_transaction_change(previous=previous, current=self)
+
+    def delete(self, *args, **kwargs):
+        from .stock_ledger import apply_transaction_change
+
+        with transaction.atomic():
+            apply_transaction_change(previous=self, current=None)
+            return super().delete(*args, **kwargs)
+
 class PurchaseOrder(models.Model):
     """
     Model for purchase orders
@@ -349,9 +359,15 @@ class PurchaseOrder(models.Model):
     def save(self, *args, **kwargs):
         # Generate order number if not provided
         if not self.order_number:
-            year = datetime.now().year
-            month = datetime.now().month
-            self.order_number = f"PO-{year}{month:02d}-{uuid.uuid4().hex[:6].upper()}"
+            period = datetime.now().strftime('%Y%m')
+            prefix = f"PO-{period}-"
+            sequence = next_value(
+                f'inventory.purchase_order:{period}',
+                initial=lambda: highest_sequence(
+                    PurchaseOrder.objects.filter(order_number__startswith=prefix).values_list('order_number', flat=True)
+                ),
+            )
+            self.order_number = f"{prefix}{sequence:04d}"
         super().save(*args, **kwargs)
 
 class PurchaseOrderItem(models.Model):
@@ -436,6 +452,24 @@ class InventoryAdjustment(models.Model):
     def adjustment_quantity(self):
         return self.quantity_after - self.quantity_before
 
+    def save(self, *args, **kwargs):
+        # تسجيل التسوية كحركة مخزون حتى يبقى الرصيد المحفوظ مطابقاً لسجل الحركات
+        is_new = self.pk is None
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            difference = self.adjustment_quantity
+            if is_new and difference:
+                StockTransaction.objects.create(
+                    product=self.product,
+                    transaction_type='in' if difference > 0 else 'out',
+                    reason='inventory_check',
+                    quantity=abs(difference),
+                    warehouse=self.batch.location.warehouse if self.batch and self.batch.location else None,
+                    reference=f"ADJ-{self.pk}",
+                    notes=self.reason,
+                    created_by=self.created_by,
+                )
+
 class StockAlert(models.Model):
     """
     Model for stock alerts
@@ -496,3 +530,56 @@ class StockAlert(models.Model):
 
     def __str__(self):
         return f"{self.get_alert_type_display()} - {self.product.name}"
+
+class StockBalance(models.Model):
+    """
+    Persisted stock balance per product, maintained by StockTransaction writes
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_balance',
+        verbose_name=_('المنتج')
+    )
+    quantity = models.DecimalField(_('الكمية'), max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(_('تاريخ التحديث'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('رصيد مخزون')
+        verbose_name_plural = _('أرصدة المخزون')
+        indexes = [
+            models.Index(fields=['quantity'], name='balance_quantity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} ({self.quantity})"
+
+class WarehouseStock(models.Model):
+    """
+    Persisted stock balance per product and warehouse
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='warehouse_stocks',
+        verbose_name=_('المنتج')
+    )
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.CASCADE,
+        related_name='product_stocks',
+        verbose_name=_('المستودع')
+    )
+    quantity = models.DecimalField(_('الكمية'), max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(_('تاريخ التحديث'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('رصيد مستودع')
+        verbose_name_plural = _('أرصدة المستودعات')
+        unique_together = ['product', 'warehouse']
+        indexes = [
+            models.Index(fields=['warehouse', 'quantity'], name='warehouse_stock_qty_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.warehouse.name} ({self.quantity})"
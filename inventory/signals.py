@@ -0,0 +1,63 @@
+"""
+إشارات تطبيق المخزون
+إلغاء صلاحية الذاكرة المؤقتة للمخزون عبر رفع إصدار الوسوم المرتبطة بكل نموذج
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache_utils import invalidate
+from .models import (
+    Product, StockTransaction, Category, Supplier, Warehouse,
+    PurchaseOrder, StockAlert
+)
+
+
+def _invalidate_on_commit(*tags):
+    """رفع إصدار الوسوم بعد نجاح المعاملة حتى لا تُخزَّن بيانات قديمة من جديد"""
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    tags = ['products', f'product:{instance.pk}']
+    if instance.category_id:
+        tags.append(f'category:{instance.category_id}')
+    _invalidate_on_commit(*tags)
+
+
+@receiver([post_save, post_delete], sender=StockTransaction)
+def invalidate_stock(sender, instance, **kwargs):
+    tags = ['stock', f'product:{instance.product_id}']
+    if instance.warehouse_id:
+        tags.append(f'warehouse:{instance.warehouse_id}')
+    _invalidate_on_commit(*tags)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    tags = ['categories', f'category:{instance.pk}']
+    if instance.parent_id:
+        tags.append(f'category:{instance.parent_id}')
+    _invalidate_on_commit(*tags)
+
+
+@receiver([post_save, post_delete], sender=Supplier)
+def invalidate_supplier(sender, instance, **kwargs):
+    _invalidate_on_commit('suppliers')
+
+
+@receiver([post_save, post_delete], sender=Warehouse)
+def invalidate_warehouse(sender, instance, **kwargs):
+    _invalidate_on_commit('warehouses', f'warehouse:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=PurchaseOrder)
+def invalidate_purchase_order(sender, instance, **kwargs):
+    _invalidate_on_commit('purchase_orders')
+
+
+@receiver([post_save, post_delete], sender=StockAlert)
+def invalidate_alert(sender, instance, **kwargs):
+    _invalidate_on_commit('alerts')
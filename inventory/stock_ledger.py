@@ -0,0 +1,388 @@
+"""
+سجل أرصدة المخزون المحفوظة
+يحدّث أرصدة المنتجات والمستودعات مع كل حركة مخزون بدلاً من تجميع الحركات عند كل قراءة
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, DateField, DecimalField, ExpressionWrapper, F, Func, OuterRef, Q, Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from .models import Product, StockBalance, StockTransaction, WarehouseStock
+
+ZERO = Decimal('0')
+
+# الكمية الموقّعة للحركة: موجبة للوارد وسالبة للصادر وصفر لبقية الأنواع
+SIGNED_QUANTITY = Case(
+    When(transaction_type='in', then=F('quantity')),
+    When(transaction_type='out', then=-F('quantity')),
+    default=Value(ZERO),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+
+
+def signed_quantity(transaction_type, quantity):
+    """
+    تحويل نوع الحركة وكميتها إلى التغير في الرصيد
+    """
+    if transaction_type == 'in':
+        return Decimal(str(quantity))
+    if transaction_type == 'out':
+        return -Decimal(str(quantity))
+    return ZERO
+
+
+def _movement(entry):
+    """
+    استخراج (المنتج، المستودع، التغير) من حركة محفوظة أو من قاموس قيمها
+    """
+    if entry is None:
+        return None
+    if isinstance(entry, dict):
+        return (
+            entry['product_id'],
+            entry['warehouse_id'],
+            signed_quantity(entry['transaction_type'], entry['quantity']),
+        )
+    return (
+        entry.product_id,
+        entry.warehouse_id,
+        signed_quantity(entry.transaction_type, entry.quantity),
+    )
+
+
+def _increment(model, lookup, delta):
+    """
+    زيادة رصيد ذري باستخدام UPDATE مع إنشاء الصف عند عدم وجوده
+    """
+    now = timezone.now()
+    updated = model.objects.filter(**lookup).update(
+        quantity=F('quantity') + delta, updated_at=now
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(quantity=delta, **lookup)
+    except IntegrityError:
+        # أنشأ طلب متزامن الصف في نفس اللحظة
+        model.objects.filter(**lookup).update(
+            quantity=F('quantity') + delta, updated_at=now
+        )
+
+
+def apply_stock_delta(product_id, warehouse_id, delta):
+    """
+    تطبيق تغير على رصيد المنتج ورصيد المستودع (إن وجد)
+    يجب استدعاؤها داخل نفس معاملة قاعدة البيانات التي تحفظ الحركة
+    """
+    if not delta:
+        return
+    _increment(StockBalance, {'product_id': product_id}, delta)
+    if warehouse_id:
+        _increment(
+            WarehouseStock,
+            {'product_id': product_id, 'warehouse_id': warehouse_id},
+            delta,
+        )
+
+
+def apply_transaction_change(previous=None, current=None):
+    """
+    عكس أثر الحالة السابقة للحركة ثم تطبيق أثر حالتها الحالية
+    """
+    old = _movement(previous)
+    new = _movement(current)
+    if old == new:
+        return
+    if old:
+        apply_stock_delta(old[0], old[1], -old[2])
+    if new:
+        apply_stock_delta(new[0], new[1], new[2])
+
+
+def get_stock_level(product_id):
+    """
+    قراءة الرصيد المحفوظ للمنتج في استعلام واحد
+    """
+    quantity = StockBalance.objects.filter(product_id=product_id).values_list(
+        'quantity', flat=True
+    ).first()
+    return quantity if quantity is not None else ZERO
+
+
+def stock_level_expression(prefix=''):
+    """
+    تعبير لقراءة الرصيد المحفوظ داخل استعلام المنتجات (صفر عند عدم وجود رصيد)
+    """
+    return Coalesce(
+        F(f'{prefix}stock_balance__quantity'),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def movement_since_expression(since):
+    """
+    تعبير استعلام فرعي لصافي حركة المنتج بعد تاريخ معين (يُستخدم مع استعلام المنتجات)
+    """
+    movements = StockTransaction.objects.filter(
+        product=OuterRef('pk'), date__gt=since
+    ).order_by().values('product').annotate(total=Sum(SIGNED_QUANTITY)).values('total')
+    return Coalesce(
+        Subquery(movements, output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def _stock_value(quantity):
+    """
+    مجموع (الكمية × السعر) لكل المنتجات
+    """
+    return Sum(ExpressionWrapper(
+        quantity * F('price'), output_field=DecimalField(max_digits=20, decimal_places=4)
+    ))
+
+
+def get_inventory_valuation(*points):
+    """
+    قيمة المخزون الحالية وقيمته في تواريخ سابقة باستعلام واحد
+
+    الرصيد في تاريخ سابق = الرصيد المحفوظ - صافي الحركات بعد ذلك التاريخ،
+    ويُقيَّم بسعر المنتج الحالي لعدم وجود سجل تاريخي للأسعار
+
+    Args:
+        points: تواريخ (datetime) المطلوب حساب القيمة عندها
+
+    Returns:
+        قاموس {'current': القيمة الحالية, 'points': {التاريخ: القيمة}}
+    """
+    stock = stock_level_expression()
+    aggregates = {'current': _stock_value(stock)}
+    for index, point in enumerate(points):
+        aggregates[f'point_{index}'] = _stock_value(stock - movement_since_expression(point))
+
+    result = Product.objects.aggregate(**aggregates)
+    return {
+        'current': result['current'] or ZERO,
+        'points': {
+            point: result[f'point_{index}'] or ZERO for index, point in enumerate(points)
+        },
+    }
+
+
+TIMELINE_PERIODS = ('day', 'week', 'month')
+
+
+class _GroupSum(Func):
+    """
+    SUM تقبل التداخل داخل دالة نافذة (SUM(SUM(...)) OVER) لأن Django يرفض Sum(Sum(...))
+    """
+    function = 'SUM'
+    contains_aggregate = True
+    window_compatible = True
+    output_field = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _period_start(day, period):
+    """
+    بداية الفترة التي يقع فيها اليوم (الأسبوع يبدأ يوم الاثنين كما في Trunc)
+    """
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(day, period):
+    if period == 'week':
+        return day + datetime.timedelta(days=7)
+    if period == 'month':
+        return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return day + datetime.timedelta(days=1)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def get_stock_timeline(start_date, end_date, product_id=None, warehouse_id=None, period='day'):
+    """
+    الرصيد الافتتاحي والوارد والصادر والرصيد الختامي لكل فترة باستعلام مجمّع واحد
+
+    كل الحركات قبل بداية الفترة تُجمع في صف واحد (الرصيد الافتتاحي)، وبقية الحركات
+    تُجمع حسب اليوم أو الأسبوع أو الشهر، ثم يحسب مجموع نافذة تراكمي رصيد نهاية كل فترة
+
+    Args:
+        start_date: أول يوم في الفترة (date)
+        end_date: آخر يوم في الفترة (date)
+        product_id: منتج محدد أو None لكل المنتجات
+        warehouse_id: مستودع محدد أو None لكل المستودعات
+        period: 'day' أو 'week' أو 'month'
+
+    Returns:
+        قاموس يحتوي على opening و closing و total_in و total_out للفترة،
+        و opening_in و opening_out قبلها، و rows: قائمة {'date', 'in', 'out', 'balance'}
+    """
+    if period not in TIMELINE_PERIODS:
+        raise ValueError(f"فترة غير مدعومة: {period}")
+
+    start = _day_start(start_date)
+    transactions = StockTransaction.objects.filter(
+        date__lt=_day_start(end_date + datetime.timedelta(days=1))
+    )
+    if product_id is not None:
+        transactions = transactions.filter(product_id=product_id)
+    if warehouse_id is not None:
+        transactions = transactions.filter(warehouse_id=warehouse_id)
+
+    # كل الحركات السابقة تُجمع تحت يوم يسبق أول فترة ليظهر رصيدها أولاً في ترتيب النافذة
+    first_period = _period_start(start_date, period)
+    opening_key = first_period - datetime.timedelta(days=1)
+    bucket = Case(
+        When(date__lt=start, then=Value(opening_key)),
+        default=Trunc('date', period, output_field=DateField()),
+        output_field=DateField(),
+    )
+    rows = transactions.order_by().annotate(bucket=bucket).values('bucket').annotate(
+        quantity_in=Coalesce(Sum('quantity', filter=Q(transaction_type='in')), Value(ZERO)),
+        quantity_out=Coalesce(Sum('quantity', filter=Q(transaction_type='out')), Value(ZERO)),
+    ).annotate(
+        # النافذة تُضاف بعد التجميع حتى لا تدخل في GROUP BY
+        balance=Window(_GroupSum(_GroupSum(SIGNED_QUANTITY)), order_by=F('bucket').asc()),
+    ).order_by('bucket')
+
+    opening = opening_in = opening_out = ZERO
+    movements = {}
+    for row in rows:
+        if row['bucket'] == opening_key:
+            opening = row['balance'] or ZERO
+            opening_in, opening_out = row['quantity_in'], row['quantity_out']
+        else:
+            movements[row['bucket']] = row
+
+    # ملء الفترات بدون حركات برصيد الفترة السابقة
+    timeline = []
+    balance = opening
+    total_in = total_out = ZERO
+    day = first_period
+    while day <= end_date:
+        row = movements.get(day)
+        quantity_in = quantity_out = ZERO
+        if row:
+            quantity_in, quantity_out, balance = row['quantity_in'], row['quantity_out'], row['balance']
+        total_in += quantity_in
+        total_out += quantity_out
+        timeline.append({'date': day, 'in': quantity_in, 'out': quantity_out, 'balance': balance})
+        day = _next_period(day, period)
+
+    return {
+        'opening': opening,
+        'opening_in': opening_in,
+        'opening_out': opening_out,
+        'total_in': total_in,
+        'total_out': total_out,
+        'closing': balance,
+        'rows': timeline,
+    }
+
+
+def _expected_balances(product_ids=None):
+    """
+    حساب الأرصدة المتوقعة من سجل الحركات باستعلامين مجمّعين
+    """
+    transactions = StockTransaction.objects.all()
+    if product_ids is not None:
+        transactions = transactions.filter(product_id__in=product_ids)
+
+    per_product = {
+        row['product_id']: row['total'] or ZERO
+        for row in transactions.order_by().values('product_id').annotate(total=Sum(SIGNED_QUANTITY))
+    }
+    per_warehouse = {
+        (row['product_id'], row['warehouse_id']): row['total'] or ZERO
+        for row in transactions.filter(warehouse__isnull=False).order_by().values(
+            'product_id', 'warehouse_id'
+        ).annotate(total=Sum(SIGNED_QUANTITY))
+    }
+    return per_product, per_warehouse
+
+
+def _sync(model, stored, expected, key_fields, apply):
+    """
+    مقارنة الأرصدة المحفوظة بالمتوقعة وإصلاحها إذا طُلب ذلك
+    """
+    mismatches = []
+    to_create = []
+    to_update = []
+    for key in set(stored) | set(expected):
+        want = expected.get(key, ZERO)
+        row = stored.get(key)
+        have = row.quantity if row is not None else ZERO
+        if have == want:
+            continue
+        key_values = key if isinstance(key, tuple) else (key,)
+        lookup = dict(zip(key_fields, key_values))
+        mismatches.append({**lookup, 'stored': have, 'expected': want})
+        if row is None:
+            to_create.append(model(quantity=want, **lookup))
+        else:
+            row.quantity = want
+            to_update.append(row)
+
+    if apply:
+        model.objects.bulk_create(to_create, batch_size=1000)
+        model.objects.bulk_update(to_update, ['quantity', 'updated_at'], batch_size=1000)
+    return mismatches
+
+
+def rebuild_stock_balances(product_ids=None, apply=True):
+    """
+    إعادة بناء الأرصدة المحفوظة أو مطابقتها مع سجل الحركات
+
+    Args:
+        product_ids: قصر العملية على منتجات محددة (اختياري)
+        apply: عند False يتم الإبلاغ عن الفروقات فقط دون تعديلها
+
+    Returns:
+        قاموس يحتوي على فروقات أرصدة المنتجات والمستودعات
+    """
+    with transaction.atomic():
+        per_product, per_warehouse = _expected_balances(product_ids)
+
+        balances = StockBalance.objects.select_for_update()
+        warehouse_stocks = WarehouseStock.objects.select_for_update()
+        if product_ids is not None:
+            balances = balances.filter(product_id__in=product_ids)
+            warehouse_stocks = warehouse_stocks.filter(product_id__in=product_ids)
+
+        now = timezone.now()
+        stored_products = {}
+        for balance in balances:
+            balance.updated_at = now
+            stored_products[balance.product_id] = balance
+        stored_warehouses = {}
+        for stock in warehouse_stocks:
+            stock.updated_at = now
+            stored_warehouses[(stock.product_id, stock.warehouse_id)] = stock
+
+        result = {
+            'products': _sync(StockBalance, stored_products, per_product, ('product_id',), apply),
+            'warehouses': _sync(
+                WarehouseStock, stored_warehouses, per_warehouse, ('product_id', 'warehouse_id'), apply
+            ),
+        }
+
+    if apply and (result['products'] or result['warehouses']):
+        from .cache_utils import invalidate
+
+        changed = {row['product_id'] for row in result['products'] + result['warehouses']}
+        invalidate('stock', *[f'product:{product_id}' for product_id in changed])
+    return result
@@ -14,7 +14,7 @@ from .views_warehouse_locations import (
     warehouse_location_delete, warehouse_location_detail
 )
 from .views_reports import (
-    report_list, low_stock_report, stock_movement_report
+    report_list, low_stock_report, low_stock_export, stock_movement_report
 )
 
 app_name = 'inventory'
@@ -75,6 +75,7 @@ urlpatterns = [
     # Reports
     path('reports/', report_list, name='report_list'),
     path('reports/low-stock/', low_stock_report, name='low_stock_report'),
+    path('reports/low-stock/export/', low_stock_export, name='low_stock_export'),
     path('reports/stock-movement/', stock_movement_report, name='stock_movement_report'),
     path('product/<int:product_id>/detail/', optimized_product_detail, name='optimized_product_detail'),
 
@@ -86,6 +87,8 @@ urlpatterns = [
 
     # API Endpoints
     path('api/product/<int:pk>/', views.product_api_detail, name='product_api_detail'),
+    path('api/product/<int:pk>/timeline/', views.product_timeline_api, name='product_timeline_api'),
     path('api/products/', views.product_api_list, name='product_api_list'),
+    path('api/cache-stats/', views.cache_stats_api, name='cache_stats_api'),
 ]
 
@@ -8,10 +8,10 @@ from django.db.models import Q
 from .models import Product, Category, PurchaseOrder
 from .inventory_utils import (
     get_cached_stock_level,
-    get_cached_product_list,
     get_cached_dashboard_stats,
     invalidate_product_cache
 )
+from .cache_utils import attach_stock_levels, decode_product_cursor, get_cached_product_page, PRODUCT_PAGE_SIZE
 
 class InventoryDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'inventory/dashboard_new_icons.html'
@@ -22,14 +22,15 @@ class InventoryDashboardView(LoginRequiredMixin, TemplateView):
         # استخدام التخزين المؤقت للإحصائيات
         stats = get_cached_dashboard_stats()
         context.update(stats)
+        context['low_stock_products_count'] = stats['low_stock_count']
 
         # إضافة active_menu للقائمة الجانبية
         context['active_menu'] = 'dashboard'
 
         # الحصول على المنتجات منخفضة المخزون
-        products = get_cached_product_list(include_stock=True)
-        low_stock_products = [p for p in products if 0 < p.current_stock_calc <= p.minimum_stock]
-        context['low_stock_products'] = low_stock_products[:10]
+        context['low_stock_products'] = Product.objects.low_stock().select_related(
+            'category'
+        ).order_by('current_stock_calc')[:10]
 
         # الحصول على آخر حركات المخزون
         from .models import StockTransaction
@@ -45,23 +46,15 @@ class InventoryDashboardView(LoginRequiredMixin, TemplateView):
 
         # بيانات الرسم البياني للمخزون حسب الفئة
         from django.db.models import Sum, Count
-        from .models import Category, Product
+        from .models import Category
 
-        stock_by_category = []
-        categories = Category.objects.all()
-
-        for category in categories:
-            # حساب إجمالي المخزون لكل فئة
-            products_in_category = Product.objects.filter(category=category)
-            total_stock = 0
-
-            for product in products_in_category:
-                total_stock += get_cached_stock_level(product.id)
-
-            stock_by_category.append({
-                'name': category.name,
-                'stock': total_stock
-            })
+        # حساب إجمالي المخزون لكل فئة في استعلام واحد من الأرصدة المحفوظة
+        stock_by_category = [
+            {'name': category['name'], 'stock': category['stock'] or 0}
+            for category in Category.objects.annotate(
+                stock=Sum('products__stock_balance__quantity')
+            ).values('name', 'stock')
+        ]
 
         context['stock_by_category'] = stock_by_category
 
@@ -124,35 +117,36 @@ def product_list(request):
     filter_type = request.GET.get('filter', '')
     sort_by = request.GET.get('sort', '-created_at')
 
-    # الحصول على المنتجات من الذاكرة المؤقتة
-    products = get_cached_product_list(
-        category_id=category_id if category_id else None,
-        include_stock=True
-    )
+    # بناء الاستعلام في قاعدة البيانات بدلاً من تحميل كل المنتجات
+    products = Product.objects.select_related('category')
+    if category_id:
+        products = products.filter(Q(category_id=category_id) | Q(category__parent_id=category_id))
 
     # تطبيق البحث
     if search_query:
-        products = [p for p in products if
-                   search_query.lower() in p.name.lower() or
-                   search_query in str(p.code) or
-                   search_query.lower() in p.description.lower()]
+        products = products.filter(
+            Q(name__icontains=search_query) |
+            Q(code__icontains=search_query) |
+            Q(description__icontains=search_query)
+        )
 
     # تطبيق فلتر المخزون
     if filter_type == 'low_stock':
-        products = [p for p in products if 0 < p.current_stock_calc <= p.minimum_stock]
+        products = products.low_stock()
     elif filter_type == 'out_of_stock':
-        products = [p for p in products if p.current_stock_calc <= 0]
+        products = products.out_of_stock()
 
     # تطبيق الترتيب
-    if hasattr(Product, sort_by.lstrip('-')):
-        products = sorted(products,
-                        key=lambda x: getattr(x, sort_by.lstrip('-')),
-                        reverse=sort_by.startswith('-'))
+    sortable_fields = {field.name for field in Product._meta.concrete_fields}
+    if sort_by.lstrip('-') not in sortable_fields:
+        sort_by = '-created_at'
+    products = products.order_by(sort_by, '-id')
 
-    # الصفحات
+    # الصفحات: يتم جلب المخزون لمنتجات الصفحة الحالية فقط
     paginator = Paginator(products, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.object_list = attach_stock_levels(page_obj.object_list)
 
     # إضافة عدد التنبيهات النشطة
     from .models import StockAlert
@@ -281,56 +275,19 @@ def product_detail(request, pk):
         'created_by'
     ).order_by('-date')
 
-    # حساب إجمالي الوارد والصادر
-    from django.db.models import Sum
-    transactions_in = product.transactions.filter(transaction_type='in')
-    transactions_out = product.transactions.filter(transaction_type='out')
-
-    transactions_in_total = transactions_in.aggregate(total=Sum('quantity'))['total'] or 0
-    transactions_out_total = transactions_out.aggregate(total=Sum('quantity'))['total'] or 0
-
-    # إعداد بيانات الرسم البياني
+    # رصيد آخر 30 يوم وإجماليات الوارد والصادر من استعلام مجمّع واحد
     from django.utils import timezone
     from datetime import timedelta
+    from .stock_ledger import get_stock_timeline
 
-    # الحصول على تواريخ آخر 30 يوم
-    end_date = timezone.now().date()
+    end_date = timezone.localdate()
     start_date = end_date - timedelta(days=29)
+    timeline = get_stock_timeline(start_date, end_date, product_id=product.id)
 
-    # الحصول على المعاملات في الفترة المحددة
-    period_transactions = transactions.filter(date__date__gte=start_date, date__date__lte=end_date)
-
-    # إعداد قائمة التواريخ والأرصدة
-    transaction_dates = []
-    transaction_balances = []
-
-    # حساب الرصيد الافتتاحي
-    opening_balance = transactions.filter(date__date__lt=start_date).aggregate(
-        in_total=Sum('quantity', filter=Q(transaction_type='in')),
-        out_total=Sum('quantity', filter=Q(transaction_type='out'))
-    )
-
-    opening_in = opening_balance['in_total'] or 0
-    opening_out = opening_balance['out_total'] or 0
-    balance = opening_in - opening_out
-
-    # إضافة الرصيد لكل يوم
-    current_date = start_date
-    while current_date <= end_date:
-        # حساب حركات اليوم
-        day_transactions = period_transactions.filter(date__date=current_date)
-        day_in = day_transactions.filter(transaction_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-        day_out = day_transactions.filter(transaction_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-
-        # تحديث الرصيد
-        balance += day_in - day_out
-
-        # إضافة اليوم والرصيد إلى القوائم
-        transaction_dates.append(current_date)
-        transaction_balances.append(balance)
-
-        # الانتقال إلى اليوم التالي
-        current_date += timedelta(days=1)
+    transactions_in_total = timeline['opening_in'] + timeline['total_in']
+    transactions_out_total = timeline['opening_out'] + timeline['total_out']
+    transaction_dates = [row['date'] for row in timeline['rows']]
+    transaction_balances = [row['balance'] for row in timeline['rows']]
 
     # إضافة عدد التنبيهات النشطة
     from .models import StockAlert
@@ -463,6 +420,7 @@ def transaction_create(request, product_pk):
 
 # API Endpoints
 from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
 
 @login_required
 def product_api_detail(request, pk):
@@ -484,34 +442,113 @@ def product_api_detail(request, pk):
     except Product.DoesNotExist:
         return JsonResponse({'error': 'المنتج غير موجود'}, status=404)
 
+# أسماء الفئات المقابلة لنوع المنتج في ?type=
+PRODUCT_TYPE_CATEGORIES = {
+    'fabric': 'أقمشة',
+    'accessory': 'اكسسوارات',
+}
+
 @login_required
 def product_api_list(request):
-    product_type = request.GET.get('type')
-
-    # الحصول على المنتجات من الذاكرة المؤقتة
-    products = get_cached_product_list(include_stock=True)
-
-    # تطبيق الفلتر حسب النوع
-    if product_type:
-        if product_type == 'fabric':
-            products = [p for p in products if p.category.name == 'أقمشة']
-        elif product_type == 'accessory':
-            products = [p for p in products if p.category.name == 'اكسسوارات']
-
-    # تحويل إلى JSON
-    data = [{
-        'id': p.id,
-        'name': p.name,
-        'code': p.code,
-        'category': str(p.category),
-        'description': p.description,
-        'price': p.price,
-        'minimum_stock': p.minimum_stock,
-        'current_stock': p.current_stock_calc,
-    } for p in products]
+    category_name = PRODUCT_TYPE_CATEGORIES.get(request.GET.get('type'))
+    category_id = request.GET.get('category') or None
+    if category_id is not None:
+        try:
+            category_id = int(category_id)
+        except ValueError:
+            return JsonResponse({'error': 'category غير صالح'}, status=400)
+
+    def serialize(p, current_stock):
+        return {
+            'id': p.id,
+            'name': p.name,
+            'code': p.code,
+            'category': str(p.category),
+            'description': p.description,
+            'price': p.price,
+            'minimum_stock': p.minimum_stock,
+            'current_stock': current_stock,
+        }
+
+    # الصفحات بالمؤشر عند طلبها: ?page_size=50&cursor=...
+    if 'cursor' in request.GET or 'page_size' in request.GET:
+        try:
+            page_size = int(request.GET.get('page_size', PRODUCT_PAGE_SIZE))
+        except ValueError:
+            page_size = PRODUCT_PAGE_SIZE
+        cursor = request.GET.get('cursor') or None
+        if cursor and decode_product_cursor(cursor) is None:
+            return JsonResponse({'error': 'cursor غير صالح'}, status=400)
+        page = get_cached_product_page(
+            category_id=category_id,
+            category_name=category_name,
+            cursor=cursor,
+            page_size=page_size,
+        )
+        return JsonResponse({
+            'results': [serialize(p, p.current_stock_calc) for p in page['products']],
+            'next_cursor': page['next_cursor'],
+            'has_next': page['has_next'],
+        })
+
+    # القائمة الكاملة (للتوافق مع نموذج الطلب) مع تطبيق الفلتر في قاعدة البيانات
+    products = Product.objects.select_related('category').with_stock_level()
+    if category_id:
+        products = products.filter(Q(category_id=category_id) | Q(category__parent_id=category_id))
+    if category_name:
+        products = products.filter(category__name=category_name)
+
+    data = [serialize(p, p.current_stock_calc) for p in products.iterator(chunk_size=2000)]
 
     return JsonResponse(data, safe=False)
 
+@login_required
+def product_timeline_api(request, pk):
+    """
+    الرصيد الافتتاحي والوارد والصادر والرصيد الختامي للمنتج لكل يوم أو أسبوع أو شهر
+    المعاملات: start و end (YYYY-MM-DD)، period، warehouse
+    """
+    from datetime import datetime, timedelta
+    from django.utils import timezone
+    from .stock_ledger import get_stock_timeline
+
+    product = get_object_or_404(Product, pk=pk)
+    try:
+        end_date = (
+            datetime.strptime(request.GET['end'], '%Y-%m-%d').date()
+            if request.GET.get('end') else timezone.localdate()
+        )
+        start_date = (
+            datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+            if request.GET.get('start') else end_date - timedelta(days=29)
+        )
+        warehouse_id = int(request.GET['warehouse']) if request.GET.get('warehouse') else None
+        timeline = get_stock_timeline(
+            start_date, end_date,
+            product_id=product.id,
+            warehouse_id=warehouse_id,
+            period=request.GET.get('period', 'day'),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'product': product.id,
+        'start': start_date,
+        'end': end_date,
+        'opening': timeline['opening'],
+        'closing': timeline['closing'],
+        'total_in': timeline['total_in'],
+        'total_out': timeline['total_out'],
+        'rows': timeline['rows'],
+    })
+
+@staff_member_required
+def cache_stats_api(request):
+    """عدادات إصابة وإخفاق الذاكرة المؤقتة للمخزون في هذه العملية"""
+    from .cache_utils import get_cache_stats
+    return JsonResponse(get_cache_stats())
+
 # New API View
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
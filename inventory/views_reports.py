@@ -1,10 +1,16 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q
+import csv
+import tempfile
+
+from django.core.paginator import Paginator
+from django.db.models import Sum, Count, OuterRef, Q, Subquery
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
 from datetime import timedelta, datetime
-from .models import Product, StockTransaction, StockAlert
+from .models import Category, Product, StockTransaction, StockAlert
 from .inventory_utils import get_cached_product_list, get_cached_stock_level
+from .stock_ledger import get_stock_timeline
 
 @login_required
 def report_list(request):
@@ -39,6 +45,35 @@ def report_list(request):
     }
     return render(request, 'inventory/report_list.html', context)
 
+# ترتيب تقارير المخزون المنخفض (المفتاح الأساسي يضمن ترتيباً ثابتاً بين الصفحات)
+LOW_STOCK_SORTS = {
+    'name': ('name', 'pk'),
+    '-name': ('-name', '-pk'),
+    'stock': ('current_stock_calc', 'pk'),
+    '-stock': ('-current_stock_calc', '-pk'),
+    'category': ('category__name', 'pk'),
+}
+LOW_STOCK_PAGE_SIZE = 50
+
+
+def _stock_report_queryset(kind, search_query='', category_id='', sort_by='stock'):
+    """
+    استعلام تقرير المخزون المنخفض ('low') أو النافد ('out') مع البحث والترتيب في قاعدة البيانات
+    """
+    products = Product.objects.select_related('category')
+    if category_id:
+        products = products.filter(Q(category_id=category_id) | Q(category__parent_id=category_id))
+    products = products.search(search_query)
+    products = products.low_stock() if kind == 'low' else products.out_of_stock()
+    return products.order_by(*LOW_STOCK_SORTS.get(sort_by, LOW_STOCK_SORTS['stock']))
+
+
+def _stock_percentage(product):
+    if product.minimum_stock > 0:
+        return min(int(product.current_stock_calc / product.minimum_stock * 100), 100)
+    return 100
+
+
 @login_required
 def low_stock_report(request):
     """View for low stock report"""
@@ -47,43 +82,27 @@ def low_stock_report(request):
     category_id = request.GET.get('category', '')
     sort_by = request.GET.get('sort', 'stock')
 
-    # الحصول على المنتجات من الذاكرة المؤقتة
-    products = get_cached_product_list(
-        category_id=category_id if category_id else None,
-        include_stock=True
-    )
+    # كل قسم صفحات مستقلة؛ يُجلب من قاعدة البيانات عدد الصفحة فقط
+    low_stock_page = Paginator(
+        _stock_report_queryset('low', search_query, category_id, sort_by), LOW_STOCK_PAGE_SIZE
+    ).get_page(request.GET.get('low_page'))
+    for product in low_stock_page:
+        product.stock_percentage = _stock_percentage(product)
 
-    # تصفية المنتجات منخفضة المخزون
-    low_stock_products = [p for p in products if 0 < p.current_stock_calc <= p.minimum_stock]
-    out_of_stock_products = [p for p in products if p.current_stock_calc <= 0]
+    last_transaction = StockTransaction.objects.filter(
+        product=OuterRef('pk')
+    ).order_by('-date').values('date')[:1]
+    out_of_stock_page = Paginator(
+        _stock_report_queryset('out', search_query, category_id, sort_by).annotate(
+            last_transaction_date=Subquery(last_transaction)
+        ),
+        LOW_STOCK_PAGE_SIZE,
+    ).get_page(request.GET.get('out_page'))
 
-    # تطبيق البحث
-    if search_query:
-        low_stock_products = [p for p in low_stock_products if
-                             search_query.lower() in p.name.lower() or
-                             search_query in str(p.code) or
-                             search_query.lower() in p.description.lower()]
-        out_of_stock_products = [p for p in out_of_stock_products if
-                                search_query.lower() in p.name.lower() or
-                                search_query in str(p.code) or
-                                search_query.lower() in p.description.lower()]
-
-    # تطبيق الترتيب
-    if sort_by == 'name':
-        low_stock_products = sorted(low_stock_products, key=lambda x: x.name)
-        out_of_stock_products = sorted(out_of_stock_products, key=lambda x: x.name)
-    elif sort_by == '-name':
-        low_stock_products = sorted(low_stock_products, key=lambda x: x.name, reverse=True)
-        out_of_stock_products = sorted(out_of_stock_products, key=lambda x: x.name, reverse=True)
-    elif sort_by == 'stock':
-        low_stock_products = sorted(low_stock_products, key=lambda x: x.current_stock_calc)
-        out_of_stock_products = sorted(out_of_stock_products, key=lambda x: x.current_stock_calc)
-    elif sort_by == '-stock':
-        low_stock_products = sorted(low_stock_products, key=lambda x: x.current_stock_calc, reverse=True)
-        out_of_stock_products = sorted(out_of_stock_products, key=lambda x: x.current_stock_calc, reverse=True)
-    elif sort_by == 'category':
-        low_stock_products = sorted(low_stock_products, key=lambda x: x.category.name if x.category else '')
-        out_of_stock_products = sorted(out_of_stock_products, key=lambda x: x.category.name if x.category else '')
+    # معاملات البحث الحالية لروابط الصفحات والتصدير
+    filters = request.GET.copy()
+    for key in ('low_page', 'out_page', 'format', 'kind'):
+        filters.pop(key, None)
 
     # إضافة عدد التنبيهات النشطة
     alerts_count = StockAlert.objects.filter(status='active').count()
@@ -97,8 +116,12 @@ def low_stock_report(request):
     current_year = datetime.now().year
 
     context = {
-        'low_stock_products': low_stock_products,
-        'out_of_stock_products': out_of_stock_products,
+        'low_stock_products': low_stock_page,
+        'out_of_stock_products': out_of_stock_page,
+        'low_stock_count': low_stock_page.paginator.count,
+        'out_of_stock_count': out_of_stock_page.paginator.count,
+        'filters': filters.urlencode(),
+        'categories': Category.objects.all(),
         'search_query': search_query,
         'selected_category': category_id,
         'sort_by': sort_by,
@@ -141,25 +164,39 @@ def stock_movement_report(request):
         transactions = transactions.filter(transaction_type=transaction_type)
 
     # تصفية حسب الفترة الزمنية
-    today = timezone.now().date()
+    today = timezone.localdate()
+    start_date = None
     if date_range == 'today':
-        transactions = transactions.filter(date__date=today)
+        start_date = today
     elif date_range == 'week':
-        start_of_week = today - timedelta(days=today.weekday())
-        transactions = transactions.filter(date__date__gte=start_of_week)
+        start_date = today - timedelta(days=today.weekday())
     elif date_range == 'month':
-        transactions = transactions.filter(date__date__year=today.year, date__date__month=today.month)
+        start_date = today.replace(day=1)
     elif date_range == 'quarter':
         current_quarter = (today.month - 1) // 3 + 1
-        quarter_start_month = (current_quarter - 1) * 3 + 1
-        quarter_start_date = timezone.datetime(today.year, quarter_start_month, 1).date()
-        transactions = transactions.filter(date__date__gte=quarter_start_date)
+        start_date = today.replace(month=(current_quarter - 1) * 3 + 1, day=1)
     elif date_range == 'year':
-        transactions = transactions.filter(date__date__year=today.year)
+        start_date = today.replace(month=1, day=1)
+    if start_date:
+        transactions = transactions.filter(date__date__gte=start_date)
 
-    # الإحصائيات
-    total_in = transactions.filter(transaction_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-    total_out = transactions.filter(transaction_type='out').aggregate(total=Sum('quantity'))['total'] or 0
+    # الإحصائيات: الخط الزمني للمخزون يعطي الإجماليات والرصيد الافتتاحي والختامي في استعلام واحد
+    timeline = None
+    if start_date and not search_query:
+        timeline = get_stock_timeline(
+            start_date, today,
+            product_id=int(product_id) if product_id else None,
+            period='month' if date_range == 'year' else 'day',
+        )
+        total_in = timeline['total_in'] if transaction_type in ('', 'in') else 0
+        total_out = timeline['total_out'] if transaction_type in ('', 'out') else 0
+    else:
+        totals = transactions.aggregate(
+            total_in=Sum('quantity', filter=Q(transaction_type='in')),
+            total_out=Sum('quantity', filter=Q(transaction_type='out')),
+        )
+        total_in = totals['total_in'] or 0
+        total_out = totals['total_out'] or 0
     net_change = total_in - total_out
 
     # إضافة عدد التنبيهات النشطة
@@ -182,6 +219,7 @@ def stock_movement_report(request):
         'total_in': total_in,
         'total_out': total_out,
         'net_change': net_change,
+        'timeline': timeline,
         'search_query': search_query,
         'selected_product': product_id,
         'selected_type': transaction_type,
@@ -192,3 +230,74 @@ def stock_movement_report(request):
         'current_year': current_year
     }
     return render(request, 'inventory/stock_movement_report.html', context)
+
+
+class _Echo:
+    """
+    كائن شبيه بالملف يعيد ما يُكتب فيه حتى يُرسل كل صف CSV مباشرة
+    """
+    def write(self, value):
+        return value
+
+
+LOW_STOCK_EXPORT_HEADERS = ['الحالة', 'المنتج', 'الكود', 'الفئة', 'المخزون الحالي', 'الحد الأدنى', 'السعر']
+
+
+def _stock_export_rows(kinds, search_query, category_id, sort_by):
+    """
+    صفوف التصدير على دفعات من قاعدة البيانات دون تحميل التقرير كاملاً في الذاكرة
+    """
+    labels = {'low': 'مخزون منخفض', 'out': 'نفذ من المخزون'}
+    for kind in kinds:
+        products = _stock_report_queryset(kind, search_query, category_id, sort_by).values_list(
+            'name', 'code', 'category__name', 'current_stock_calc', 'minimum_stock', 'price'
+        )
+        for name, code, category, stock, minimum, price in products.iterator(chunk_size=2000):
+            yield [labels[kind], name, code or '', category or '', stock, minimum, price]
+
+
+@login_required
+def low_stock_export(request):
+    """
+    تصدير تقرير المخزون المنخفض والنافد بصيغة CSV (متدفق) أو XLSX (وضع الكتابة فقط)
+    المعاملات: format=csv|xlsx و kind=low|out (الافتراضي كلاهما) مع نفس فلاتر التقرير
+    """
+    search_query = request.GET.get('search', '')
+    category_id = request.GET.get('category', '')
+    sort_by = request.GET.get('sort', 'stock')
+    kind = request.GET.get('kind')
+    kinds = [kind] if kind in ('low', 'out') else ['low', 'out']
+    export_format = request.GET.get('format', 'csv')
+    rows = _stock_export_rows(kinds, search_query, category_id, sort_by)
+    filename = f"low_stock_{timezone.localdate():%Y%m%d}"
+
+    if export_format == 'xlsx':
+        from openpyxl import Workbook
+
+        # وضع الكتابة فقط يكتب الصفوف إلى الملف مباشرة بذاكرة ثابتة
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('المخزون المنخفض')
+        sheet.append(LOW_STOCK_EXPORT_HEADERS)
+        for row in rows:
+            sheet.append(row)
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f"{filename}.xlsx",
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    writer = csv.writer(_Echo())
+
+    def stream():
+        # علامة BOM حتى يعرض Excel النص العربي بشكل صحيح
+        yield '\ufeff' + writer.writerow(LOW_STOCK_EXPORT_HEADERS)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
@@ -12,27 +12,33 @@ class OdooDbManagerConfig(AppConfig):
     verbose_name = _("إدارة قواعد البيانات")
 
     def ready(self):
-        """تهيئة التطبيق"""
-        # استيراد الإشارات
+        """تهيئة التطبيق
+
+        لا يتم الوصول إلى قاعدة البيانات أو تشغيل psql هنا: مزامنة قواعد البيانات واكتشافها
+        وبدء المجدول تتم في الخلفية لعمليات الخادم فقط، وعند الطلب في صفحات إدارة قواعد البيانات
+        """
+        from .services.startup import is_server_process, run_deferred, startup_report
+
         try:
-            import odoo_db_manager.signals
-
-            # مزامنة قواعد البيانات من ملف الإعدادات
-            from .services.database_service import DatabaseService
-            database_service = DatabaseService()
-            database_service.sync_databases_from_settings()
-
-            # اكتشاف ومزامنة قواعد البيانات الموجودة في PostgreSQL
-            database_service.sync_discovered_databases()
-
-            # بدء تشغيل خدمة النسخ الاحتياطية المجدولة
-            import os
-            if os.environ.get('RUN_MAIN', None) != 'true':
-                # تجنب التشغيل المزدوج في وضع التطوير
-                from .services.scheduled_backup_service import scheduled_backup_service
-                scheduled_backup_service.start()
-                print("تم بدء تشغيل خدمة النسخ الاحتياطية المجدولة")
+            # استيراد الإشارات
+            with startup_report.step('الإشارات'):
+                import odoo_db_manager.signals
+
+            # أوامر الإدارة (migrate و shell وغيرها) لا تحتاج إلى المزامنة أو المجدول
+            if is_server_process():
+                from .services.database_discovery import ensure_databases_synced
+
+                run_deferred('مزامنة قواعد البيانات', ensure_databases_synced)
+
+                # بدء تشغيل خدمة النسخ الاحتياطية المجدولة
+                import os
+                if os.environ.get('RUN_MAIN', None) != 'true':
+                    # تجنب التشغيل المزدوج في وضع التطوير
+                    from .services.scheduled_backup_service import scheduled_backup_service
+                    run_deferred('بدء المجدول', scheduled_backup_service.start)
         except ImportError:
             pass
         except Exception as e:
             print(f"حدث خطأ أثناء تهيئة التطبيق: {str(e)}")
+
+        startup_report.report()
@@ -93,7 +93,7 @@ class BackupScheduleForm(forms.ModelForm):
         fields = [
             'database', 'name', 'backup_type', 'frequency',
             'hour', 'minute', 'day_of_week', 'day_of_month',
-            'max_backups', 'is_active'
+            'max_backups', 'keep_daily', 'keep_weekly', 'keep_monthly', 'is_active'
         ]
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -104,6 +104,9 @@ class BackupScheduleForm(forms.ModelForm):
             'day_of_week': forms.Select(attrs={'class': 'form-select'}),
             'day_of_month': forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 31}),
             'max_backups': forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 24}),
+            'keep_daily': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'keep_weekly': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'keep_monthly': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
     
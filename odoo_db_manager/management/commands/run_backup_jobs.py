@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from odoo_db_manager.services.background_jobs import JobWorker
+
+
+class Command(BaseCommand):
+    help = 'Runs queued backup/restore jobs (the Procfile worker process; BACKUP_JOBS_IN_PROCESS = True also runs them inside the web server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Number of jobs to run at the same time (default: BACKUP_JOBS_CONCURRENCY)',
+        )
+        parser.add_argument(
+            '--per-database',
+            type=int,
+            help='Maximum running jobs for a single database (default: BACKUP_JOBS_PER_DATABASE)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of waiting for new jobs',
+        )
+
+    def handle(self, *args, **options):
+        worker = JobWorker(
+            concurrency=options['concurrency'],
+            per_database=options['per_database'],
+        )
+        try:
+            worker.serve(once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping, waiting for running jobs to finish...')
+            worker.stop(wait=True)
+        self.stdout.write(self.style.SUCCESS('Backup job worker stopped'))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2025-05-30 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('odoo_db_manager', '0004_backup_is_scheduled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='details',
+            field=models.JSONField(blank=True, default=dict, verbose_name='التفاصيل'),
+        ),
+        migrations.AlterField(
+            model_name='backup',
+            name='backup_type',
+            field=models.CharField(choices=[('customers', 'بيانات العملاء'), ('users', 'بيانات المستخدمين'), ('settings', 'إعدادات النظام'), ('full', 'كل البيانات'), ('parallel', 'كل البيانات - نسخة متوازية (PostgreSQL)')], default='full', max_length=20, verbose_name='نوع النسخة الاحتياطية'),
+        ),
+        migrations.AlterField(
+            model_name='backupschedule',
+            name='backup_type',
+            field=models.CharField(choices=[('customers', 'بيانات العملاء'), ('users', 'بيانات المستخدمين'), ('settings', 'إعدادات النظام'), ('full', 'كل البيانات'), ('parallel', 'كل البيانات - نسخة متوازية (PostgreSQL)')], default='full', max_length=20, verbose_name='نوع النسخة الاحتياطية'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.21 on 2025-05-31 09:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('odoo_db_manager', '0005_backup_details_parallel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100, verbose_name='النموذج')),
+                ('object_pk', models.CharField(max_length=64, verbose_name='المعرف')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='تاريخ الحذف')),
+            ],
+            options={
+                'verbose_name': 'سجل محذوف',
+                'verbose_name_plural': 'السجلات المحذوفة',
+                'ordering': ['-deleted_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='incrementals', to='odoo_db_manager.backup', verbose_name='النسخة الأساسية'),
+        ),
+        migrations.AlterField(
+            model_name='backup',
+            name='backup_type',
+            field=models.CharField(choices=[('customers', 'بيانات العملاء'), ('users', 'بيانات المستخدمين'), ('settings', 'إعدادات النظام'), ('full', 'كل البيانات'), ('parallel', 'كل البيانات - نسخة متوازية (PostgreSQL)'), ('incremental', 'التغييرات فقط منذ النسخة السابقة')], default='full', max_length=20, verbose_name='نوع النسخة الاحتياطية'),
+        ),
+        migrations.AlterField(
+            model_name='backupschedule',
+            name='backup_type',
+            field=models.CharField(choices=[('customers', 'بيانات العملاء'), ('users', 'بيانات المستخدمين'), ('settings', 'إعدادات النظام'), ('full', 'كل البيانات'), ('parallel', 'كل البيانات - نسخة متوازية (PostgreSQL)'), ('incremental', 'التغييرات فقط منذ النسخة السابقة')], default='full', max_length=20, verbose_name='نوع النسخة الاحتياطية'),
+        ),
+    ]
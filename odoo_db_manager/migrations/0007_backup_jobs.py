@@ -0,0 +1,40 @@
+# Generated by Django 4.2.21 on 2025-06-01 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('odoo_db_manager', '0006_incremental_backups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('upload_restore', 'استعادة من ملف مرفوع')], max_length=30, verbose_name='نوع المهمة')),
+                ('status', models.CharField(choices=[('pending', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('completed', 'مكتملة'), ('failed', 'فشلت')], default='pending', max_length=20, verbose_name='الحالة')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='المعاملات')),
+                ('progress_current', models.BigIntegerField(default=0, verbose_name='التقدم الحالي')),
+                ('progress_total', models.BigIntegerField(default=0, verbose_name='الإجمالي')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='الرسالة')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='النتيجة')),
+                ('error', models.TextField(blank=True, verbose_name='الخطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ البدء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الانتهاء')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='backup_jobs', to=settings.AUTH_USER_MODEL, verbose_name='تم الإنشاء بواسطة')),
+                ('database', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='odoo_db_manager.database', verbose_name='قاعدة البيانات')),
+            ],
+            options={
+                'verbose_name': 'مهمة خلفية',
+                'verbose_name_plural': 'المهام الخلفية',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
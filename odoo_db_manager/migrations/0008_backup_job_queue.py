@@ -0,0 +1,42 @@
+# Generated by Django 4.2.21 on 2025-06-01 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('odoo_db_manager', '0007_backup_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='cancel_requested',
+            field=models.BooleanField(default=False, verbose_name='طلب الإلغاء'),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='آخر نبضة'),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='worker',
+            field=models.CharField(blank=True, max_length=100, verbose_name='العامل'),
+        ),
+        migrations.AlterField(
+            model_name='backupjob',
+            name='job_type',
+            field=models.CharField(choices=[('backup', 'إنشاء نسخة احتياطية'), ('restore', 'استعادة نسخة احتياطية'), ('upload_restore', 'استعادة من ملف مرفوع'), ('scheduled_backup', 'نسخة احتياطية مجدولة')], max_length=30, verbose_name='نوع المهمة'),
+        ),
+        migrations.AlterField(
+            model_name='backupjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('completed', 'مكتملة'), ('failed', 'فشلت'), ('cancelled', 'ملغاة')], default='pending', max_length=20, verbose_name='الحالة'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['status', 'created_at'], name='backup_job_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2025-06-02 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('odoo_db_manager', '0008_backup_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, verbose_name='بصمة SHA-256'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2025-06-02 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('odoo_db_manager', '0009_backup_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupschedule',
+            name='keep_daily',
+            field=models.PositiveIntegerField(default=0, help_text='عدد الأيام', verbose_name='الاحتفاظ اليومي'),
+        ),
+        migrations.AddField(
+            model_name='backupschedule',
+            name='keep_monthly',
+            field=models.PositiveIntegerField(default=0, help_text='عدد الأشهر', verbose_name='الاحتفاظ الشهري'),
+        ),
+        migrations.AddField(
+            model_name='backupschedule',
+            name='keep_weekly',
+            field=models.PositiveIntegerField(default=0, help_text='عدد الأسابيع', verbose_name='الاحتفاظ الأسبوعي'),
+        ),
+    ]
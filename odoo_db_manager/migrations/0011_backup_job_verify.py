@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2025-06-03 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('odoo_db_manager', '0010_backup_retention_policy'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backupjob',
+            name='job_type',
+            field=models.CharField(choices=[('backup', 'إنشاء نسخة احتياطية'), ('restore', 'استعادة نسخة احتياطية'), ('upload_restore', 'استعادة من ملف مرفوع'), ('scheduled_backup', 'نسخة احتياطية مجدولة'), ('verify', 'التحقق من سلامة نسخة احتياطية')], max_length=30, verbose_name='نوع المهمة'),
+        ),
+    ]
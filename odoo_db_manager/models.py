@@ -81,6 +81,8 @@ class Backup(models.Model):
         ('users', 'بيانات المستخدمين'),
         ('settings', 'إعدادات النظام'),
         ('full', 'كل البيانات'),
+        ('parallel', 'كل البيانات - نسخة متوازية (PostgreSQL)'),
+        ('incremental', 'التغييرات فقط منذ النسخة السابقة'),
     ]
 
     database = models.ForeignKey(
@@ -92,6 +94,8 @@ class Backup(models.Model):
     name = models.CharField(_('اسم النسخة الاحتياطية'), max_length=100)
     file_path = models.CharField(_('مسار الملف'), max_length=255)
     size = models.BigIntegerField(_('الحجم (بايت)'), default=0)
+    # بصمة SHA-256 لمحتوى النسخة كما يُحمّل (تُستخدم أيضاً كـ ETag)
+    checksum = models.CharField(_('بصمة SHA-256'), max_length=64, blank=True)
     backup_type = models.CharField(
         _('نوع النسخة الاحتياطية'),
         max_length=20,
@@ -99,6 +103,17 @@ class Backup(models.Model):
         default='full'
     )
     is_scheduled = models.BooleanField(_('مجدولة'), default=False)
+    # النسخة السابقة في السلسلة (للنسخ التزايدية)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='incrementals',
+        verbose_name=_('النسخة الأساسية')
+    )
+    # تفاصيل إضافية مثل أحجام وأزمنة الجداول في النسخ المتوازية
+    details = models.JSONField(_('التفاصيل'), default=dict, blank=True)
     created_at = models.DateTimeField(_('تاريخ الإنشاء'), auto_now_add=True)
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -115,6 +130,33 @@ class Backup(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def chain(self):
+        """سلسلة النسخ من النسخة الكاملة حتى هذه النسخة"""
+        chain = []
+        backup = self
+        while backup is not None:
+            chain.append(backup)
+            backup = backup.parent
+        return list(reversed(chain))
+
+    @property
+    def is_directory(self):
+        """هل النسخة مجلد (تنسيق pg_dump -Fd)"""
+        return bool(self.file_path) and os.path.isdir(self.file_path)
+
+    @property
+    def table_details(self):
+        """أحجام وأزمنة الجداول مرتبة من الأكبر إلى الأصغر"""
+        tables = self.details.get('tables') or {}
+        restore_seconds = (self.details.get('last_restore') or {}).get('table_seconds') or {}
+        return sorted(
+            ({'name': name, 'restore_seconds': restore_seconds.get(name), **info}
+             for name, info in tables.items()),
+            key=lambda table: table.get('size') or 0,
+            reverse=True,
+        )
+
     @property
     def size_display(self):
         """عرض حجم النسخة الاحتياطية بشكل مقروء"""
@@ -126,6 +168,109 @@ class Backup(models.Model):
         return f"{size:.1f} TB"
 
 
+class DeletedRecord(models.Model):
+    """سجل حذف (tombstone) يسمح للنسخ التزايدية بنقل عمليات الحذف"""
+
+    model_label = models.CharField(_('النموذج'), max_length=100)
+    object_pk = models.CharField(_('المعرف'), max_length=64)
+    deleted_at = models.DateTimeField(_('تاريخ الحذف'), default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = _('سجل محذوف')
+        verbose_name_plural = _('السجلات المحذوفة')
+        ordering = ['-deleted_at']
+
+    def __str__(self):
+        return f"{self.model_label}:{self.object_pk}"
+
+
+class BackupJob(models.Model):
+    """مهمة خلفية طويلة لإدارة قواعد البيانات مع تتبع التقدم"""
+
+    JOB_TYPES = [
+        ('backup', _('إنشاء نسخة احتياطية')),
+        ('restore', _('استعادة نسخة احتياطية')),
+        ('upload_restore', _('استعادة من ملف مرفوع')),
+        ('scheduled_backup', _('نسخة احتياطية مجدولة')),
+        ('verify', _('التحقق من سلامة نسخة احتياطية')),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', _('في الانتظار')),
+        ('running', _('قيد التنفيذ')),
+        ('completed', _('مكتملة')),
+        ('failed', _('فشلت')),
+        ('cancelled', _('ملغاة')),
+    ]
+
+    job_type = models.CharField(_('نوع المهمة'), max_length=30, choices=JOB_TYPES)
+    database = models.ForeignKey(
+        Database,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name=_('قاعدة البيانات'),
+        null=True,
+        blank=True
+    )
+    status = models.CharField(_('الحالة'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    params = models.JSONField(_('المعاملات'), default=dict, blank=True)
+    progress_current = models.BigIntegerField(_('التقدم الحالي'), default=0)
+    progress_total = models.BigIntegerField(_('الإجمالي'), default=0)
+    message = models.CharField(_('الرسالة'), max_length=255, blank=True)
+    result = models.JSONField(_('النتيجة'), default=dict, blank=True)
+    error = models.TextField(_('الخطأ'), blank=True)
+    cancel_requested = models.BooleanField(_('طلب الإلغاء'), default=False)
+    # العامل الذي يُنفذ المهمة وآخر تحديث منه (لاكتشاف المهام المتوقفة)
+    worker = models.CharField(_('العامل'), max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(_('آخر نبضة'), null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='backup_jobs',
+        verbose_name=_('تم الإنشاء بواسطة'),
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(_('تاريخ الإنشاء'), auto_now_add=True)
+    started_at = models.DateTimeField(_('تاريخ البدء'), null=True, blank=True)
+    finished_at = models.DateTimeField(_('تاريخ الانتهاء'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('مهمة خلفية')
+        verbose_name_plural = _('المهام الخلفية')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='backup_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} ({self.get_status_display()})"
+
+    @property
+    def percent(self):
+        """نسبة التقدم"""
+        if self.status == 'completed':
+            return 100
+        if not self.progress_total:
+            return 0
+        return min(int(self.progress_current * 100 / self.progress_total), 100)
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    @property
+    def eta_seconds(self):
+        """الوقت المتبقي المتوقع بالثواني حسب سرعة التقدم منذ البدء"""
+        if self.status != 'running' or not self.started_at or not self.progress_total:
+            return None
+        if not 0 < self.progress_current < self.progress_total:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = self.progress_total - self.progress_current
+        return int(elapsed * remaining / self.progress_current)
+
+
 class BackupSchedule(models.Model):
     """نموذج جدولة النسخ الاحتياطية"""
 
@@ -195,6 +340,11 @@ class BackupSchedule(models.Model):
         help_text=_('الحد الأقصى هو 24 نسخة')
     )
 
+    # سياسة الاحتفاظ يومي/أسبوعي/شهري (عند تحديدها تحل محل الحد الأقصى لعدد النسخ)
+    keep_daily = models.PositiveIntegerField(_('الاحتفاظ اليومي'), default=0, help_text=_('عدد الأيام'))
+    keep_weekly = models.PositiveIntegerField(_('الاحتفاظ الأسبوعي'), default=0, help_text=_('عدد الأسابيع'))
+    keep_monthly = models.PositiveIntegerField(_('الاحتفاظ الشهري'), default=0, help_text=_('عدد الأشهر'))
+
     is_active = models.BooleanField(_('نشط'), default=True)
     created_at = models.DateTimeField(_('تاريخ الإنشاء'), auto_now_add=True)
     updated_at = models.DateTimeField(_('تاريخ التحديث'), auto_now=True)
@@ -216,6 +366,11 @@ class BackupSchedule(models.Model):
     def __str__(self):
         return f"{self.name} - {self.get_frequency_display()}"
 
+    @property
+    def has_retention_policy(self):
+        """هل حُددت سياسة احتفاظ يومي/أسبوعي/شهري"""
+        return bool(self.keep_daily or self.keep_weekly or self.keep_monthly)
+
     def calculate_next_run(self):
         """حساب موعد التشغيل القادم"""
         now = timezone.now()
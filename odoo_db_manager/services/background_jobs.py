@@ -0,0 +1,328 @@
+"""
+تشغيل المهام الطويلة لإدارة قواعد البيانات في الخلفية
+تُنشأ المهمة كسجل BackupJob في حالة الانتظار ويعود الطلب فوراً، ثم يحجزها عامل
+(عبر الأمر run_backup_jobs، أو داخل عملية الخادم إذا فُعّل BACKUP_JOBS_IN_PROCESS) ويُنفذها في مجموعة خيوط،
+مع حفظ التقدم والإلغاء في قاعدة البيانات ليقرأها أي عامل عبر نقطة الحالة
+"""
+
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from odoo_db_manager.models import BackupJob, Database
+
+# أقل فترة بين تحديثين للتقدم في قاعدة البيانات (بالثواني)
+PROGRESS_INTERVAL = 1.0
+# فترة انتظار العامل بين فحصين لقائمة الانتظار (بالثواني)
+POLL_INTERVAL = 2.0
+# المهمة قيد التنفيذ التي لم يُحدّث عاملها نبضتها خلال هذه المدة تعتبر متوقفة
+STALE_AFTER = timedelta(minutes=2)
+# أقصى عدد من المهام المنتظرة يُفحص في كل محاولة حجز
+CLAIM_SCAN = 20
+
+
+def get_concurrency():
+    return getattr(settings, 'BACKUP_JOBS_CONCURRENCY', 2)
+
+
+def get_per_database_limit():
+    return getattr(settings, 'BACKUP_JOBS_PER_DATABASE', 1)
+
+
+def runs_in_process():
+    """
+    هل تُنفذ المهام داخل عملية الخادم؛ الافتراضي لا: عمال gunicorn يُعاد تشغيلهم دورياً
+    (--max-requests) فتُقطع المهام الطويلة، لذلك تُنفذ في عملية worker مستقلة (run_backup_jobs)
+    """
+    return getattr(settings, 'BACKUP_JOBS_IN_PROCESS', False)
+
+
+class JobCancelled(Exception):
+    """
+    يُرفع داخل المعالج عند طلب إلغاء المهمة
+    """
+
+
+class JobProgress:
+    """
+    تحديث تقدم المهمة في قاعدة البيانات بحد أقصى تحديث واحد كل PROGRESS_INTERVAL
+
+    كل تحديث يتحقق من طلب الإلغاء ويرفع JobCancelled، لذلك نقاط التقدم هي نقاط الإلغاء
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._last_update = 0
+
+    def update(self, current, total=None, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_update < PROGRESS_INTERVAL:
+            return
+        self._last_update = now
+        fields = {'progress_current': current, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            fields['progress_total'] = total
+        if message is not None:
+            fields['message'] = message[:255]
+        updated = BackupJob.objects.filter(
+            pk=self.job.pk, cancel_requested=False
+        ).update(**fields)
+        if not updated and BackupJob.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+def _handlers():
+    from odoo_db_manager.services.job_handlers import run_backup, run_restore, run_scheduled_backup, run_verify
+    from odoo_db_manager.services.upload_restore import run_upload_restore
+
+    return {
+        'backup': run_backup,
+        'restore': run_restore,
+        'upload_restore': run_upload_restore,
+        'scheduled_backup': run_scheduled_backup,
+        'verify': run_verify,
+    }
+
+
+def enqueue(job_type, database=None, params=None, user=None, progress_total=0):
+    """
+    إضافة مهمة إلى قائمة الانتظار وإيقاظ العامل
+
+    Returns:
+        سجل BackupJob الجديد
+    """
+    if job_type not in _handlers():
+        raise ValueError(f"نوع مهمة غير معروف: {job_type}")
+    job = BackupJob.objects.create(
+        job_type=job_type,
+        database=database,
+        params=params or {},
+        progress_total=progress_total,
+        created_by=user,
+    )
+    if runs_in_process():
+        # العامل يحجز المهمة بعد تأكيد المعاملة الحالية حتى يراها
+        transaction.on_commit(lambda: get_worker().wake())
+    return job
+
+
+def cancel_job(job):
+    """
+    إلغاء مهمة: المنتظرة تُلغى فوراً، وقيد التنفيذ تُلغى عند نقطة التقدم التالية
+
+    Returns:
+        True إذا تم الإلغاء أو طلبه
+    """
+    if BackupJob.objects.filter(pk=job.pk, status='pending').update(
+        status='cancelled', cancel_requested=True, finished_at=timezone.now()
+    ):
+        return True
+    return bool(BackupJob.objects.filter(pk=job.pk, status='running').update(cancel_requested=True))
+
+
+def claim_next_job(worker_id, per_database=None):
+    """
+    حجز أقدم مهمة منتظرة لا تتجاوز قاعدة بياناتها حد المهام المتزامنة
+
+    يُقفل صف قاعدة البيانات أثناء العد والحجز حتى لا يحجز عاملان مهمتين لنفس القاعدة معاً
+
+    Returns:
+        سجل BackupJob المحجوز أو None
+    """
+    per_database = per_database or get_per_database_limit()
+    with transaction.atomic():
+        pending = BackupJob.objects.filter(status='pending').order_by('created_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+
+        for job in pending[:CLAIM_SCAN]:
+            if job.database_id is not None:
+                Database.objects.select_for_update().filter(pk=job.database_id).first()
+                running = BackupJob.objects.filter(database_id=job.database_id, status='running').count()
+                if running >= per_database:
+                    continue
+            now = timezone.now()
+            claimed = BackupJob.objects.filter(pk=job.pk, status='pending').update(
+                status='running', worker=worker_id, started_at=now, heartbeat_at=now
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+    return None
+
+
+def recover_stale_jobs():
+    """
+    تعليم المهام التي توقف عاملها (مثلاً بإعادة تشغيل الخادم) كفاشلة
+
+    Returns:
+        عدد المهام المستردة
+    """
+    return BackupJob.objects.filter(
+        status='running', heartbeat_at__lt=timezone.now() - STALE_AFTER
+    ).update(
+        status='failed', error="توقف العامل قبل اكتمال المهمة", finished_at=timezone.now()
+    )
+
+
+def run_job(job_id):
+    """
+    تنفيذ مهمة محجوزة وتسجيل نتيجتها أو خطئها
+    """
+    close_old_connections()
+    try:
+        job = BackupJob.objects.select_related('database', 'created_by').get(pk=job_id)
+        handler = _handlers()[job.job_type]
+
+        progress = JobProgress(job)
+        try:
+            result = handler(job, progress)
+        except JobCancelled:
+            print(f"تم إلغاء المهمة {job.pk}")
+            BackupJob.objects.filter(pk=job.pk).update(
+                status='cancelled', message="تم الإلغاء", finished_at=timezone.now()
+            )
+            return
+        except Exception as e:
+            print(f"فشلت المهمة {job.pk}: {str(e)}")
+            traceback.print_exc()
+            BackupJob.objects.filter(pk=job.pk).update(
+                status='failed', error=str(e), finished_at=timezone.now()
+            )
+            return
+
+        BackupJob.objects.filter(pk=job.pk).update(
+            status='completed',
+            result=result or {},
+            progress_current=F('progress_total'),
+            finished_at=timezone.now(),
+        )
+    finally:
+        connection.close()
+
+
+class JobWorker:
+    """
+    عامل يحجز المهام المنتظرة وينفذها في مجموعة خيوط
+
+    يعمل كعملية مستقلة عبر الأمر run_backup_jobs أو داخل عملية الخادم (get_worker)؛
+    الحجز في قاعدة البيانات يسمح بتشغيل أكثر من عامل في نفس الوقت
+    """
+
+    def __init__(self, concurrency=None, per_database=None, poll_interval=POLL_INTERVAL):
+        self.concurrency = concurrency or get_concurrency()
+        self.per_database = per_database or get_per_database_limit()
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix='backup-job'
+        )
+        self._active = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, wait=False):
+        self._stop.set()
+        self._wake.set()
+        if wait:
+            self._executor.shutdown(wait=True)
+
+    @property
+    def active_count(self):
+        with self._lock:
+            return len(self._active)
+
+    def _run(self, job_id):
+        try:
+            run_job(job_id)
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+            self._wake.set()
+
+    def _heartbeat(self):
+        with self._lock:
+            active = list(self._active)
+        if active:
+            BackupJob.objects.filter(pk__in=active, status='running').update(heartbeat_at=timezone.now())
+
+    def run_pending(self):
+        """
+        حجز وتشغيل مهام جديدة حتى امتلاء مجموعة الخيوط
+
+        Returns:
+            عدد المهام التي بدأت
+        """
+        started = 0
+        while self.active_count < self.concurrency:
+            job = claim_next_job(self.worker_id, self.per_database)
+            if job is None:
+                break
+            with self._lock:
+                self._active.add(job.pk)
+            self._executor.submit(self._run, job.pk)
+            started += 1
+        return started
+
+    def serve(self, once=False):
+        """
+        حلقة العامل: نبضة للمهام الجارية ثم حجز مهام جديدة ثم الانتظار
+
+        Args:
+            once: الخروج عند فراغ قائمة الانتظار وانتهاء المهام الجارية
+        """
+        print(f"بدء عامل المهام الخلفية {self.worker_id} ({self.concurrency} خيط)")
+        while not self._stop.is_set():
+            try:
+                recover_stale_jobs()
+                self._heartbeat()
+                started = self.run_pending()
+            except Exception as e:
+                print(f"خطأ في عامل المهام الخلفية: {str(e)}")
+                connection.close()
+                started = 0
+            if once and not started and not self.active_count:
+                break
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+        self._executor.shutdown(wait=True)
+        connection.close()
+
+    def start(self):
+        """
+        تشغيل حلقة العامل في خيط خلفي
+        """
+        self._thread = threading.Thread(target=self.serve, name='backup-job-worker', daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """
+    العامل داخل عملية الخادم (يُنشأ ويبدأ عند أول استخدام)
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = JobWorker()
+            _worker.start()
+    return _worker
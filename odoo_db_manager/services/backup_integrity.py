@@ -0,0 +1,182 @@
+"""
+سلامة ملفات النسخ الاحتياطية وتحميلها
+بصمة SHA-256 تُحسب مرة واحدة عند إنشاء النسخة وتُستخدم كـ ETag، مع دعم التحميل
+الجزئي (HTTP Range) لاستكمال التحميل المنقطع وإعادة الضغط الاختيارية أثناء الإرسال
+"""
+
+import hashlib
+import os
+import re
+import zlib
+
+from odoo_db_manager.services.chunk_store import ChunkStore, is_chunked_backup, load_manifest
+from odoo_db_manager.services.parallel_backup import iter_directory_tar
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOCK_SIZE = 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+# صيغ إعادة الضغط: (امتداد الملف، نوع المحتوى)
+ENCODINGS = {
+    'gzip': ('.gz', 'application/gzip'),
+    'zstd': ('.zst', 'application/zstd'),
+}
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def available_encodings():
+    """
+    صيغ إعادة الضغط المتاحة (zstd تتطلب حزمة zstandard)
+    """
+    return [name for name in ENCODINGS if name != 'zstd' or zstandard is not None]
+
+
+def iter_backup_content(path, block_size=BLOCK_SIZE):
+    """
+    محتوى النسخة كما يُرسل عند التحميل: الملف نفسه، أو ملف tar لمجلد النسخة المتوازية
+    """
+    if os.path.isdir(path):
+        yield from iter_directory_tar(path, block_size)
+        return
+    if is_chunked_backup(path):
+        yield from ChunkStore().iter_content(load_manifest(path))
+        return
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield block
+
+
+def compute_checksum(path, progress=None):
+    """
+    بصمة SHA-256 لمحتوى النسخة تُحسب على أجزاء دون تحميل الملف في الذاكرة
+
+    Args:
+        progress: دالة اختيارية تُستدعى بعدد البايتات المقروءة بعد كل جزء
+
+    Returns:
+        البصمة بالنظام الست عشري
+    """
+    digest = hashlib.sha256()
+    done = 0
+    for block in iter_backup_content(path):
+        digest.update(block)
+        if progress:
+            done += len(block)
+            progress(done)
+    return digest.hexdigest()
+
+
+def request_verification(backup, user=None):
+    """
+    مهمة خلفية لحساب بصمة النسخة ومقارنتها بالمحفوظة (أو حفظها للنسخ القديمة بدون بصمة)؛
+    حساب البصمة لنسخة كبيرة قد يتجاوز مهلة الطلب لذلك لا يتم داخله
+
+    Returns:
+        سجل BackupJob: المهمة المنتظرة أو الجارية لنفس النسخة إن وجدت، وإلا مهمة جديدة
+    """
+    from odoo_db_manager.models import BackupJob
+    from odoo_db_manager.services.background_jobs import enqueue
+
+    job = BackupJob.objects.filter(
+        job_type='verify', params__backup_id=backup.pk, status__in=('pending', 'running')
+    ).first()
+    if job:
+        return job
+    # بدون قاعدة بيانات: التحقق يقرأ الملف فقط فلا ينتظر خلف نسخ أو استعادة لنفس القاعدة
+    return enqueue('verify', params={'backup_id': backup.pk}, user=user, progress_total=backup.size or 0)
+
+
+def parse_range(header, size):
+    """
+    تحليل رأس Range لنطاق واحد من البايتات
+
+    Returns:
+        (البداية، النهاية) شاملة النهاية، أو None إذا كان الرأس غير مدعوم (يُرسل الملف كاملاً)
+
+    Raises:
+        ValueError: إذا كان النطاق خارج حجم الملف (استجابة 416)
+    """
+    match = _RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # آخر N بايت
+        length = int(end)
+        if not length:
+            raise ValueError("نطاق فارغ")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("النطاق خارج حجم الملف")
+    return start, end
+
+
+def content_size(path):
+    """
+    حجم محتوى الملف كما يُحمّل (لنسخ مخزن الأجزاء: حجم المحتوى بعد إعادة البناء)
+    """
+    if is_chunked_backup(path):
+        return load_manifest(path)['size']
+    return os.path.getsize(path)
+
+
+def iter_file_range(path, start, end, block_size=BLOCK_SIZE):
+    """
+    قراءة جزء من الملف (من start إلى end شاملة) على أجزاء
+    """
+    if is_chunked_backup(path):
+        yield from ChunkStore().iter_content(load_manifest(path), start, end)
+        return
+    remaining = end - start + 1
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def iter_encoded(chunks, encoding):
+    """
+    ضغط المحتوى أثناء الإرسال بصيغة gzip أو zstd
+    """
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    elif encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    else:
+        raise ValueError(f"صيغة ضغط غير مدعومة: {encoding}")
+
+
+def is_gzip_file(path):
+    """
+    هل الملف مضغوط بـ gzip بالفعل (لتجنب ضغطه مرتين)
+    """
+    if os.path.isdir(path) or is_chunked_backup(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
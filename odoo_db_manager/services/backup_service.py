@@ -9,14 +9,29 @@ import datetime
 import json
 import gzip
 import shutil
-import tempfile
 from django.conf import settings
 from django.core.management import call_command
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth.models import User
 from odoo_db_manager.models import Database, Backup
+from odoo_db_manager.services.backup_integrity import compute_checksum
+from odoo_db_manager.services.chunk_store import CHUNKED_SUFFIX, ChunkStore, is_chunked_backup
+from odoo_db_manager.services.streaming_backup import (
+    DEFAULT_CHUNK_SIZE, StreamingBackupWriter, get_backup_models, is_stream_backup,
+    print_progress,
+)
+from odoo_db_manager.services.streaming_restore import DEFAULT_BATCH_SIZE, StreamingRestorer
+from odoo_db_manager.services.upload_restore import JsonArrayRestorer
+from odoo_db_manager.services.incremental_backup import (
+    IncrementalBackupWriter, get_incremental_models, tracking_started_at,
+)
+from odoo_db_manager.services.parallel_backup import (
+    DEFAULT_JOBS, create_directory_dump, directory_size, remove_backup_path, restore_directory_dump,
+)
 
 class BackupService:
     """خدمة النسخ الاحتياطي المحسنة"""
@@ -27,9 +42,15 @@ class BackupService:
         'users': 'بيانات المستخدمين',
         'settings': 'إعدادات النظام',
         'full': 'كل البيانات',
+        'parallel': 'كل البيانات - نسخة متوازية (PostgreSQL)',
+        'incremental': 'التغييرات فقط منذ النسخة السابقة',
     }
 
-    def create_backup(self, database_id, name=None, user=None, backup_type='full', is_scheduled=False):
+    # الأنواع التي تشمل كل البيانات ويمكن أن تكون أساساً لسلسلة تزايدية
+    CHAIN_TYPES = ('full', 'parallel', 'incremental')
+
+    def create_backup(self, database_id, name=None, user=None, backup_type='full', is_scheduled=False,
+                      progress=print_progress, jobs=None):
         """
         إنشاء نسخة احتياطية
 
@@ -37,8 +58,10 @@ class BackupService:
             database_id: معرف قاعدة البيانات
             name: اسم النسخة الاحتياطية (اختياري)
             user: المستخدم الذي أنشأ النسخة الاحتياطية
-            backup_type: نوع النسخة الاحتياطية (customers, users, settings, full)
+            backup_type: نوع النسخة الاحتياطية (customers, users, settings, full, parallel, incremental)
             is_scheduled: هل النسخة الاحتياطية مجدولة
+            progress: دالة تقدم النسخ لكل نموذج (النموذج، المكتوب، الإجمالي)
+            jobs: عدد العمليات المتوازية للنسخ المتوازية (parallel)
 
         Returns:
             كائن النسخة الاحتياطية
@@ -46,6 +69,21 @@ class BackupService:
         # الحصول على قاعدة البيانات
         database = Database.objects.get(id=database_id)
 
+        # وقت بداية النسخ: النسخة التزايدية التالية تلتقط ما تغير بعده
+        captured_at = timezone.now()
+        parent = None
+        if backup_type == 'incremental':
+            parent = self.get_chain_head(database)
+            tracking_since = tracking_started_at()
+            if parent is None:
+                print("لا توجد نسخة سابقة لبدء السلسلة - سيتم إنشاء نسخة كاملة")
+                backup_type = 'full'
+            elif tracking_since and parse_datetime(parent.details['captured_at']) < tracking_since:
+                # عمليات الحذف قبل تفعيل الجدولة التزايدية لم تُسجل
+                print("بدأ تسجيل الحذف بعد النسخة السابقة - سيتم إنشاء نسخة كاملة")
+                parent = None
+                backup_type = 'full'
+
         # إنشاء اسم النسخة الاحتياطية إذا لم يتم توفيره
         if not name:
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -60,8 +98,43 @@ class BackupService:
         print(f"نوع قاعدة البيانات: {database.db_type}")
         print(f"معلومات الاتصال: {database.connection_info}")
 
+        details = {}
+
         # تحديد نوع النسخة الاحتياطية ومسار الملف
-        if database.db_type == 'sqlite3' or settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        if backup_type == 'incremental':
+            # نسخة تزايدية: السجلات المتغيرة وسجلات الحذف منذ النسخة السابقة
+            since = parse_datetime(parent.details['captured_at'])
+            file_path = os.path.join(backup_dir, f"{name}.json.gz")
+            print(f"نسخة تزايدية منذ {since.isoformat()} (النسخة السابقة: {parent.name})")
+
+            writer = IncrementalBackupWriter(file_path, since=since, until=captured_at, progress=progress)
+            counts = writer.write(
+                get_incremental_models(),
+                backup_type=backup_type,
+                extra={'since': since, 'parent': parent.name},
+            )
+            details = {
+                'since': since.isoformat(),
+                'counts': {label: count for label, count in counts.items() if count},
+            }
+        elif backup_type == 'parallel':
+            # نسخة متوازية بتنسيق المجلد (PostgreSQL فقط)
+            if 'postgresql' not in settings.DATABASES['default']['ENGINE']:
+                raise ValueError("النسخ المتوازية متاحة لقواعد بيانات PostgreSQL فقط")
+
+            file_path = os.path.join(backup_dir, name)
+            print(f"مسار مجلد النسخة الاحتياطية: {file_path}")
+            try:
+                details = create_directory_dump(
+                    file_path,
+                    connection_info=database.connection_info if database.db_type == 'postgresql' else None,
+                    jobs=jobs or DEFAULT_JOBS,
+                )
+            except Exception as e:
+                remove_backup_path(file_path)
+                print(f"حدث خطأ أثناء النسخ المتوازي: {str(e)}")
+                raise RuntimeError(f"فشل إنشاء النسخة الاحتياطية: {str(e)}")
+        elif database.db_type == 'sqlite3' or settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
             # استخدام نسخة مباشرة من ملف SQLite
             db_file = settings.DATABASES['default']['NAME']
             print(f"استخدام نسخة مباشرة من ملف SQLite: {db_file}")
@@ -87,11 +160,32 @@ class BackupService:
             self._create_django_backup(
                 database=database,
                 file_path=file_path,
-                backup_type=backup_type
+                backup_type=backup_type,
+                progress=progress
             )
 
         # الحصول على حجم الملف
-        size = os.path.getsize(file_path)
+        size = directory_size(file_path) if os.path.isdir(file_path) else os.path.getsize(file_path)
+        checksum = None
+
+        # النسخ المتدفقة تُخزن في مخزن الأجزاء حتى تتشارك النسخ المتتالية الأجزاء غير المتغيرة
+        if getattr(settings, 'BACKUP_DEDUP_STORE', True) and is_stream_backup(file_path):
+            manifest_path = file_path[:-len('.json.gz')] + CHUNKED_SUFFIX
+            stored = ChunkStore().ingest_file(file_path, manifest_path)
+            os.unlink(file_path)
+            file_path = manifest_path
+            size = stored['size']
+            checksum = stored['sha256']
+            details['store'] = {
+                'chunks': len(stored['chunks']),
+                'new_chunks': stored['new_chunks'],
+                'stored_bytes': stored['stored_bytes'],
+            }
+            print(f"تخزين في مخزن الأجزاء: {stored['new_chunks']} جزء جديد من {len(stored['chunks'])} "
+                  f"({stored['stored_bytes']:,} بايت على القرص)")
+
+        if backup_type in self.CHAIN_TYPES:
+            details['captured_at'] = captured_at.isoformat()
 
         # إنشاء سجل النسخة الاحتياطية
         backup = Backup.objects.create(
@@ -99,21 +193,37 @@ class BackupService:
             name=name,
             file_path=file_path,
             size=size,
+            checksum=checksum or compute_checksum(file_path),
             created_by=user,
             backup_type=backup_type,
-            is_scheduled=is_scheduled
+            is_scheduled=is_scheduled,
+            details=details,
+            parent=parent
         )
 
         return backup
 
-    def _create_django_backup(self, database, file_path, backup_type='full'):
+    def get_chain_head(self, database):
+        """
+        آخر نسخة كاملة أو تزايدية يمكن أن تبني عليها النسخة التزايدية التالية
+        """
+        return Backup.objects.filter(
+            database=database,
+            backup_type__in=self.CHAIN_TYPES,
+            details__has_key='captured_at',
+        ).order_by('-created_at').first()
+
+    def _create_django_backup(self, database, file_path, backup_type='full',
+                              chunk_size=DEFAULT_CHUNK_SIZE, progress=print_progress):
         """
-        إنشاء نسخة احتياطية باستخدام Django dumpdata أو pg_dump
+        إنشاء نسخة احتياطية باستخدام pg_dump أو الكتابة المتدفقة لنماذج Django
 
         Args:
             database: كائن قاعدة البيانات
             file_path: مسار ملف النسخة الاحتياطية
             backup_type: نوع النسخة الاحتياطية
+            chunk_size: عدد السجلات في كل دفعة قراءة وتسلسل
+            progress: دالة تُستدعى بـ (النموذج، المكتوب، الإجمالي) بعد كل دفعة
         """
         # التحقق من نوع قاعدة البيانات
         db_settings = settings.DATABASES['default']
@@ -148,147 +258,25 @@ class BackupService:
                 print(f"فشل استخدام pg_dump: {str(e)}")
                 print("استخدام الطريقة البديلة...")
 
-        # إذا لم تكن قاعدة البيانات PostgreSQL أو فشل pg_dump، نستخدم الطريقة البديلة
-        print("استخدام طريقة Django dumpdata كبديل...")
-
-        # تحديد التطبيقات والنماذج المطلوبة حسب نوع النسخة الاحتياطية
-        include_models = []
-
-        if backup_type == 'customers':
-            include_models = ['customers.Customer', 'customers.CustomerContact', 'customers.CustomerAddress']
-        elif backup_type == 'users':
-            include_models = ['auth.User', 'auth.Group', 'accounts.UserProfile']
-        elif backup_type == 'settings':
-            include_models = ['sites.Site', 'auth.Permission']
-            # يمكن إضافة المزيد من نماذج الإعدادات حسب الحاجة
-        elif backup_type == 'full':
-            # للنسخة الكاملة، نشمل جميع التطبيقات الأساسية
-            include_models = [
-                'accounts',
-                'customers',
-                'orders',
-                'inspections',
-                'inventory',
-                'installations',
-                'factory',
-                'reports',
-                'odoo_db_manager'
-            ]
-            print(f"نسخة كاملة - سيتم تضمين {len(include_models)} تطبيق")
+        # إذا لم تكن قاعدة البيانات PostgreSQL أو فشل pg_dump، نستخدم الكتابة المتدفقة
+        print("استخدام الكتابة المتدفقة لنماذج Django كبديل...")
 
-        # استخدام ملف مؤقت للبيانات
-        temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, 'backup.json')
+        models = get_backup_models(backup_type)
+        print(f"نوع النسخة الاحتياطية: {backup_type} - سيتم تضمين {len(models)} نموذج")
+        print(f"مسار الملف النهائي: {file_path}")
 
         try:
-            # طباعة معلومات تشخيصية
-            print(f"إنشاء نسخة احتياطية باستخدام طريقة بديلة")
-            print(f"نوع النسخة الاحتياطية: {backup_type}")
-            print(f"مسار الملف المؤقت: {temp_path}")
-            print(f"مسار الملف النهائي: {file_path}")
-
-            # استخدام طريقة بديلة تمامًا لتجنب مشكلة الترميز
-            try:
-                print("استخدام طريقة بديلة لتجنب مشكلة الترميز...")
-
-                # استخدام Python لتنفيذ الأمر وحفظ المخرجات مباشرة
-                import json
-                from django.core.serializers import serialize
-
-                # تحديد النماذج المطلوبة
-                if backup_type == 'full':
-                    # الحصول على جميع النماذج المسجلة
-                    from django.apps import apps
-                    all_models = []
-                    for app_config in apps.get_app_configs():
-                        for model in app_config.get_models():
-                            # استثناء النماذج المحددة
-                            if (app_config.label != 'contenttypes' and
-                                not (app_config.label == 'admin' and model.__name__ == 'LogEntry')):
-                                all_models.append(model)
-
-                    # تسلسل كل نموذج على حدة
-                    all_data = []
-                    for model in all_models:
-                        try:
-                            # الحصول على جميع الكائنات
-                            queryset = model.objects.using('default').all()
-                            # تسلسل الكائنات
-                            model_data = serialize('python', queryset, use_natural_foreign_keys=True, use_natural_primary_keys=True)
-                            all_data.extend(model_data)
-                        except Exception as model_error:
-                            print(f"تخطي نموذج {model.__name__}: {str(model_error)}")
-                else:
-                    # تسلسل النماذج المحددة فقط
-                    all_data = []
-                    for model_name in include_models:
-                        try:
-                            app_label, model_name = model_name.split('.')
-                            model = apps.get_model(app_label, model_name)
-                            queryset = model.objects.using('default').all()
-                            model_data = serialize('python', queryset, use_natural_foreign_keys=True, use_natural_primary_keys=True)
-                            all_data.extend(model_data)
-                        except Exception as model_error:
-                            print(f"تخطي نموذج {model_name}: {str(model_error)}")
-
-                # تعريف دالة مساعدة لتحويل كائنات datetime إلى سلاسل نصية
-                def json_serial(obj):
-                    """تحويل كائنات Python إلى JSON"""
-                    if isinstance(obj, (datetime.datetime, datetime.date)):
-                        return obj.isoformat()
-                    raise TypeError(f"النوع {type(obj)} غير قابل للتحويل إلى JSON")
-
-                # كتابة البيانات إلى الملف المؤقت
-                with open(temp_path, 'w', encoding='utf-8') as f:
-                    json.dump(all_data, f, ensure_ascii=False, indent=2, default=json_serial)
-
-                print(f"تم كتابة البيانات إلى الملف المؤقت: {temp_path}")
-
-            except Exception as e:
-                print(f"حدث خطأ أثناء إنشاء النسخة الاحتياطية: {str(e)}")
-                raise RuntimeError(f"فشل إنشاء النسخة الاحتياطية: {str(e)}")
-
-            # التحقق من وجود الملف المؤقت
-            if not os.path.exists(temp_path):
-                raise FileNotFoundError(f"لم يتم إنشاء ملف النسخة الاحتياطية المؤقت: {temp_path}")
-
-            # التحقق من حجم الملف المؤقت
-            temp_size = os.path.getsize(temp_path)
-            print(f"حجم ملف النسخة الاحتياطية المؤقت: {temp_size} بايت")
-
-            if temp_size == 0:
-                raise ValueError("ملف النسخة الاحتياطية المؤقت فارغ")
-
-            # ضغط الملف مع مراعاة الترميز
-            print("ضغط الملف...")
-            with open(temp_path, 'rb') as f_in:
-                with gzip.open(file_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-
-            # التحقق من وجود الملف النهائي
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"لم يتم إنشاء ملف النسخة الاحتياطية النهائي: {file_path}")
-
-            # التحقق من حجم الملف النهائي
-            final_size = os.path.getsize(file_path)
-            print(f"حجم ملف النسخة الاحتياطية النهائي: {final_size} بايت")
-
-            if final_size == 0:
-                raise ValueError("ملف النسخة الاحتياطية النهائي فارغ")
-
-            print("تم إنشاء النسخة الاحتياطية بنجاح")
-            return True
+            writer = StreamingBackupWriter(file_path, chunk_size=chunk_size, progress=progress)
+            counts = writer.write(models, backup_type=backup_type)
         except Exception as e:
             print(f"حدث خطأ أثناء إنشاء النسخة الاحتياطية: {str(e)}")
             raise RuntimeError(f"فشل إنشاء النسخة الاحتياطية: {str(e)}")
-        finally:
-            # حذف الملفات المؤقتة
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-                print(f"تم حذف الملف المؤقت: {temp_path}")
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                print(f"تم حذف المجلد المؤقت: {temp_dir}")
+
+        final_size = os.path.getsize(file_path)
+        print(f"تم نسخ {sum(counts.values()):,} سجل من {len(counts)} نموذج")
+        print(f"حجم ملف النسخة الاحتياطية النهائي: {final_size} بايت")
+        print("تم إنشاء النسخة الاحتياطية بنجاح")
+        return True
 
     def _create_postgresql_backup(self, database_name, user, password, host, port, file_path):
         """إنشاء نسخة احتياطية لقاعدة بيانات PostgreSQL"""
@@ -437,7 +425,7 @@ class BackupService:
         # استخدام نفس طريقة Django dumpdata
         self._create_django_backup(database, file_path, backup_type)
 
-    def restore_backup(self, backup_id, clear_data=False, create_new_database=True):
+    def restore_backup(self, backup_id, clear_data=False, create_new_database=True, tables=None, jobs=None):
         """
         استعادة نسخة احتياطية مع إنشاء قاعدة بيانات جديدة
 
@@ -445,6 +433,8 @@ class BackupService:
             backup_id: معرف النسخة الاحتياطية
             clear_data: هل يتم حذف البيانات القديمة قبل الاستعادة (مهمل - سيتم إنشاء قاعدة جديدة)
             create_new_database: إنشاء قاعدة بيانات جديدة مطابقة للنسخة المستعادة (افتراضي: True)
+            tables: جداول محددة لاستعادتها من نسخة متوازية (اختياري)
+            jobs: عدد العمليات المتوازية لاستعادة النسخ المتوازية
 
         Returns:
             True إذا تمت الاستعادة بنجاح
@@ -464,6 +454,24 @@ class BackupService:
             if not os.path.exists(backup.file_path):
                 raise FileNotFoundError(f"ملف النسخة الاحتياطية '{backup.file_path}' غير موجود")
 
+            # النسخ التزايدية: استعادة النسخة الكاملة ثم تطبيق التغييرات بالترتيب
+            if backup.parent_id:
+                return self._restore_chain(backup, clear_data)
+
+            # النسخ المتوازية (مجلد pg_dump -Fd) تُستعاد مباشرة باستخدام pg_restore --jobs
+            if os.path.isdir(backup.file_path):
+                restore_details = restore_directory_dump(
+                    backup.file_path,
+                    connection_info=database.connection_info if database.db_type == 'postgresql' else None,
+                    jobs=jobs or DEFAULT_JOBS,
+                    tables=tables,
+                )
+                details = dict(backup.details or {})
+                details['last_restore'] = restore_details
+                Backup.objects.filter(pk=backup.pk).update(details=details)
+                print("تمت استعادة النسخة الاحتياطية بنجاح")
+                return True
+
             # التحقق من نوع الملف
             file_info = self._check_file_type(backup.file_path)
 
@@ -593,10 +601,14 @@ class BackupService:
                         os.unlink(backup_current_db)
                         print(f"تم حذف النسخة الاحتياطية المؤقتة: {backup_current_db}")
 
+            elif file_info['type'] == 'ndjson_gz':
+                # استعادة من نسخة متدفقة
+                print("استعادة من نسخة احتياطية متدفقة")
+                self._restore_from_stream(backup.file_path, clear_data)
             elif file_info['type'] == 'json_gz':
                 # استعادة من ملف JSON مضغوط
                 print("استعادة من ملف JSON مضغوط")
-                self._restore_from_json(backup, clear_data)
+                self._restore_from_json(backup.file_path, clear_data)
             elif file_info['type'] == 'sql':
                 # استعادة من ملف SQL
                 print("استعادة من ملف SQL")
@@ -617,75 +629,26 @@ class BackupService:
                         f"لا يمكن استعادة ملفات SQL لقواعد بيانات من نوع {database.db_type}. "
                         f"يرجى استخدام ملفات JSON.gz بدلاً من ذلك."
                     )
-            elif file_info['type'] == 'django_fixture':
-                # محاولة استعادة الملف باستخدام Django loaddata مباشرة
+            elif file_info['type'] == 'django_fixture' and file_info['extension'] in ('.xml', '.yaml', '.yml'):
+                # ملفات XML و YAML تُستعاد باستخدام Django loaddata
                 print(f"محاولة استعادة الملف باستخدام Django loaddata مباشرة: {backup.file_path}")
-                try:
-                    # التحقق من صحة ملف JSON قبل الاستعادة
-                    self._validate_json_file(backup.file_path)
-
-                    # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
-                    if clear_data:
-                        print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
-
-                    call_command('loaddata', backup.file_path, database='default')
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"خطأ في استعادة الملف: {error_msg}")
-
-                    if "not a known serialization format" in error_msg:
-                        raise ValueError(
-                            f"فشل استعادة الملف: الملف ليس بتنسيق مدعوم من Django. "
-                            f"يرجى التأكد من أن الملف بتنسيق JSON أو XML أو YAML صالح."
-                        )
-                    elif "Problem installing fixture" in error_msg:
-                        raise ValueError(
-                            f"فشل تثبيت البيانات من الملف. قد يكون هناك تضارب في البيانات أو مشكلة في تنسيق الملف. "
-                            f"تفاصيل الخطأ: {error_msg}"
-                        )
-                    else:
-                        raise
-            elif file_info['type'] == 'gzip':
-                # محاولة فك ضغط الملف واستعادته
-                print("محاولة فك ضغط الملف واستعادته")
-                with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as temp_file:
-                    temp_path = temp_file.name
-
-                try:
-                    # فك ضغط الملف
-                    with gzip.open(backup.file_path, 'rb') as f_in:
-                        with open(temp_path, 'wb') as f_out:
-                            shutil.copyfileobj(f_in, f_out)
-
-                    # التحقق من صحة ملف JSON المفكوك
-                    self._validate_json_file(temp_path)
-
-                    # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
-                    if clear_data:
-                        print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
-
-                    # استعادة الملف المفكوك
-                    call_command('loaddata', temp_path, database='default')
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"خطأ في استعادة الملف المضغوط: {error_msg}")
-
-                    if "Problem installing fixture" in error_msg:
-                        raise ValueError(
-                            f"فشل تثبيت البيانات من الملف المضغوط. قد يكون هناك تضارب في البيانات أو مشكلة في تنسيق الملف. "
-                            f"تفاصيل الخطأ: {error_msg}"
-                        )
-                    else:
-                        raise
-                finally:
-                    # حذف الملف المؤقت
-                    if os.path.exists(temp_path):
-                        os.unlink(temp_path)
+                self._validate_json_file(backup.file_path)
+
+                # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
+                if clear_data:
+                    print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
+
+                call_command('loaddata', backup.file_path, database='default')
+            elif file_info['type'] in ('django_fixture', 'gzip'):
+                # ملف JSON بتنسيق dumpdata (مضغوط أو غير مضغوط)
+                print("استعادة من ملف JSON")
+                self._validate_json_file(backup.file_path)
+                self._restore_from_json(backup.file_path, clear_data)
             else:
                 # نوع ملف غير معروف
                 raise ValueError(
                     f"نوع الملف '{file_info['type']}' (امتداد: {file_info['extension']}) غير مدعوم للاستعادة. "
-                    f"الأنواع المدعومة هي: json_gz, django_fixture, sql, pg_dump (لقواعد بيانات PostgreSQL فقط)"
+                    f"الأنواع المدعومة هي: ndjson_gz, json_gz, django_fixture, sql, pg_dump (لقواعد بيانات PostgreSQL فقط)"
                 )
 
             print("تمت استعادة النسخة الاحتياطية بنجاح")
@@ -696,44 +659,84 @@ class BackupService:
             # إعادة رفع الاستثناء ليتم التعامل معه في المستوى الأعلى
             raise RuntimeError(f"فشل استعادة النسخة الاحتياطية: {str(e)}")
 
-    def _restore_from_json(self, backup, clear_data=False):
+    def _restore_chain(self, backup, clear_data=False):
         """
-        استعادة من ملف JSON مضغوط
+        استعادة سلسلة نسخ: النسخة الكاملة الأولى ثم كل نسخة تزايدية بعدها
 
         Args:
-            backup: كائن النسخة الاحتياطية
-            clear_data: هل يتم حذف البيانات القديمة قبل الاستعادة
+            backup: آخر نسخة في السلسلة المطلوب الوصول إليها
+            clear_data: يُمرر إلى استعادة النسخة الكاملة
         """
-        # استخدام ملف مؤقت للبيانات
-        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as temp_file:
-            temp_path = temp_file.name
+        chain = backup.chain
+        root = chain[0]
+        # حفظ مسارات الملفات قبل استعادة النسخة الكاملة لأنها قد تستبدل سجلات النسخ نفسها
+        increments = [(item.name, item.file_path) for item in chain[1:]]
+        for item_name, file_path in increments:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"ملف النسخة التزايدية '{item_name}' غير موجود: {file_path}")
 
-        try:
-            # فك ضغط الملف
-            with gzip.open(backup.file_path, 'rb') as f_in:
-                with open(temp_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+        print(f"استعادة سلسلة من {len(chain)} نسخة تبدأ بالنسخة الكاملة: {root.name}")
+        self.restore_backup(root.id, clear_data=clear_data)
 
-            # تحديد قاعدة البيانات المستهدفة
-            # استخدام 'default' كاسم للاتصال، وليس اسم قاعدة البيانات
-            database_connection = 'default'
+        for item_name, file_path in increments:
+            print(f"تطبيق النسخة التزايدية: {item_name}")
+            self._restore_from_stream(file_path)
 
-            # طباعة معلومات تشخيصية
-            print(f"استعادة النسخة الاحتياطية باستخدام اتصال قاعدة البيانات: {database_connection}")
-            print(f"نوع النسخة الاحتياطية: {backup.backup_type}")
-            print(f"مسار الملف: {temp_path}")
+        print("تمت استعادة السلسلة بنجاح")
+        return True
 
-            # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
-            if clear_data:
-                print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
+    def _restore_from_json(self, file_path, clear_data=False, skip_errors=False, progress=print_progress):
+        """
+        استعادة من ملف JSON بتنسيق dumpdata (مضغوط أو غير مضغوط)
 
-            # استعادة البيانات
-            call_command('loaddata', temp_path, database=database_connection)
+        يُحلل الملف عنصراً بعنصر ويُستعاد على دفعات لكل نموذج بنفس آلية النسخ المتدفقة
+        (مع الاستكمال بعد الفشل)، بدلاً من loaddata الذي يحمّل الملف كاملاً في الذاكرة
 
-        finally:
-            # حذف الملف المؤقت
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        Args:
+            file_path: مسار ملف JSON
+            clear_data: هل يتم حذف البيانات القديمة قبل الاستعادة
+            skip_errors: تجاهل السجلات التالفة بدلاً من إيقاف الاستعادة
+            progress: دالة تقدم الاستعادة لكل نموذج
+
+        Returns:
+            قاموس بعدد السجلات المستعادة لكل نموذج
+        """
+        # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
+        if clear_data:
+            print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
+
+        restorer = JsonArrayRestorer(file_path, progress=progress, skip_errors=skip_errors)
+        counts = restorer.restore()
+        print(f"تمت استعادة {sum(counts.values()):,} سجل من {len(counts)} نموذج")
+        if restorer.skipped:
+            print(f"تم تجاهل {restorer.skipped} سجل")
+        return counts
+
+    def _restore_from_stream(self, file_path, clear_data=False, batch_size=DEFAULT_BATCH_SIZE,
+                             resume=True, progress=print_progress):
+        """
+        استعادة من نسخة احتياطية متدفقة على دفعات
+
+        Args:
+            file_path: مسار ملف النسخة المتدفقة
+            clear_data: هل يتم حذف البيانات القديمة قبل الاستعادة
+            batch_size: عدد السجلات في كل عملية bulk_create
+            resume: استكمال الاستعادة من آخر نموذج مكتمل إن وجدت محاولة سابقة فاشلة
+            progress: دالة تقدم الاستعادة لكل نموذج
+
+        Returns:
+            قاموس بعدد السجلات المستعادة لكل نموذج
+        """
+        # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
+        if clear_data:
+            print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
+
+        restorer = StreamingRestorer(
+            file_path, batch_size=batch_size, resume=resume, progress=progress
+        )
+        counts = restorer.restore()
+        print(f"تمت استعادة {sum(counts.values()):,} سجل من {len(counts)} نموذج")
+        return counts
 
     def _check_file_type(self, file_path):
         """
@@ -749,6 +752,16 @@ class BackupService:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"الملف '{file_path}' غير موجود")
 
+        # فهرس نسخة في مخزن الأجزاء: محتواه نسخة متدفقة
+        if is_chunked_backup(file_path):
+            return {
+                'path': file_path,
+                'extension': CHUNKED_SUFFIX,
+                'size': os.path.getsize(file_path),
+                'type': 'ndjson_gz',
+                'is_binary': False,
+            }
+
         # الحصول على امتداد الملف
         file_ext = os.path.splitext(file_path)[1].lower()
 
@@ -783,7 +796,8 @@ class BackupService:
 
                 # التحقق مما إذا كان الملف مضغوطًا
                 if header.startswith(b'\x1f\x8b'):  # بداية ملفات GZIP
-                    file_info['type'] = 'gzip'
+                    # النسخ المتدفقة تبدأ بسطر رأس بعد فك الضغط
+                    file_info['type'] = 'ndjson_gz' if is_stream_backup(file_path) else 'gzip'
                 # التحقق مما إذا كان الملف JSON
                 elif header.strip().startswith(b'{') or header.strip().startswith(b'['):
                     file_info['type'] = 'django_fixture'
@@ -1062,6 +1076,7 @@ class BackupService:
             name=name,
             file_path=file_path,
             size=size,
+            checksum=compute_checksum(file_path),
             backup_type=backup_type
         )
 
@@ -1109,10 +1124,14 @@ class BackupService:
                         f"يرجى استخدام ملفات JSON.gz بدلاً من ذلك."
                     )
             # استعادة النسخة الاحتياطية حسب نوع الملف
+            elif file_info['type'] == 'ndjson_gz':
+                # استعادة من نسخة متدفقة
+                print("استعادة من نسخة احتياطية متدفقة")
+                self._restore_from_stream(file_path, clear_data)
             elif file_info['type'] == 'json_gz':
                 # استعادة من ملف JSON مضغوط
                 print("استعادة من ملف JSON مضغوط")
-                self._restore_from_json(backup, clear_data)
+                self._restore_from_json(file_path, clear_data)
             elif file_info['type'] == 'sql':
                 # استعادة من ملف SQL
                 print("استعادة من ملف SQL")
@@ -1133,85 +1152,25 @@ class BackupService:
                         f"لا يمكن استعادة ملفات SQL لقواعد بيانات من نوع {database.db_type}. "
                         f"يرجى استخدام ملفات JSON.gz بدلاً من ذلك."
                     )
-            elif file_info['type'] == 'django_fixture':
-                # استعادة مباشرة باستخدام Django loaddata
-                print(f"استعادة ملف JSON: {file_path}")
-                try:
-                    # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
-                    if clear_data:
-                        print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
-
-                    # استعادة مباشرة بدون فحص إضافي
-                    call_command('loaddata', file_path, database='default', verbosity=2)
-                    print("تمت الاستعادة بنجاح")
+            elif file_info['type'] == 'django_fixture' and file_info['extension'] in ('.xml', '.yaml', '.yml'):
+                # ملفات XML و YAML تُستعاد باستخدام Django loaddata
+                print(f"استعادة ملف: {file_path}")
 
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"خطأ في الاستعادة: {error_msg}")
+                # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
+                if clear_data:
+                    print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
 
-                    # إعادة المحاولة مع تجاهل الأخطاء
-                    try:
-                        print("محاولة الاستعادة مع تجاهل الأخطاء...")
-                        call_command('loaddata', file_path, database='default', verbosity=2, ignore=True)
-                        print("تمت الاستعادة مع تجاهل بعض الأخطاء")
-                    except Exception as e2:
-                        print(f"فشل في الاستعادة نهائياً: {str(e2)}")
-                        raise ValueError(f"فشل في استعادة النسخة الاحتياطية: {error_msg}")
-            elif file_info['type'] == 'gzip':
-                # محاولة فك ضغط الملف واستعادته
-                print("محاولة فك ضغط الملف واستعادته")
-                with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as temp_file:
-                    temp_path = temp_file.name
-
-                try:
-                    # فك ضغط الملف مع معالجة أفضل للأخطاء
-                    try:
-                        with gzip.open(file_path, 'rt', encoding='utf-8') as f_in:
-                            content = f_in.read()
-
-                        # التحقق من أن المحتوى ليس فارغاً
-                        if not content.strip():
-                            raise ValueError("الملف المضغوط فارغ أو لا يحتوي على بيانات")
-
-                        # كتابة المحتوى إلى الملف المؤقت
-                        with open(temp_path, 'w', encoding='utf-8') as f_out:
-                            f_out.write(content)
-
-                    except UnicodeDecodeError:
-                        # محاولة فك الضغط بالطريقة التقليدية
-                        with gzip.open(file_path, 'rb') as f_in:
-                            with open(temp_path, 'wb') as f_out:
-                                shutil.copyfileobj(f_in, f_out)
-
-                    # التحقق من صحة ملف JSON المفكوك
-                    self._validate_json_file(temp_path)
-
-                    # تجاهل حذف البيانات القديمة لتجنب مشاكل flush
-                    if clear_data:
-                        print("تم تجاهل حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
-
-                    # استعادة الملف المفكوك
-                    call_command('loaddata', temp_path, database='default')
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"خطأ في استعادة الملف المضغوط: {error_msg}")
-
-                    if "Problem installing fixture" in error_msg:
-                        raise ValueError(
-                            f"فشل تثبيت البيانات من الملف المضغوط. قد يكون هناك تضارب في البيانات أو مشكلة في تنسيق الملف. "
-                            f"تفاصيل الخطأ: {error_msg}"
-                        )
-                    else:
-                        raise
-                finally:
-                    # حذف الملف المؤقت
-                    if os.path.exists(temp_path):
-                        os.unlink(temp_path)
+                call_command('loaddata', file_path, database='default', verbosity=2)
+            elif file_info['type'] in ('django_fixture', 'gzip'):
+                # ملف JSON (مضغوط أو غير مضغوط) مع تجاهل السجلات التالفة
+                print(f"استعادة ملف JSON: {file_path}")
+                self._validate_json_file(file_path)
+                self._restore_from_json(file_path, clear_data, skip_errors=True)
             else:
                 # نوع ملف غير معروف
                 raise ValueError(
                     f"نوع الملف '{file_info['type']}' (امتداد: {file_info['extension']}) غير مدعوم للاستعادة. "
-                    f"الأنواع المدعومة هي: json_gz, django_fixture, sql, pg_dump (لقواعد بيانات PostgreSQL فقط)"
+                    f"الأنواع المدعومة هي: ndjson_gz, json_gz, django_fixture, sql, pg_dump (لقواعد بيانات PostgreSQL فقط)"
                 )
             return True
         except Exception as e:
@@ -1226,9 +1185,8 @@ class BackupService:
         # الحصول على النسخة الاحتياطية
         backup = Backup.objects.get(id=backup_id)
 
-        # حذف ملف النسخة الاحتياطية
-        if os.path.exists(backup.file_path):
-            os.remove(backup.file_path)
+        # حذف ملف (أو مجلد) النسخة الاحتياطية
+        remove_backup_path(backup.file_path)
 
         # حذف سجل النسخة الاحتياطية
         backup.delete()
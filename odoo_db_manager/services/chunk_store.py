@@ -0,0 +1,291 @@
+"""
+مخزن أجزاء النسخ الاحتياطية (تخزين حسب المحتوى مع إزالة التكرار)
+يُقسم محتوى النسخة المتدفقة بعد فك ضغطها إلى أجزاء تحددها محتوياتها، ويُخزن كل جزء فريد
+مرة واحدة باسم بصمته، بينما تُحفظ النسخة نفسها كملف فهرس صغير بقائمة أجزائها؛
+لذلك النسخ الكاملة المتتالية لقاعدة بيانات قليلة التغير تتشارك معظم أجزائها
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+
+# امتداد ملف الفهرس الذي يحل محل ملف النسخة
+CHUNKED_SUFFIX = '.chunks.json'
+MANIFEST_FORMAT = 'chunked'
+MANIFEST_VERSION = 1
+
+# حدود حجم الجزء؛ القطع يتم بعد سطر تحقق بصمته شرط القناع (متوسط ~512 سطر لكل جزء)
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+BOUNDARY_MASK = 0x1FF
+
+# الأجزاء الأحدث من هذه المدة لا تُحذف حتى لا يُحذف جزء نسخة قيد الإنشاء
+GC_GRACE = timedelta(hours=1)
+
+
+class ChunkStoreError(Exception):
+    """خطأ في مخزن الأجزاء (جزء مفقود أو تالف)"""
+
+
+def get_store_root():
+    return getattr(settings, 'BACKUP_CHUNK_ROOT', os.path.join(settings.MEDIA_ROOT, 'backups', 'chunks'))
+
+
+def is_chunked_backup(path):
+    """
+    هل المسار ملف فهرس نسخة مخزنة في مخزن الأجزاء
+    """
+    return bool(path) and path.endswith(CHUNKED_SUFFIX)
+
+
+def iter_chunks(stream, min_size=MIN_CHUNK_SIZE, max_size=MAX_CHUNK_SIZE, mask=BOUNDARY_MASK):
+    """
+    تقسيم محتوى ثنائي إلى أجزاء تحدد حدودها الأسطر نفسها
+
+    حد الجزء يقع بعد سطر تحقق بصمته (crc32) شرط القناع، لذلك إضافة أو حذف سجل
+    لا يغير إلا الجزء الذي يحتويه بدلاً من إزاحة كل الأجزاء بعده كما في التقسيم الثابت
+    """
+    parts = []
+    size = 0
+    while True:
+        line = stream.readline(max_size)
+        if not line:
+            break
+        parts.append(line)
+        size += len(line)
+        if size >= max_size or (size >= min_size and not zlib.crc32(line) & mask):
+            yield b''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield b''.join(parts)
+
+
+class ChunkStore:
+    """
+    مخزن الأجزاء على القرص: objects/<أول حرفين من البصمة>/<البصمة> مضغوطة بـ zlib
+    """
+
+    def __init__(self, root=None):
+        self.root = root or get_store_root()
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def put(self, data):
+        """
+        تخزين جزء إذا لم يكن موجوداً
+
+        Returns:
+            (البصمة، عدد البايتات المكتوبة على القرص أو 0 إذا كان الجزء موجوداً)
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            # تحديث وقت التعديل يحمي الجزء من الحذف أثناء مهلة التنظيف
+            os.utime(path)
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        # ملف مؤقت فريد لكل كتابة: خيطان قد يكتبان نفس الجزء في نفس الوقت
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(compressed)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return digest, len(compressed)
+
+    def get(self, digest):
+        """
+        قراءة جزء والتحقق من بصمته
+        """
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                data = zlib.decompress(f.read())
+        except FileNotFoundError:
+            raise ChunkStoreError(f"جزء مفقود من مخزن النسخ: {digest}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ChunkStoreError(f"جزء تالف في مخزن النسخ: {digest}")
+        return data
+
+    def ingest_file(self, source_path, manifest_path):
+        """
+        تخزين نسخة متدفقة (gzip) في المخزن وكتابة ملف الفهرس بدلاً منها
+
+        Returns:
+            قاموس الفهرس مع إحصائيات الأجزاء الجديدة
+        """
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        new_chunks = 0
+        stored_bytes = 0
+        with gzip.open(source_path, 'rb') as stream:
+            for data in iter_chunks(stream):
+                chunk_digest, written = self.put(data)
+                chunks.append([chunk_digest, len(data)])
+                digest.update(data)
+                size += len(data)
+                if written:
+                    new_chunks += 1
+                    stored_bytes += written
+
+        manifest = {
+            'format': MANIFEST_FORMAT,
+            'version': MANIFEST_VERSION,
+            'size': size,
+            'sha256': digest.hexdigest(),
+            'chunks': chunks,
+        }
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+
+        return {
+            **manifest,
+            'new_chunks': new_chunks,
+            'stored_bytes': stored_bytes,
+        }
+
+    def iter_content(self, manifest, start=0, end=None):
+        """
+        إعادة بناء محتوى النسخة (أو جزء منه من start إلى end شاملة) من أجزائها
+        """
+        if end is None:
+            end = manifest['size'] - 1
+        offset = 0
+        for digest, length in manifest['chunks']:
+            chunk_end = offset + length - 1
+            if chunk_end >= start and offset <= end:
+                data = self.get(digest)
+                yield data[max(start - offset, 0):end - offset + 1]
+            if chunk_end >= end:
+                break
+            offset += length
+
+    def open(self, manifest):
+        """
+        ملف ثنائي للقراءة المتتابعة من أجزاء النسخة
+        """
+        return io.BufferedReader(_ChunkReader(self.iter_content(manifest)), buffer_size=MAX_CHUNK_SIZE)
+
+    def referenced_chunks(self):
+        """
+        بصمات كل الأجزاء التي تشير إليها نسخ موجودة
+
+        Raises:
+            ChunkStoreError: إذا تعذرت قراءة أي فهرس؛ تخطيه يجعل أجزاءه تبدو غير مستخدمة فتُحذف
+        """
+        from odoo_db_manager.models import Backup
+
+        referenced = set()
+        paths = Backup.objects.filter(file_path__endswith=CHUNKED_SUFFIX).values_list('file_path', flat=True)
+        for path in paths.iterator():
+            try:
+                manifest = load_manifest(path)
+            except (OSError, ValueError) as e:
+                raise ChunkStoreError(f"تعذر قراءة فهرس النسخة {path}: {str(e)}")
+            referenced.update(digest for digest, _ in manifest['chunks'])
+        return referenced
+
+    def collect_garbage(self, grace=GC_GRACE):
+        """
+        حذف الأجزاء التي لم تعد تشير إليها أي نسخة
+        (لا يُحذف أي جزء إذا تعذرت قراءة فهرس أي نسخة)
+
+        Returns:
+            (عدد الأجزاء المحذوفة، عدد البايتات المحررة)
+        """
+        objects_dir = os.path.join(self.root, 'objects')
+        if not os.path.isdir(objects_dir):
+            return 0, 0
+
+        referenced = self.referenced_chunks()
+        cutoff = time.time() - grace.total_seconds()
+        deleted = 0
+        freed = 0
+        for prefix in os.listdir(objects_dir):
+            prefix_dir = os.path.join(objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name in referenced:
+                    continue
+                path = os.path.join(prefix_dir, name)
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff:
+                    continue
+                os.unlink(path)
+                deleted += 1
+                freed += stat.st_size
+        if deleted:
+            print(f"تم حذف {deleted} جزء غير مستخدم من مخزن النسخ ({freed:,} بايت)")
+        return deleted, freed
+
+    def usage(self):
+        """
+        عدد الأجزاء المخزنة وحجمها الفعلي على القرص
+        """
+        count = 0
+        size = 0
+        objects_dir = os.path.join(self.root, 'objects')
+        for dir_path, _, file_names in os.walk(objects_dir):
+            for name in file_names:
+                count += 1
+                size += os.path.getsize(os.path.join(dir_path, name))
+        return {'chunks': count, 'size': size}
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    قارئ ثنائي متتابع فوق مولد أجزاء
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def load_manifest(path):
+    """
+    قراءة ملف فهرس نسخة مخزنة
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != MANIFEST_FORMAT:
+        raise ValueError(f"ملف فهرس غير صالح: {path}")
+    return manifest
+
+
+def open_chunked_text(path):
+    """
+    فتح محتوى نسخة مخزنة كملف نصي (بنفس محتوى ملف gzip الأصلي بعد فك الضغط)
+    """
+    return io.TextIOWrapper(ChunkStore().open(load_manifest(path)), encoding='utf-8')
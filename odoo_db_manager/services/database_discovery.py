@@ -0,0 +1,135 @@
+"""
+لقطة قواعد البيانات المكتشفة في PostgreSQL
+الاكتشاف يستدعي psql لذلك لا يتم عند بدء التشغيل؛ نتيجته تُحفظ في ملف مع وقت إنشائها
+وتُستخدم طالما كانت حديثة، وعند انتهاء صلاحيتها تُعاد اللقطة القديمة ويتم التحديث في الخلفية
+"""
+
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from odoo_db_manager.services.startup import run_deferred, startup_report
+
+# مدة صلاحية اللقطة بالثواني
+DISCOVERY_TTL = 10 * 60
+
+_refresh_lock = threading.Lock()
+_refreshing = False
+_settings_synced = False
+_settings_lock = threading.Lock()
+
+
+def get_discovery_ttl():
+    return getattr(settings, 'DB_DISCOVERY_TTL', DISCOVERY_TTL)
+
+
+def get_snapshot_path():
+    return getattr(settings, 'DB_DISCOVERY_SNAPSHOT', os.path.join(settings.BASE_DIR, 'db_discovery.json'))
+
+
+def load_snapshot():
+    """
+    قراءة اللقطة المحفوظة
+
+    Returns:
+        قاموس {'discovered_at': ..., 'databases': [...]} أو None إذا لم تكن موجودة أو كانت تالفة
+    """
+    try:
+        with open(get_snapshot_path(), 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or 'databases' not in snapshot:
+        return None
+    return snapshot
+
+
+def is_fresh(snapshot):
+    return bool(snapshot) and time.time() - snapshot.get('discovered_at', 0) < get_discovery_ttl()
+
+
+def save_snapshot(databases):
+    path = get_snapshot_path()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'discovered_at': time.time(), 'databases': databases}, f)
+    os.replace(temp_path, path)
+
+
+def refresh_snapshot(sync=False):
+    """
+    اكتشاف قواعد البيانات الآن وحفظ اللقطة
+
+    Args:
+        sync: مزامنة القواعد المكتشفة مع سجلات Database أيضاً
+
+    Returns:
+        قائمة قواعد البيانات المكتشفة
+    """
+    from odoo_db_manager.services.database_service import DatabaseService
+
+    database_service = DatabaseService()
+    databases = database_service.discover_postgresql_databases()
+    save_snapshot(databases)
+    if sync:
+        database_service.sync_discovered_databases(databases)
+    return databases
+
+
+def refresh_snapshot_async(sync=True):
+    """
+    تحديث اللقطة في خيط خلفي (تحديث واحد فقط في نفس الوقت لكل عملية)
+
+    Returns:
+        True إذا بدأ التحديث، False إذا كان هناك تحديث جارٍ
+    """
+    global _refreshing
+    with _refresh_lock:
+        if _refreshing:
+            return False
+        _refreshing = True
+
+    def refresh():
+        global _refreshing
+        try:
+            refresh_snapshot(sync=sync)
+        finally:
+            with _refresh_lock:
+                _refreshing = False
+
+    run_deferred('اكتشاف قواعد البيانات', refresh)
+    return True
+
+
+def get_discovered_databases():
+    """
+    قواعد البيانات المكتشفة من اللقطة: الحديثة تُعاد مباشرة، والقديمة تُعاد مع تحديثها في الخلفية،
+    ولا يتم الاكتشاف المتزامن إلا إذا لم توجد لقطة على الإطلاق
+    """
+    snapshot = load_snapshot()
+    if snapshot is None:
+        return refresh_snapshot()
+    if not is_fresh(snapshot):
+        refresh_snapshot_async()
+    return snapshot['databases']
+
+
+def ensure_databases_synced():
+    """
+    مزامنة قواعد البيانات عند الحاجة بدلاً من كل بدء تشغيل: ملف الإعدادات مرة واحدة لكل عملية،
+    والقواعد المكتشفة فقط عند انتهاء صلاحية اللقطة (في الخلفية)
+    """
+    global _settings_synced
+    with _settings_lock:
+        if not _settings_synced:
+            from odoo_db_manager.services.database_service import DatabaseService
+
+            with startup_report.step('مزامنة ملف إعدادات قواعد البيانات', deferred=True):
+                DatabaseService().sync_databases_from_settings()
+            _settings_synced = True
+
+    if not is_fresh(load_snapshot()):
+        refresh_snapshot_async(sync=True)
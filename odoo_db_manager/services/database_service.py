@@ -291,9 +291,10 @@ class DatabaseService:
             print(f"خطأ في اكتشاف قواعد البيانات: {str(e)}")
             return []
 
-    def sync_discovered_databases(self):
-        """مزامنة قواعد البيانات المكتشفة مع النظام"""
-        discovered_dbs = self.discover_postgresql_databases()
+    def sync_discovered_databases(self, discovered_dbs=None):
+        """مزامنة قواعد البيانات المكتشفة مع النظام (أو القائمة المعطاة من لقطة الاكتشاف)"""
+        if discovered_dbs is None:
+            discovered_dbs = self.discover_postgresql_databases()
 
         if not discovered_dbs:
             return
@@ -0,0 +1,267 @@
+"""
+النسخ الاحتياطية التزايدية
+تنسخ فقط السجلات التي تغيرت منذ النسخة السابقة في السلسلة (حسب updated_at) مع سجلات
+الحذف (tombstones)، وتُستعاد بتطبيق النسخة الكاملة ثم النسخ التزايدية بالترتيب
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+from django.db.models.signals import post_delete, pre_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from odoo_db_manager.models import Backup, BackupSchedule, DeletedRecord
+from odoo_db_manager.services.streaming_backup import (
+    StreamingBackupWriter, _model_queryset, get_backup_models,
+)
+
+# حقل التاريخ الذي يحدد تغير السجل (يجب أن يكون auto_now حتى يتغير مع كل تعديل)
+CHANGE_FIELD = 'updated_at'
+
+# بيانات تشغيلية مؤقتة لا تُنقل في النسخ التزايدية (تبقى كما في النسخة الكاملة عند الاستعادة)
+INCREMENTAL_EXCLUDED_APPS = ('sessions', 'django_apscheduler')
+INCREMENTAL_EXCLUDED_MODELS = ('odoo_db_manager.BackupJob',)
+
+# أقصى مدة (بالثواني) حتى تلاحظ كل عملية تفعيل أو إيقاف الجدولات التزايدية
+TOMBSTONE_REFRESH_INTERVAL = 60
+TOMBSTONE_BATCH_SIZE = 1000
+# سجل خاص في DeletedRecord يحدد بداية فترة تسجيل الحذف الحالية
+TRACKING_MARKER = '__tracking__'
+
+_local = threading.local()
+_tracking_lock = threading.Lock()
+_tracking = {'enabled': None, 'checked_at': None}
+
+
+def change_field(model):
+    """
+    اسم حقل التاريخ الذي يُستخدم لاكتشاف تغير سجلات النموذج، أو None
+
+    created_at لا يُستخدم لأنه لا يلتقط تعديل السجلات الموجودة (مثل تغيير الحالة)،
+    فالنماذج بدون updated_at (auto_now) تُنسخ كاملة عمداً في كل نسخة تزايدية
+    (مثل OrderItem و Payment و StockTransaction و ProductionOrder و ActivityLog)
+    """
+    try:
+        field = model._meta.get_field(CHANGE_FIELD)
+    except FieldDoesNotExist:
+        return None
+    if field.concrete and getattr(field, 'auto_now', False):
+        return field.name
+    return None
+
+
+def is_incremental_model(model):
+    return (
+        model._meta.app_label not in INCREMENTAL_EXCLUDED_APPS
+        and model._meta.label not in INCREMENTAL_EXCLUDED_MODELS
+    )
+
+
+def get_incremental_models():
+    """
+    النماذج المشمولة في النسخ التزايدية: نماذج النسخة الكاملة عدا البيانات التشغيلية المؤقتة
+    """
+    return [model for model in get_backup_models('full') if is_incremental_model(model)]
+
+
+class IncrementalBackupWriter(StreamingBackupWriter):
+    """
+    كاتب نسخة تزايدية: نفس تنسيق النسخ المتدفقة مع تصفية السجلات حسب تاريخ التغيير
+    وإضافة أسطر الحذف في النهاية
+    """
+
+    def __init__(self, file_path, since, until, **kwargs):
+        super().__init__(file_path, **kwargs)
+        self.since = since
+        self.until = until
+
+    def get_queryset(self, model):
+        queryset = _model_queryset(model, self.using)
+        field = change_field(model)
+        if field:
+            queryset = queryset.filter(**{f'{field}__gt': self.since})
+        return queryset
+
+    def write_extra(self, stream):
+        tombstones = DeletedRecord.objects.using(self.using).filter(
+            deleted_at__gt=self.since, deleted_at__lte=self.until
+        ).exclude(model_label=TRACKING_MARKER).order_by('model_label', 'pk').values_list('model_label', 'object_pk')
+
+        current = None
+        pks = []
+        for label, object_pk in tombstones.iterator(chunk_size=self.chunk_size):
+            if label != current or len(pks) >= self.chunk_size:
+                if pks:
+                    self._write_line(stream, {'_deleted': current, 'pks': pks})
+                current, pks = label, []
+            pks.append(object_pk)
+        if pks:
+            self._write_line(stream, {'_deleted': current, 'pks': pks})
+
+
+def _collection(using):
+    """
+    سجلات الحذف المجمعة لعملية الحذف الحالية في هذا الخيط
+
+    كل عملية حذف في Django (Collector.delete) تعمل داخل كتلة atomic خاصة بها وترسل pre_delete
+    لكل السجلات قبل حذفها ثم post_delete بعده، لذلك تُعرف العملية بكتلتها، وتُعد سجلاتها في
+    pre_delete وتُدرج دفعة واحدة داخل نفس المعاملة عند وصول آخر post_delete
+    """
+    connection = connections[using]
+    block = connection.atomic_blocks[-1] if connection.atomic_blocks else None
+    collection = getattr(_local, 'collection', None)
+    if collection is None or collection['block'] is not block or collection['using'] != using:
+        collection = _local.collection = {'block': block, 'using': using, 'expected': 0, 'records': []}
+    return collection
+
+
+def count_tombstone(sender, instance, using, **kwargs):
+    _collection(using)['expected'] += 1
+
+
+def record_tombstone(sender, instance, using, **kwargs):
+    """
+    تسجيل حذف سجل من نموذج مشمول في النسخ التزايدية
+    """
+    collection = _collection(using)
+    collection['records'].append(
+        DeletedRecord(model_label=sender._meta.label_lower, object_pk=str(instance.pk))
+    )
+    if len(collection['records']) >= collection['expected']:
+        _local.collection = None
+        DeletedRecord.objects.using(using).bulk_create(collection['records'], batch_size=TOMBSTONE_BATCH_SIZE)
+
+
+def get_refresh_interval():
+    return getattr(settings, 'BACKUP_TOMBSTONE_REFRESH_INTERVAL', TOMBSTONE_REFRESH_INTERVAL)
+
+
+def tracking_required(using=DEFAULT_DB_ALIAS):
+    """
+    هل توجد جدولة تزايدية نشطة تحتاج إلى تسجيل الحذف
+    """
+    return BackupSchedule.objects.using(using).filter(is_active=True, backup_type='incremental').exists()
+
+
+def set_tombstone_receivers(enabled):
+    """
+    ربط تسجيل الحذف بنماذج النسخ التزايدية أو فصله
+    (ربط إشارات الحذف بنموذج يمنع الحذف السريع في Django لجدوله، لذلك لا تُربط إلا عند الحاجة)
+    """
+    for model in get_incremental_models():
+        uid = f'backup_tombstone_{model._meta.label_lower}'
+        if enabled:
+            pre_delete.connect(count_tombstone, sender=model, dispatch_uid=uid)
+            post_delete.connect(record_tombstone, sender=model, dispatch_uid=uid)
+        else:
+            pre_delete.disconnect(sender=model, dispatch_uid=uid)
+            post_delete.disconnect(sender=model, dispatch_uid=uid)
+
+
+def refresh_tombstone_receivers(force=False, **kwargs):
+    """
+    تفعيل تسجيل الحذف في هذه العملية فقط أثناء وجود جدولة تزايدية نشطة
+    (يُتحقق مرة كل BACKUP_TOMBSTONE_REFRESH_INTERVAL ثانية على الأكثر، عند بدء الطلبات وفتح الاتصالات)
+
+    Returns:
+        هل تسجيل الحذف مفعل
+    """
+    if not apps.models_ready:
+        return False
+    now = time.monotonic()
+    with _tracking_lock:
+        checked_at = _tracking['checked_at']
+        if not force and checked_at is not None and now - checked_at < get_refresh_interval():
+            return _tracking['enabled']
+        # قبل الاستعلام حتى لا يُعاد التحقق عند فتح الاتصال الذي سيُستخدم له
+        _tracking['checked_at'] = now
+
+    try:
+        enabled = tracking_required()
+    except DatabaseError:
+        # الجداول غير موجودة بعد (قبل migrate)
+        enabled = False
+
+    with _tracking_lock:
+        if enabled != _tracking['enabled']:
+            set_tombstone_receivers(enabled)
+            _tracking['enabled'] = enabled
+    return enabled
+
+
+def refresh_on_connection(sender, connection, **kwargs):
+    if connection.alias == DEFAULT_DB_ALIAS:
+        refresh_tombstone_receivers()
+
+
+def connect_tombstone_receivers():
+    """
+    التحقق من الحاجة إلى تسجيل الحذف عند بدء الطلبات وعند فتح اتصالات قاعدة البيانات
+    (الأوامر والسكربتات التي لا تستقبل طلبات تتحقق عند أول اتصال)
+    """
+    request_started.connect(refresh_tombstone_receivers, dispatch_uid='backup_tombstone_refresh')
+    connection_created.connect(refresh_on_connection, dispatch_uid='backup_tombstone_refresh')
+
+
+def mark_tracking_start():
+    """
+    تسجيل بداية تسجيل الحذف عند تفعيل أول جدولة تزايدية؛ العمليات الأخرى قد تتأخر حتى
+    BACKUP_TOMBSTONE_REFRESH_INTERVAL في ملاحظة التفعيل، لذلك تُعد البداية بعد هذه المدة
+    """
+    DeletedRecord.objects.create(
+        model_label=TRACKING_MARKER,
+        object_pk='',
+        deleted_at=timezone.now() + timedelta(seconds=get_refresh_interval()),
+    )
+    refresh_tombstone_receivers(force=True)
+
+
+def tracking_started_at():
+    """
+    بداية فترة تسجيل الحذف الحالية (أو None إذا لم تُسجل)؛ النسخة التزايدية لا تُبنى على نسخة
+    أقدم منها لأن عمليات الحذف قبلها لم تُسجل
+    """
+    return DeletedRecord.objects.filter(model_label=TRACKING_MARKER).aggregate(
+        started=Max('deleted_at')
+    )['started']
+
+
+def purge_tombstones():
+    """
+    حذف سجلات الحذف التي لم تعد تحتاجها أي نسخة تزايدية قادمة
+    (الأقدم من آخر نسخة في سلسلة كل قاعدة بيانات)
+
+    Returns:
+        عدد السجلات المحذوفة
+    """
+    heads = Backup.objects.filter(
+        backup_type__in=('full', 'parallel', 'incremental'),
+        details__has_key='captured_at',
+    ).values('database').annotate(last=Max('created_at'))
+
+    cutoffs = []
+    for head in heads:
+        backup = Backup.objects.filter(database=head['database'], created_at=head['last']).first()
+        if backup:
+            cutoffs.append(parse_datetime(backup.details['captured_at']))
+    if not cutoffs:
+        return 0
+
+    deleted, _ = DeletedRecord.objects.filter(deleted_at__lte=min(cutoffs)).exclude(
+        model_label=TRACKING_MARKER
+    ).delete()
+
+    # علامات بداية التسجيل القديمة لا تُستخدم (تكفي الأحدث)
+    started = tracking_started_at()
+    if started is not None:
+        DeletedRecord.objects.filter(model_label=TRACKING_MARKER, deleted_at__lt=started).delete()
+    return deleted
@@ -0,0 +1,201 @@
+"""
+معالجات المهام الخلفية لإدارة قواعد البيانات
+كل معالج يستقبل سجل BackupJob وكائن JobProgress ويعيد قاموس النتيجة الذي يُحفظ في المهمة
+"""
+
+import os
+import shutil
+
+from django.conf import settings
+
+from odoo_db_manager.models import Backup, BackupSchedule, Database
+
+
+def _model_progress(progress, models_total):
+    """
+    دالة تقدم لخدمة النسخ (النموذج، المكتوب، الإجمالي) تُحول إلى عدد النماذج المكتملة
+    """
+    seen = []
+
+    def report(label, done, total):
+        if label not in seen:
+            seen.append(label)
+        progress.update(len(seen) - 1, models_total, f"{label}: {done:,}")
+
+    return report
+
+
+def run_backup(job, progress):
+    """
+    معالج مهمة 'backup'
+
+    Args:
+        job: سجل BackupJob (المعاملات: name و backup_type)
+        progress: كائن JobProgress لتحديث التقدم
+    """
+    from odoo_db_manager.services.backup_service import BackupService
+    from odoo_db_manager.services.streaming_backup import get_backup_models
+
+    db = job.database
+    name = job.params.get('name') or None
+    backup_type = job.params.get('backup_type', 'full')
+    print(f"إنشاء نسخة احتياطية جديدة لقاعدة البيانات: {db.name} ({backup_type})")
+
+    # كل الأنواع عبر خدمة النسخ الاحتياطي: الكتابة المتدفقة ومخزن الأجزاء وسلسلة النسخ التزايدية
+    progress.update(0, None, "بدء النسخ", force=True)
+    backup = BackupService().create_backup(
+        database_id=db.id,
+        name=name,
+        user=job.created_by,
+        backup_type=backup_type,
+        progress=_model_progress(progress, len(get_backup_models(backup_type))),
+    )
+
+    print(f"تم إنشاء سجل النسخة الاحتياطية بنجاح: {backup.id}")
+    return {'backup_id': backup.id, 'backup_name': backup.name}
+
+
+def _restore_sqlite_file(backup):
+    """
+    استبدال ملف قاعدة بيانات SQLite بملف النسخة مع إعادة إنشاء سجل النسخة بعد الاستبدال
+    """
+    from accounts.models import User
+
+    backup_info = {
+        'id': backup.id,
+        'name': backup.name,
+        'database_id': backup.database_id,
+        'backup_type': backup.backup_type,
+        'file_path': backup.file_path,
+        'created_at': backup.created_at,
+        'created_by_id': backup.created_by_id,
+    }
+    db_file = settings.DATABASES['default']['NAME']
+
+    # إنشاء نسخة احتياطية من قاعدة البيانات الحالية قبل الاستبدال
+    backup_current_db = f"{db_file}.bak"
+    shutil.copy2(db_file, backup_current_db)
+
+    try:
+        shutil.copy2(backup.file_path, db_file)
+
+        try:
+            db = Database.objects.get(id=backup_info['database_id'])
+        except Database.DoesNotExist:
+            # إذا لم تكن قاعدة البيانات موجودة، نستخدم أول قاعدة بيانات متاحة
+            db = Database.objects.first()
+            if not db:
+                db = Database.objects.create(
+                    name="Default Database",
+                    db_type="sqlite3",
+                    connection_info={}
+                )
+
+        user = None
+        if backup_info['created_by_id']:
+            user = User.objects.filter(id=backup_info['created_by_id']).first() or User.objects.first()
+
+        # إعادة إنشاء سجل النسخة الاحتياطية إذا لم يكن موجوداً في الملف المستعاد
+        if not Backup.objects.filter(id=backup_info['id']).exists():
+            Backup.objects.create(
+                id=backup_info['id'],
+                name=backup_info['name'],
+                database=db,
+                backup_type=backup_info['backup_type'],
+                file_path=backup_info['file_path'],
+                created_at=backup_info['created_at'],
+                created_by=user
+            )
+    except Exception as e:
+        shutil.copy2(backup_current_db, db_file)
+        raise RuntimeError(f"فشل استعادة قاعدة البيانات: {str(e)}")
+    finally:
+        if os.path.exists(backup_current_db):
+            os.unlink(backup_current_db)
+
+
+def run_restore(job, progress):
+    """
+    معالج مهمة 'restore'
+
+    Args:
+        job: سجل BackupJob (المعاملات: backup_id و tables الاختيارية)
+        progress: كائن JobProgress لتحديث التقدم
+    """
+    backup = Backup.objects.get(pk=job.params['backup_id'])
+    if not os.path.exists(backup.file_path):
+        raise FileNotFoundError(f"ملف النسخة الاحتياطية '{backup.file_path}' غير موجود")
+
+    def report(label, done, total):
+        progress.update(done, total, f"{label}: {done:,}")
+
+    progress.update(0, None, f"استعادة {backup.name}", force=True)
+
+    # النسخ المتوازية والتزايدية: عبر خدمة النسخ الاحتياطي
+    if backup.is_directory or backup.parent_id:
+        from odoo_db_manager.services.backup_service import BackupService
+
+        BackupService().restore_backup(backup.pk, tables=job.params.get('tables') or None)
+        return {'backup_id': backup.pk}
+
+    if backup.file_path.endswith('.sqlite3'):
+        # بعد الاستبدال قد لا يوجد سجل هذه المهمة في قاعدة البيانات المستعادة
+        _restore_sqlite_file(backup)
+        return {'backup_id': backup.pk}
+
+    from odoo_db_manager.services.streaming_backup import is_stream_backup
+    from odoo_db_manager.services.streaming_restore import StreamingRestorer
+    from odoo_db_manager.services.upload_restore import JsonArrayRestorer
+
+    if is_stream_backup(backup.file_path):
+        restorer = StreamingRestorer(backup.file_path, progress=report)
+    elif backup.file_path.endswith(('.json', '.json.gz')):
+        restorer = JsonArrayRestorer(backup.file_path, progress=report, resume=False, skip_errors=True)
+    else:
+        raise ValueError("نوع ملف غير مدعوم. يرجى استخدام ملفات JSON.")
+
+    counts = restorer.restore()
+    restored = sum(counts.values())
+    print(f"🎯 تمت الاستعادة: {restored} عنصر بنجاح، {restorer.skipped} عنصر تم تجاهله")
+    return {'backup_id': backup.pk, 'restored': restored, 'skipped': restorer.skipped}
+
+
+def run_scheduled_backup(job, progress):
+    """
+    معالج مهمة 'scheduled_backup' (المعاملات: schedule_id)
+    """
+    from odoo_db_manager.services.scheduled_backup_service import create_backup_job
+
+    schedule = BackupSchedule.objects.get(pk=job.params['schedule_id'])
+    if not schedule.is_active:
+        return {'skipped': True}
+
+    progress.update(0, None, f"تشغيل الجدولة {schedule.name}", force=True)
+    backup = create_backup_job(schedule.id)
+    if backup is None:
+        raise RuntimeError("فشل إنشاء النسخة الاحتياطية المجدولة")
+    return {'backup_id': backup.id, 'backup_name': backup.name}
+
+
+def run_verify(job, progress):
+    """
+    معالج مهمة 'verify' (المعاملات: backup_id): مقارنة بصمة SHA-256 للملف بالبصمة المحفوظة،
+    وحفظ البصمة الحالية كمرجع للنسخ القديمة التي أُنشئت بدونها
+    """
+    from odoo_db_manager.services.backup_integrity import compute_checksum
+
+    backup = Backup.objects.get(pk=job.params['backup_id'])
+    if not os.path.exists(backup.file_path):
+        raise FileNotFoundError(f"ملف النسخة الاحتياطية '{backup.file_path}' غير موجود")
+
+    total = backup.size or None
+    progress.update(0, total, f"حساب بصمة {backup.name}", force=True)
+    actual = compute_checksum(
+        backup.file_path, progress=lambda done: progress.update(done, total, "حساب البصمة")
+    )
+    expected = backup.checksum
+    if not expected:
+        backup.checksum = expected = actual
+        backup.save(update_fields=['checksum'])
+
+    return {'backup_id': backup.pk, 'valid': actual == expected, 'expected': expected, 'actual': actual}
@@ -0,0 +1,421 @@
+"""
+النسخ الاحتياطي والاستعادة المتوازية لقواعد بيانات PostgreSQL
+يستخدم تنسيق المجلد (pg_dump -Fd) الذي يكتب كل جدول في ملف مستقل، مما يسمح بتوزيع
+الجداول على عدة عمليات عند النسخ والاستعادة (--jobs) واستعادة مجموعة جزئية من الجداول
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+
+from django.conf import settings
+
+# عدد العمليات الافتراضي: عدد الأنوية المتاحة بحد أقصى 8
+DEFAULT_JOBS = getattr(settings, 'BACKUP_PARALLEL_JOBS', min(os.cpu_count() or 1, 8))
+
+_DUMP_START = re.compile(r'dumping contents of table "?([\w.]+)"?')
+_RESTORE_START = re.compile(r'processing data for table "?([\w.]+)"?')
+_FINISHED = re.compile(r'finished item \d+ TABLE DATA "?([\w.]+)"?')
+# سطر من مخرجات pg_restore -l: "1234; 0 16390 TABLE DATA public products_product owner"
+_TOC_TABLE_DATA = re.compile(r'^(\d+); \d+ \d+ TABLE DATA (\S+) (\S+)')
+
+
+def _table_name(name):
+    """
+    حذف اسم المخطط (public.) من اسم الجدول
+    """
+    return name.split('.', 1)[-1]
+
+
+def connection_params(connection_info=None):
+    """
+    معاملات الاتصال لأدوات PostgreSQL (من معلومات قاعدة البيانات أو من إعدادات Django)
+
+    Returns:
+        (قائمة المعاملات، متغيرات البيئة، اسم قاعدة البيانات)
+    """
+    db_settings = settings.DATABASES['default']
+    info = connection_info or {}
+    host = info.get('HOST') or db_settings.get('HOST') or 'localhost'
+    port = info.get('PORT') or db_settings.get('PORT') or '5432'
+    user = info.get('USER') or db_settings.get('USER') or ''
+    password = info.get('PASSWORD') or db_settings.get('PASSWORD') or ''
+    name = info.get('NAME') or db_settings['NAME']
+
+    env = os.environ.copy()
+    if password:
+        env['PGPASSWORD'] = str(password)
+    args = ['-h', str(host), '-p', str(port)]
+    if user:
+        args += ['-U', str(user)]
+    return args, env, str(name)
+
+
+def _quote_table(schema, table):
+    """
+    اسم جدول كامل مع المخطط بصيغة آمنة لـ SQL
+    """
+    return '.'.join('"{}"'.format(part.replace('"', '""')) for part in (schema, table))
+
+
+def _psql(args, env, name, sql):
+    result = subprocess.run(
+        ['psql', *args, '-d', name, '-At', '-v', 'ON_ERROR_STOP=1', '-c', sql],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return result.stdout
+
+
+def referencing_tables(args, env, name, tables):
+    """
+    الجداول خارج المجموعة المحددة التي تشير بمفاتيح أجنبية إلى جداولها في قاعدة البيانات الهدف
+
+    Args:
+        tables: مجموعة من (المخطط، الجدول)
+
+    Returns:
+        قائمة من (الجدول المشير "schema.table"، الجدول المشار إليه "schema.table")
+    """
+    names = ', '.join(
+        "'{}'".format(f'{schema}.{table}'.replace("'", "''")) for schema, table in sorted(tables)
+    )
+    output = _psql(args, env, name, (
+        "SELECT DISTINCT cn.nspname || '.' || c.relname, rn.nspname || '.' || r.relname "
+        "FROM pg_constraint k "
+        "JOIN pg_class c ON c.oid = k.conrelid JOIN pg_namespace cn ON cn.oid = c.relnamespace "
+        "JOIN pg_class r ON r.oid = k.confrelid JOIN pg_namespace rn ON rn.oid = r.relnamespace "
+        f"WHERE k.contype = 'f' AND rn.nspname || '.' || r.relname IN ({names}) "
+        f"AND cn.nspname || '.' || c.relname NOT IN ({names})"
+    ))
+    return [tuple(line.split('|', 1)) for line in output.splitlines() if '|' in line]
+
+
+def _run_timed(cmd, env, start_pattern, stdout=subprocess.DEVNULL):
+    """
+    تشغيل أمر مع قراءة مخرجات --verbose سطراً بسطر وقياس زمن كل جدول
+
+    في الوضع المتوازي يُحسب الزمن من سطر البداية حتى سطر "finished item"، وفي الوضع
+    المتسلسل (بدون أسطر انتهاء) حتى بداية الجدول التالي
+
+    Returns:
+        (رمز الخروج، آخر أسطر الأخطاء، قاموس الأزمنة لكل جدول)
+    """
+    started = {}
+    finished = {}
+    order = []
+    tail = []
+
+    process = subprocess.Popen(
+        cmd, env=env, stdout=stdout, stderr=subprocess.PIPE,
+        text=True, encoding='utf-8', errors='replace',
+    )
+    for line in process.stderr:
+        now = time.monotonic()
+        match = start_pattern.search(line)
+        if match:
+            table = _table_name(match.group(1))
+            started[table] = now
+            order.append(table)
+            continue
+        match = _FINISHED.search(line)
+        if match:
+            finished[_table_name(match.group(1))] = now
+            continue
+        tail.append(line.rstrip())
+        tail = tail[-50:]
+    returncode = process.wait()
+    ended = time.monotonic()
+
+    timings = {}
+    for index, table in enumerate(order):
+        if table in finished:
+            end = finished[table]
+        elif index + 1 < len(order):
+            end = started[order[index + 1]]
+        else:
+            end = ended
+        timings[table] = round(end - started[table], 3)
+    return returncode, '\n'.join(tail), timings
+
+
+def list_table_entries(dump_dir):
+    """
+    قراءة فهرس النسخة (pg_restore -l) واستخراج عناصر بيانات الجداول
+
+    Returns:
+        قائمة من (سطر الفهرس، رقم العنصر، اسم الجدول، اسم المخطط)
+    """
+    result = subprocess.run(
+        ['pg_restore', '-l', dump_dir], capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stdout.splitlines():
+        match = _TOC_TABLE_DATA.match(line)
+        if match:
+            entries.append((line, match.group(1), match.group(3), match.group(2)))
+    return entries
+
+
+def _table_sizes(dump_dir):
+    """
+    حجم ملف بيانات كل جدول داخل مجلد النسخة
+    """
+    sizes = {}
+    for _, dump_id, table, _ in list_table_entries(dump_dir):
+        for suffix in ('.dat.gz', '.dat'):
+            path = os.path.join(dump_dir, f"{dump_id}{suffix}")
+            if os.path.exists(path):
+                sizes[table] = os.path.getsize(path)
+                break
+    return sizes
+
+
+def directory_size(path):
+    """
+    الحجم الكلي لملفات مجلد
+    """
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def remove_backup_path(path):
+    """
+    حذف ملف النسخة الاحتياطية أو مجلدها
+    """
+    if not path or not os.path.exists(path):
+        return
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def iter_directory_tar(path, block_size=1024 * 1024):
+    """
+    توليد محتوى ملف tar لمجلد النسخة على أجزاء دون إنشاء ملف مؤقت
+    (ملفات الجداول مضغوطة بالفعل لذلك لا يُعاد ضغطها)
+    """
+    base = os.path.basename(os.path.normpath(path))
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if not os.path.isfile(file_path):
+            continue
+        stat = os.stat(file_path)
+        info = tarfile.TarInfo(f"{base}/{name}")
+        info.size = stat.st_size
+        info.mtime = int(stat.st_mtime)
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.GNU_FORMAT)
+        with open(file_path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+        # كل ملف داخل tar يكمل إلى مضاعفات 512 بايت
+        padding = -stat.st_size % tarfile.BLOCKSIZE
+        if padding:
+            yield b'\0' * padding
+    # نهاية الأرشيف: كتلتان فارغتان
+    yield b'\0' * (tarfile.BLOCKSIZE * 2)
+
+
+def create_directory_dump(dump_dir, connection_info=None, jobs=DEFAULT_JOBS):
+    """
+    إنشاء نسخة بتنسيق المجلد باستخدام pg_dump --jobs
+
+    Returns:
+        قاموس التفاصيل: عدد العمليات، المدة، وحجم وزمن كل جدول
+    """
+    args, env, name = connection_params(connection_info)
+    cmd = [
+        'pg_dump', *args,
+        '--format=directory',
+        f'--jobs={jobs}',
+        '--compress=6',
+        '--no-owner',
+        '--no-privileges',
+        '--verbose',
+        f'--file={dump_dir}',
+        name,
+    ]
+    print(f"الأمر: {' '.join(cmd)}")
+
+    started = time.monotonic()
+    returncode, errors, timings = _run_timed(cmd, env, _DUMP_START)
+    duration = round(time.monotonic() - started, 3)
+    if returncode != 0:
+        raise RuntimeError(f"فشل pg_dump المتوازي: {errors}")
+
+    sizes = _table_sizes(dump_dir)
+    tables = {
+        table: {'size': sizes.get(table, 0), 'dump_seconds': timings.get(table)}
+        for table in sorted(set(sizes) | set(timings))
+    }
+    print(f"تم النسخ المتوازي لـ {len(tables)} جدول خلال {duration} ثانية باستخدام {jobs} عملية")
+    return {
+        'format': 'directory',
+        'jobs': jobs,
+        'dump_seconds': duration,
+        'tables': tables,
+    }
+
+
+def _reset_sequences_sql(tables):
+    """
+    أوامر psql لضبط تسلسل كل عمود تسلسلي في الجداول على أكبر قيمة مستعادة (عبر \\gexec)
+    """
+    oids = ', '.join(
+        "'{}'::regclass".format(_quote_table(schema, table).replace("'", "''")) for schema, table in sorted(tables)
+    )
+    return (
+        "SELECT format('SELECT pg_catalog.setval(%L, COALESCE(max(%I), 0) + 1, false) FROM %s', "
+        "pg_get_serial_sequence(c.oid::regclass::text, a.attname), a.attname, c.oid::regclass) "
+        "FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid "
+        f"WHERE c.oid IN ({oids}) AND a.attnum > 0 AND NOT a.attisdropped "
+        "AND pg_get_serial_sequence(c.oid::regclass::text, a.attname) IS NOT NULL\n"
+        "\\gexec\n"
+    )
+
+
+def _restore_subset(dump_dir, list_path, args, env, name, tables):
+    """
+    استعادة بيانات جداول محددة في معاملة واحدة: التفريغ وتحميل البيانات وضبط التسلسلات
+    تتم في جلسة psql واحدة، ولا تُثبت المعاملة إلا إذا نجح pg_restore، فإذا فشل التحميل
+    تبقى بيانات الجداول كما كانت
+
+    Returns:
+        (رمز الخروج، آخر أسطر الأخطاء، قاموس الأزمنة لكل جدول)
+    """
+    cmd = [
+        'pg_restore',
+        '--format=directory',
+        '--data-only',
+        '--no-owner',
+        '--no-privileges',
+        '--verbose',
+        f'--use-list={list_path}',
+        dump_dir,
+    ]
+    print(f"الأمر: {' '.join(cmd)} | psql")
+
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as psql_errors:
+        psql = subprocess.Popen(
+            ['psql', *args, '-d', name, '-X', '-q', '-v', 'ON_ERROR_STOP=1'],
+            env=env, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=psql_errors,
+            text=True, encoding='utf-8',
+        )
+        # بدون RESTART IDENTITY: التسلسلات تُضبط بعد التحميل حسب أكبر قيمة مستعادة
+        truncate_sql = 'TRUNCATE TABLE {}'.format(
+            ', '.join(_quote_table(schema, table) for schema, table in sorted(tables))
+        )
+        try:
+            psql.stdin.write(f'BEGIN;\n{truncate_sql};\n')
+            psql.stdin.flush()
+            returncode, errors, timings = _run_timed(cmd, env, _RESTORE_START, stdout=psql.stdin)
+            if returncode == 0:
+                psql.stdin.write(_reset_sequences_sql(tables))
+                psql.stdin.write('COMMIT;\n')
+        except BrokenPipeError:
+            # psql توقف بسبب خطأ، والمعاملة أُلغيت عند انقطاع الاتصال
+            returncode, errors, timings = 1, '', {}
+        finally:
+            # إغلاق المدخلات بدون COMMIT يلغي المعاملة
+            try:
+                psql.stdin.close()
+            except BrokenPipeError:
+                pass
+            psql_returncode = psql.wait()
+        psql_errors.seek(0)
+        psql_output = psql_errors.read().strip()
+
+    if psql_returncode != 0:
+        return psql_returncode, '\n'.join(filter(None, [errors, psql_output])), timings
+    return returncode, errors, timings
+
+
+def restore_directory_dump(dump_dir, connection_info=None, jobs=DEFAULT_JOBS, tables=None):
+    """
+    استعادة نسخة بتنسيق المجلد باستخدام pg_restore --jobs
+
+    Args:
+        dump_dir: مجلد النسخة
+        connection_info: معلومات الاتصال بقاعدة البيانات الهدف
+        jobs: عدد العمليات المتوازية (للاستعادة الكاملة فقط)
+        tables: أسماء جداول (مع المخطط أو بدونه) لاستعادة بياناتها فقط؛ تُفرغ وتُحمل في معاملة
+            واحدة. None لاستعادة كاملة. تُرفض إذا أشارت إليها جداول غير محددة بمفاتيح أجنبية
+
+    Returns:
+        قاموس التفاصيل: المدة وزمن استعادة كل جدول
+    """
+    args, env, name = connection_params(connection_info)
+
+    if tables:
+        # الأسماء بدون مخطط تطابق الجدول في أي مخطط داخل النسخة
+        wanted = set(tables)
+        entries = [
+            entry for entry in list_table_entries(dump_dir)
+            if entry[2] in wanted or f'{entry[3]}.{entry[2]}' in wanted
+        ]
+        found = {table for _, _, table, _ in entries} | {f'{schema}.{table}' for _, _, table, schema in entries}
+        missing = wanted - found
+        if missing:
+            raise ValueError(f"جداول غير موجودة في النسخة: {', '.join(sorted(missing))}")
+
+        # التفريغ بدون CASCADE عمداً: إذا أشار جدول غير محدد إلى أحد الجداول المحددة فإن التفريغ
+        # سيفشل (أو يفرغه معها مع CASCADE)، لذلك تُرفض الاستعادة مع ذكر الجداول الواجب إضافتها
+        selected = {(schema, table) for _, _, table, schema in entries}
+        references = referencing_tables(args, env, name, selected)
+        if references:
+            details = ', '.join(f'{source} -> {target}' for source, target in sorted(references))
+            raise ValueError(
+                f"لا يمكن استعادة الجداول المحددة وحدها لأن جداول أخرى تشير إليها، "
+                f"أضفها إلى الاستعادة: {details}"
+            )
+
+        with tempfile.NamedTemporaryFile('w', suffix='.list', delete=False) as list_file:
+            list_file.write('\n'.join(line for line, _, _, _ in entries))
+            list_path = list_file.name
+        try:
+            started = time.monotonic()
+            returncode, errors, timings = _restore_subset(dump_dir, list_path, args, env, name, selected)
+            duration = round(time.monotonic() - started, 3)
+        finally:
+            os.unlink(list_path)
+        jobs = 1
+    else:
+        cmd = [
+            'pg_restore', *args,
+            '--format=directory',
+            f'--jobs={jobs}',
+            '--no-owner',
+            '--no-privileges',
+            '--verbose',
+            '--clean',
+            '--if-exists',
+            f'--dbname={name}',
+            dump_dir,
+        ]
+        print(f"الأمر: {' '.join(cmd)}")
+
+        started = time.monotonic()
+        returncode, errors, timings = _run_timed(cmd, env, _RESTORE_START)
+        duration = round(time.monotonic() - started, 3)
+
+    if returncode != 0:
+        raise RuntimeError(f"فشل pg_restore المتوازي: {errors}")
+
+    print(f"تمت الاستعادة المتوازية لـ {len(timings)} جدول خلال {duration} ثانية")
+    return {
+        'jobs': jobs,
+        'restore_seconds': duration,
+        'tables': sorted(tables) if tables else None,
+        'table_seconds': timings,
+    }
@@ -2,11 +2,14 @@
 خدمة النسخ الاحتياطي المجدولة (محسنة ومصححة)
 """
 
+import atexit
 import os
 import logging
+import threading
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from apscheduler.schedulers.background import BackgroundScheduler
 from django_apscheduler.jobstores import DjangoJobStore
@@ -19,11 +22,28 @@ logger = logging.getLogger(__name__)
 # متغير عام للمجدول لتجنب مشاكل التسلسل
 _scheduler = None
 
+# سياسة التشغيلات الفائتة (مثلاً أثناء إعادة تشغيل الخادم أو انتقال القيادة):
+# 'once' تشغيل واحد فقط إذا لم يمض على الموعد أكثر من نافذة الاستدراك، 'skip' تجاهلها
+CATCHUP_POLICY = 'once'
+CATCHUP_WINDOW = timedelta(hours=12)
+# السماحية للتأخير البسيط عند تجاهل التشغيلات الفائتة (بالثواني)
+MISFIRE_TOLERANCE = 60
+
+def get_job_defaults():
+    """إعدادات مهام المجدول: تشغيل واحد لكل مهمة في نفس الوقت ودمج التشغيلات الفائتة"""
+    policy = getattr(settings, 'BACKUP_SCHEDULE_CATCHUP', CATCHUP_POLICY)
+    if policy == 'once':
+        window = getattr(settings, 'BACKUP_SCHEDULE_CATCHUP_WINDOW', CATCHUP_WINDOW)
+        misfire_grace_time = int(window.total_seconds())
+    else:
+        misfire_grace_time = MISFIRE_TOLERANCE
+    return {'coalesce': True, 'max_instances': 1, 'misfire_grace_time': misfire_grace_time}
+
 def get_scheduler():
     """الحصول على المجدول أو إنشاؤه"""
     global _scheduler
     if _scheduler is None:
-        _scheduler = BackgroundScheduler()
+        _scheduler = BackgroundScheduler(job_defaults=get_job_defaults())
         _scheduler.add_jobstore(DjangoJobStore(), "default")
     return _scheduler
 
@@ -45,12 +65,19 @@ def create_backup_job(schedule_id):
         # إنشاء خدمة النسخ الاحتياطي
         backup_service = BackupService()
 
-        # إنشاء النسخة الاحتياطية (دائماً نسخة كاملة للجدولة)
+        # نسخة كاملة للجدولة، أو تزايدية إذا اختيرت مع بدء سلسلة جديدة عند بلوغ حد الاحتفاظ
+        backup_type = 'full'
+        if schedule.backup_type == 'incremental':
+            head = backup_service.get_chain_head(schedule.database)
+            if head is not None and len(head.chain) < schedule.max_backups:
+                backup_type = 'incremental'
+
+        # إنشاء النسخة الاحتياطية
         backup = backup_service.create_backup(
             database_id=schedule.database.id,
             name=f"{schedule.name}_{timezone.now().strftime('%Y%m%d_%H%M%S')}",
             user=schedule.created_by,
-            backup_type='full'  # دائماً نسخة كاملة للجدولة
+            backup_type=backup_type
         )
 
         # تحديث النسخة الاحتياطية لتكون مجدولة
@@ -74,46 +101,197 @@ def create_backup_job(schedule_id):
         logger.error(f"حدث خطأ أثناء إنشاء النسخة الاحتياطية المجدولة: {str(e)}")
         return None
 
+def enqueue_scheduled_backup(schedule_id):
+    """إضافة النسخة المجدولة إلى قائمة المهام الخلفية بدلاً من تنفيذها في خيط المجدول
+
+    لا تُضاف مهمة جديدة إذا كانت هناك مهمة لنفس الجدولة منتظرة أو قيد التنفيذ؛
+    تُعاد المهمة الموجودة بدلاً منها حتى لا تتداخل نسختان لنفس الجدولة
+    """
+    try:
+        from odoo_db_manager.models import BackupJob
+        from odoo_db_manager.services.background_jobs import enqueue
+
+        with transaction.atomic():
+            # قفل صف الجدولة حتى لا تُضاف مهمتان لنفس الجدولة في نفس الوقت
+            schedule = BackupSchedule.objects.select_for_update().select_related(
+                'database', 'created_by'
+            ).get(id=schedule_id)
+            if not schedule.is_active:
+                logger.info(f"تم تخطي النسخة الاحتياطية {schedule.name} (ID: {schedule.id}) لأنها غير نشطة")
+                return None
+
+            running = BackupJob.objects.filter(
+                job_type='scheduled_backup',
+                status__in=['pending', 'running'],
+                params__schedule_id=schedule.id,
+            ).order_by('created_at').first()
+            if running is not None:
+                logger.info(
+                    f"تم تخطي النسخة الاحتياطية {schedule.name} (ID: {schedule.id}) "
+                    f"لأن المهمة {running.pk} لم تنته بعد"
+                )
+                return running
+
+            return enqueue(
+                'scheduled_backup',
+                database=schedule.database,
+                params={'schedule_id': schedule.id},
+                user=schedule.created_by,
+            )
+    except Exception as e:
+        logger.error(f"فشل إضافة النسخة الاحتياطية المجدولة إلى قائمة المهام: {str(e)}")
+        return None
+
+def select_retained_backups(backups, daily=0, weekly=0, monthly=0):
+    """
+    اختيار النسخ المحتفظ بها حسب سياسة يومي/أسبوعي/شهري:
+    أحدث نسخة في كل يوم من آخر N يوم به نسخ، وكذلك لكل أسبوع وشهر
+
+    Args:
+        backups: النسخ مرتبة من الأحدث إلى الأقدم
+
+    Returns:
+        مجموعة معرفات النسخ المحتفظ بها
+    """
+    periods = (
+        (daily, lambda moment: moment.date()),
+        (weekly, lambda moment: moment.isocalendar()[:2]),
+        (monthly, lambda moment: (moment.year, moment.month)),
+    )
+    keep = set()
+    for count, period_key in periods:
+        if not count:
+            continue
+        seen = set()
+        for backup in backups:
+            key = period_key(timezone.localtime(backup.created_at))
+            if key in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(key)
+            keep.add(backup.id)
+    return keep
+
 def cleanup_old_backups(schedule):
-    """دالة منفصلة لحذف النسخ الاحتياطية القديمة"""
+    """دالة منفصلة لحذف النسخ الاحتياطية القديمة حسب سياسة الاحتفاظ"""
     try:
         # الحصول على النسخ الاحتياطية المرتبطة بهذه الجدولة
-        backups = Backup.objects.filter(
+        backup_types = [schedule.backup_type]
+        if schedule.backup_type == 'incremental':
+            backup_types.append('full')
+        backups = list(Backup.objects.filter(
             database=schedule.database,
-            backup_type=schedule.backup_type,
+            backup_type__in=backup_types,
             is_scheduled=True
-        ).order_by('-created_at')
+        ).order_by('-created_at'))
 
-        # التحقق من عدد النسخ الاحتياطية
-        if backups.count() > schedule.max_backups:
-            # الحصول على النسخ الاحتياطية التي سيتم حذفها
-            to_delete = backups[schedule.max_backups:]
+        # سياسة يومي/أسبوعي/شهري إن وُجدت، وإلا الاحتفاظ بآخر max_backups نسخة
+        if schedule.has_retention_policy:
+            keep = select_retained_backups(
+                backups, schedule.keep_daily, schedule.keep_weekly, schedule.keep_monthly
+            )
+        else:
+            keep = {backup.id for backup in backups[:schedule.max_backups]}
 
-            logger.info(f"حذف {to_delete.count()} نسخة احتياطية قديمة لجدولة {schedule.name} (ID: {schedule.id})")
+        # النسخ التي تعتمد عليها النسخ التزايدية المحتفظ بها لا تُحذف
+        for backup in backups:
+            if backup.id in keep:
+                keep.update(item.id for item in backup.chain)
 
-            # حذف النسخ الاحتياطية
+        to_delete = [backup for backup in backups if backup.id not in keep]
+        if to_delete:
+            logger.info(f"حذف {len(to_delete)} نسخة احتياطية قديمة لجدولة {schedule.name} (ID: {schedule.id})")
+
+            from odoo_db_manager.services.parallel_backup import remove_backup_path
+
+            # حذف النسخ الأحدث أولاً حتى لا تُحذف نسخة قبل النسخ التزايدية المبنية عليها
             for backup in to_delete:
-                # حذف ملف النسخة الاحتياطية
-                if os.path.exists(backup.file_path):
-                    os.unlink(backup.file_path)
+                # حذف ملف (أو مجلد أو فهرس) النسخة الاحتياطية
+                remove_backup_path(backup.file_path)
 
                 # حذف سجل النسخة الاحتياطية
                 backup.delete()
 
-            logger.info(f"تم حذف {to_delete.count()} نسخة احتياطية قديمة بنجاح")
+            logger.info("تم حذف النسخ الاحتياطية القديمة بنجاح")
+
+            # حذف أجزاء مخزن النسخ التي لم تعد تشير إليها أي نسخة
+            from odoo_db_manager.services.chunk_store import ChunkStore, ChunkStoreError
+            try:
+                ChunkStore().collect_garbage()
+            except ChunkStoreError as e:
+                logger.error(f"تم إلغاء تنظيف مخزن النسخ: {str(e)}")
+
     except Exception as e:
         logger.error(f"حدث خطأ أثناء حذف النسخ الاحتياطية القديمة: {str(e)}")
 
+    # حذف سجلات الحذف التي لم تعد تحتاجها أي نسخة تزايدية (مع كل تنظيف وليس للجدولات التزايدية فقط)
+    try:
+        from odoo_db_manager.services.incremental_backup import purge_tombstones
+        purge_tombstones()
+    except Exception as e:
+        logger.error(f"حدث خطأ أثناء حذف سجلات الحذف القديمة: {str(e)}")
+
+def job_signature(schedule):
+    """وصف توقيت الجدولة وسياسة الاستدراك يُحفظ كاسم للمهمة لمعرفة ما إذا تغيرت منذ تسجيلها"""
+    return (
+        f"backup:{schedule.frequency}:{schedule.hour}:{schedule.minute}:"
+        f"{schedule.day_of_week}:{schedule.day_of_month}:{get_job_defaults()['misfire_grace_time']}"
+    )
+
+def get_trigger(schedule):
+    """نوع المشغل ومعاملاته حسب تكرار الجدولة (أو None للتكرار غير المعروف)"""
+    if schedule.frequency == 'hourly':
+        return 'interval', {'hours': 1}
+    if schedule.frequency == 'daily':
+        return 'cron', {'hour': schedule.hour, 'minute': schedule.minute}
+    if schedule.frequency == 'weekly':
+        return 'cron', {'day_of_week': schedule.day_of_week, 'hour': schedule.hour, 'minute': schedule.minute}
+    if schedule.frequency == 'monthly':
+        return 'cron', {'day': schedule.day_of_month, 'hour': schedule.hour, 'minute': schedule.minute}
+    return None, {}
+
 class ScheduledBackupService:
-    """خدمة النسخ الاحتياطي المجدولة (محسنة)"""
+    """خدمة النسخ الاحتياطي المجدولة (محسنة)
+
+    كل عمليات الخادم تستدعي start()، لكن المجدول يعمل في العملية القائدة فقط (scheduler_leader)؛
+    تعديلات الجدولات من العمليات الأخرى تُطبق عند المزامنة الدورية للعملية القائدة
+    """
 
     def __init__(self):
         """تهيئة الخدمة"""
         # لا نحفظ المجدول كمتغير في الكلاس لتجنب مشاكل التسلسل
-        pass
+        self._election = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self):
+        return self._election is not None and self._election.is_leader
 
     def start(self):
-        """بدء تشغيل المجدول"""
+        """بدء المشاركة في انتخاب العملية المسؤولة عن المجدول"""
+        from odoo_db_manager.services.scheduler_leader import LeaderElection
+
+        with self._lock:
+            if self._election is None:
+                self._election = LeaderElection(
+                    on_elected=self._start_scheduler,
+                    on_demoted=self._stop_scheduler,
+                    on_tick=self._sync_schedules,
+                )
+                atexit.register(self.stop)
+            self._election.start()
+
+    def stop(self):
+        """إيقاف تشغيل المجدول والتخلي عن القيادة"""
+        with self._lock:
+            election = self._election
+        if election is not None:
+            election.stop()
+        else:
+            self._stop_scheduler()
+
+    def _start_scheduler(self):
         scheduler = get_scheduler()
         if scheduler.running:
             logger.info("المجدول يعمل بالفعل")
@@ -121,79 +299,63 @@ class ScheduledBackupService:
 
         logger.info("بدء تشغيل مجدول النسخ الاحتياطي")
 
-        # إضافة المهام المجدولة
-        self._schedule_all_backups()
-
-        # بدء تشغيل المجدول
-        scheduler.start()
+        # البدء متوقفاً: المجدول المتوقف لا يرى إلا المهام المعلقة، أما بعد بدئه فتتم المطابقة مع
+        # المهام المحفوظة، فتبقى التي لم تتغير بموعدها التالي (لاستدراك التشغيلات الفائتة)
+        scheduler.start(paused=True)
+        try:
+            self._sync_schedules()
+        finally:
+            scheduler.resume()
         logger.info("تم بدء تشغيل مجدول النسخ الاحتياطي")
 
-    def stop(self):
-        """إيقاف تشغيل المجدول"""
+    def _stop_scheduler(self):
         scheduler = get_scheduler()
         if scheduler.running:
             logger.info("إيقاف تشغيل مجدول النسخ الاحتياطي")
-            scheduler.shutdown()
+            scheduler.shutdown(wait=False)
             global _scheduler
             _scheduler = None
             logger.info("تم إيقاف تشغيل مجدول النسخ الاحتياطي")
 
-    def _schedule_all_backups(self):
-        """جدولة جميع النسخ الاحتياطية النشطة"""
+    def _sync_schedules(self):
+        """مطابقة مهام المجدول مع الجدولات النشطة: إضافة الجديدة والمعدلة وحذف المحذوفة والمتوقفة"""
         scheduler = get_scheduler()
-        # حذف جميع المهام السابقة
-        scheduler.remove_all_jobs()
+        schedules = {f"backup_{schedule.id}": schedule for schedule in BackupSchedule.objects.filter(is_active=True)}
 
-        # الحصول على جميع جدولات النسخ الاحتياطية النشطة
-        schedules = BackupSchedule.objects.filter(is_active=True)
-        logger.info(f"جدولة {schedules.count()} نسخة احتياطية")
+        for job in scheduler.get_jobs():
+            if job.id.startswith('backup_') and job.id not in schedules:
+                scheduler.remove_job(job.id)
+                logger.info(f"تم حذف المهمة: {job.id}")
 
-        for schedule in schedules:
-            self._schedule_backup(schedule)
+        for job_id, schedule in schedules.items():
+            job = scheduler.get_job(job_id)
+            if job is None or job.name != job_signature(schedule):
+                self._add_job(schedule)
 
     def _schedule_backup(self, schedule):
-        """جدولة نسخة احتياطية واحدة"""
-        scheduler = get_scheduler()
-        if not scheduler:
-            logger.error("المجدول غير متاح")
-            return
-
+        """جدولة نسخة احتياطية واحدة (فوراً في العملية القائدة، وإلا عند مزامنتها التالية)"""
         # حساب موعد التشغيل القادم إذا لم يكن محدداً
         if not schedule.next_run:
             schedule.calculate_next_run()
 
-        # إنشاء معرف المهمة
-        job_id = f"backup_{schedule.id}"
-
-        # تحديد معاملات التكرار
-        trigger_args = {}
-
-        if schedule.frequency == 'hourly':
-            trigger = 'interval'
-            trigger_args['hours'] = 1
-        elif schedule.frequency == 'daily':
-            trigger = 'cron'
-            trigger_args['hour'] = schedule.hour
-            trigger_args['minute'] = schedule.minute
-        elif schedule.frequency == 'weekly':
-            trigger = 'cron'
-            trigger_args['day_of_week'] = schedule.day_of_week
-            trigger_args['hour'] = schedule.hour
-            trigger_args['minute'] = schedule.minute
-        elif schedule.frequency == 'monthly':
-            trigger = 'cron'
-            trigger_args['day'] = schedule.day_of_month
-            trigger_args['hour'] = schedule.hour
-            trigger_args['minute'] = schedule.minute
-        else:
+        if not self.is_leader:
+            logger.info(f"ستُطبق جدولة {schedule.name} (ID: {schedule.id}) عند المزامنة التالية للمجدول")
+            return
+        self._add_job(schedule)
+
+    def _add_job(self, schedule):
+        scheduler = get_scheduler()
+        trigger, trigger_args = get_trigger(schedule)
+        if trigger is None:
             logger.error(f"تكرار غير معروف: {schedule.frequency}")
             return
 
         # إضافة المهمة إلى المجدول
         scheduler.add_job(
-            create_backup_job,  # استخدام دالة منفصلة
+            enqueue_scheduled_backup,  # استخدام دالة منفصلة تُضيف مهمة خلفية
             trigger=trigger,
-            id=job_id,
+            id=f"backup_{schedule.id}",
+            name=job_signature(schedule),
             replace_existing=True,
             kwargs={
                 'schedule_id': schedule.id
@@ -204,21 +366,23 @@ class ScheduledBackupService:
         logger.info(f"تمت جدولة النسخة الاحتياطية {schedule.name} (ID: {schedule.id}) بتكرار {schedule.get_frequency_display()}")
 
     def remove_job(self, job_id):
-        """حذف مهمة من المجدول"""
+        """حذف مهمة من المجدول (في العمليات الأخرى تُحذف عند المزامنة التالية)"""
+        if not self.is_leader:
+            return True
         try:
             scheduler = get_scheduler()
-            if scheduler:
+            if scheduler.get_job(job_id):
                 scheduler.remove_job(job_id)
                 logger.info(f"تم حذف المهمة: {job_id}")
-                return True
+            return True
         except Exception as e:
             logger.error(f"فشل حذف المهمة {job_id}: {str(e)}")
         return False
 
     def run_job_now(self, schedule_id):
-        """تشغيل مهمة النسخ الاحتياطي فوراً"""
+        """إضافة مهمة النسخ الاحتياطي إلى قائمة المهام فوراً (تعيد سجل المهمة)"""
         try:
-            return create_backup_job(schedule_id)
+            return enqueue_scheduled_backup(schedule_id)
         except Exception as e:
             logger.error(f"فشل تشغيل المهمة {schedule_id}: {str(e)}")
             return None
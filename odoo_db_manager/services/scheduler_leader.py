@@ -0,0 +1,188 @@
+"""
+انتخاب عملية قائدة واحدة لتشغيل مجدول النسخ الاحتياطية
+كل عمليات الخادم تحاول الحصول على قفل مشترك (قفل استشاري في PostgreSQL أو قفل ملف مع SQLite)؛
+العملية التي تحصل عليه فقط تشغل المجدول، وعند خروجها يُحرر القفل تلقائياً فتتولى عملية أخرى
+"""
+
+import os
+import tempfile
+import threading
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# مفتاح القفل الاستشاري (ثابت لكل المشروع)
+ADVISORY_LOCK_KEY = zlib.crc32(b'odoo_db_manager.backup_scheduler') & 0x7FFFFFFF
+# فترة محاولة الحصول على القيادة والتحقق منها (بالثواني)
+ELECTION_INTERVAL = 30
+
+
+def get_election_interval():
+    return getattr(settings, 'BACKUP_SCHEDULER_ELECTION_INTERVAL', ELECTION_INTERVAL)
+
+
+class FileLeaderLock:
+    """
+    قفل حصري على ملف (للعمليات على نفس الخادم مع SQLite)؛ يُحرر عند إغلاق الملف أو خروج العملية
+    """
+
+    def __init__(self, path=None):
+        self.path = path or getattr(
+            settings, 'BACKUP_SCHEDULER_LOCK_FILE',
+            os.path.join(tempfile.gettempdir(), 'crm_backup_scheduler.lock'),
+        )
+        self._file = None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, 'a+')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._file = lock_file
+        return True
+
+    def is_held(self):
+        return self._file is not None
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PostgresLeaderLock:
+    """
+    قفل استشاري على مستوى الجلسة في PostgreSQL عبر اتصال مخصص يبقى مفتوحاً طوال القيادة؛
+    يُحرر عند إغلاق الاتصال أو خروج العملية أو انقطاع الاتصال بالخادم
+    """
+
+    def __init__(self, alias=DEFAULT_DB_ALIAS, key=ADVISORY_LOCK_KEY):
+        self.alias = alias
+        self.key = key
+        self._connection = None
+
+    def acquire(self):
+        if self._connection is not None:
+            return self.is_held()
+        connection = connections.create_connection(self.alias)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', [self.key])
+                acquired = cursor.fetchone()[0]
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def is_held(self):
+        if self._connection is None:
+            return False
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid() "
+                    "AND objid = %s AND granted",
+                    [self.key],
+                )
+                held = cursor.fetchone() is not None
+        except Exception:
+            held = False
+        if not held:
+            self.release()
+        return held
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+
+def get_leader_lock():
+    """
+    القفل المناسب لقاعدة البيانات الحالية
+    """
+    if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql':
+        return PostgresLeaderLock()
+    return FileLeaderLock()
+
+
+class LeaderElection:
+    """
+    خيط خلفي يحاول الحصول على القيادة كل فترة، ويتحقق من بقائها مع العملية القائدة
+
+    Args:
+        on_elected: يُستدعى عند الحصول على القيادة
+        on_demoted: يُستدعى عند فقدانها (انقطاع الاتصال) أو عند الإيقاف
+        on_tick: يُستدعى في كل دورة أثناء القيادة (لمزامنة الجدولات)
+    """
+
+    def __init__(self, on_elected, on_demoted, on_tick=None, lock=None, interval=None):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_tick = on_tick
+        self.lock = lock
+        self.interval = interval or get_election_interval()
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='backup-scheduler-election', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._demote()
+
+    def _demote(self):
+        if self.is_leader:
+            self.is_leader = False
+            try:
+                self.on_demoted()
+            finally:
+                if self.lock is not None:
+                    self.lock.release()
+
+    def _run(self):
+        if self.lock is None:
+            self.lock = get_leader_lock()
+        while not self._stop.is_set():
+            try:
+                if not self.is_leader:
+                    if self.lock.acquire():
+                        print(f"العملية {os.getpid()} أصبحت المسؤولة عن تشغيل مجدول النسخ الاحتياطية")
+                        self.is_leader = True
+                        self.on_elected()
+                elif not self.lock.is_held():
+                    print(f"فقدت العملية {os.getpid()} قيادة مجدول النسخ الاحتياطية")
+                    self._demote()
+                elif self.on_tick is not None:
+                    self.on_tick()
+            except Exception as e:
+                print(f"خطأ في انتخاب مجدول النسخ الاحتياطية: {str(e)}")
+            finally:
+                connections.close_all()
+            self._stop.wait(self.interval)
@@ -0,0 +1,110 @@
+"""
+تقرير زمن بدء تشغيل التطبيق
+كل خطوة في ready() تُقاس، والخطوات المؤجلة (في الخلفية أو عند أول طلب) تُسجل عند تنفيذها،
+ويُطبع تحذير إذا تجاوز زمن الخطوات المتزامنة الميزانية المحددة
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# أوامر الإدارة التي تشغل الخادم وتحتاج إلى الخدمات الخلفية (المجدول ومزامنة قواعد البيانات)
+SERVER_COMMANDS = {'runserver', 'runserver_plus', 'daphne', 'uvicorn'}
+# برامج خوادم التطبيقات التي تعمل فيها الخدمات الخلفية
+SERVER_PROGRAMS = {'gunicorn', 'uwsgi', 'daphne', 'uvicorn', 'hypercorn'}
+# متغير بيئة لفرض تشغيل الخدمات الخلفية أو منعها ('1' أو '0') بدلاً من الاكتشاف التلقائي
+BACKGROUND_SERVICES_ENV = 'CRM_BACKGROUND_SERVICES'
+
+
+def get_budget_ms():
+    return getattr(settings, 'STARTUP_BUDGET_MS', 200)
+
+
+def is_server_process():
+    """
+    هل العملية خادم (gunicorn/uwsgi/runserver)؛ أي برنامج آخر (أوامر الإدارة، السكربتات مثل
+    post_deploy.py، pytest) لا يشغل الخدمات الخلفية ما لم يُفعلها CRM_BACKGROUND_SERVICES
+    """
+    flag = os.environ.get(BACKGROUND_SERVICES_ENV)
+    if flag is not None:
+        return flag.strip().lower() in ('1', 'true', 'yes')
+
+    argv = sys.argv or ['']
+    program = os.path.basename(argv[0])
+    if program in ('manage.py', 'django-admin'):
+        return len(argv) > 1 and argv[1] in SERVER_COMMANDS
+    if program == '__main__.py':
+        # python -m gunicorn
+        program = os.path.basename(os.path.dirname(argv[0]))
+    return program in SERVER_PROGRAMS or 'uwsgi' in sys.modules
+
+
+class StartupReport:
+    """
+    أزمنة خطوات بدء التشغيل: (الاسم، الزمن بالمللي ثانية، مؤجلة أم لا)
+    """
+
+    def __init__(self):
+        self.steps = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name, deferred=False):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.steps.append((name, duration, deferred))
+            if deferred:
+                print(f"بدء التشغيل (مؤجل): {name} استغرق {duration:.0f}ms")
+
+    @property
+    def critical_ms(self):
+        with self._lock:
+            return sum(duration for _, duration, deferred in self.steps if not deferred)
+
+    def report(self):
+        """
+        طباعة أزمنة الخطوات المتزامنة وتحذير إذا تجاوزت الميزانية
+        """
+        budget = get_budget_ms()
+        total = self.critical_ms
+        if total <= budget:
+            return total
+        print(f"تحذير: بدء تشغيل التطبيق استغرق {total:.0f}ms (الميزانية {budget}ms)")
+        with self._lock:
+            steps = [step for step in self.steps if not step[2]]
+        for name, duration, _ in sorted(steps, key=lambda item: item[1], reverse=True):
+            print(f"  - {name}: {duration:.0f}ms")
+        return total
+
+
+startup_report = StartupReport()
+
+
+def run_deferred(name, func, delay=0):
+    """
+    تشغيل خطوة بدء تشغيل في خيط خلفي حتى لا تؤخر جاهزية العملية
+    """
+    def target():
+        if delay:
+            time.sleep(delay)
+        from django.db import connection
+
+        try:
+            with startup_report.step(name, deferred=True):
+                func()
+        except Exception as e:
+            print(f"حدث خطأ أثناء {name}: {str(e)}")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, name=f'startup-{name}', daemon=True)
+    thread.start()
+    return thread
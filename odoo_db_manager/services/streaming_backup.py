@@ -0,0 +1,301 @@
+"""
+كتابة النسخ الاحتياطية بشكل متدفق
+يتم تسلسل كل نموذج على دفعات وكتابة كل سجل في سطر مستقل داخل ملف gzip مباشرة،
+بحيث لا يتجاوز استهلاك الذاكرة حجم دفعة واحدة مهما كان حجم قاعدة البيانات
+"""
+
+import gzip
+import io
+import json
+import os
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError
+from django.utils import timezone
+
+from odoo_db_manager.services.chunk_store import ChunkStoreError, is_chunked_backup, open_chunked_text
+
+# إصدار تنسيق الملف (سطر رأس + أسطر سجلات + أسطر حدود النماذج)
+STREAM_FORMAT = 'ndjson'
+STREAM_VERSION = 1
+GZIP_MAGIC = b'\x1f\x8b'
+DEFAULT_CHUNK_SIZE = 2000
+
+# النماذج المشمولة في كل نوع من أنواع النسخ الجزئية
+BACKUP_TYPE_MODELS = {
+    'customers': ['customers.Customer', 'customers.CustomerContact', 'customers.CustomerAddress'],
+    'users': [settings.AUTH_USER_MODEL, 'auth.Group', 'accounts.UserProfile'],
+    'settings': ['sites.Site', 'auth.Permission'],
+}
+
+# نماذج لا يتم نسخها في النسخة الكاملة
+EXCLUDED_APPS = ('contenttypes',)
+EXCLUDED_MODELS = ('admin.LogEntry', 'odoo_db_manager.DeletedRecord')
+
+
+def sort_models_by_dependency(models):
+    """
+    ترتيب النماذج بحيث يأتي كل نموذج بعد النماذج التي يشير إليها بمفاتيح أجنبية
+    (المراجع الذاتية والحلقات لا تمنع الترتيب، وتبقى بترتيبها الأصلي)
+    """
+    models = list(models)
+    included = set(models)
+    ordered = []
+    visiting = set()
+    done = set()
+
+    def visit(model):
+        if model in done or model in visiting:
+            return
+        visiting.add(model)
+        for field in model._meta.get_fields():
+            if field.concrete and field.is_relation and (field.many_to_one or field.one_to_one):
+                target = field.related_model._meta.concrete_model
+                if target is not model and target in included:
+                    visit(target)
+            elif field.many_to_many and field.concrete:
+                through = field.remote_field.through
+                target = field.related_model._meta.concrete_model
+                if through._meta.auto_created and target is not model and target in included:
+                    visit(target)
+        visiting.discard(model)
+        done.add(model)
+        ordered.append(model)
+
+    for model in models:
+        visit(model)
+    return ordered
+
+
+def get_backup_models(backup_type='full'):
+    """
+    النماذج المشمولة في نوع النسخة الاحتياطية مرتبة حسب الاعتماديات
+    """
+    if backup_type in BACKUP_TYPE_MODELS:
+        models = []
+        for label in BACKUP_TYPE_MODELS[backup_type]:
+            try:
+                models.append(apps.get_model(label))
+            except LookupError:
+                print(f"تخطي نموذج {label}: غير موجود")
+    else:
+        models = [
+            model for model in apps.get_models()
+            if model._meta.app_label not in EXCLUDED_APPS
+            and model._meta.label not in EXCLUDED_MODELS
+            and not model._meta.proxy
+            and model._meta.managed
+        ]
+    return sort_models_by_dependency(models)
+
+
+def _model_queryset(model, using='default'):
+    """
+    استعلام النموذج مع تحميل العلاقات التي يحتاجها التسلسل بالمفاتيح الطبيعية
+    """
+    natural_fks = [
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation and hasattr(field.related_model, 'natural_key')
+    ]
+    m2m_fields = [
+        field.name for field in model._meta.many_to_many
+        if field.remote_field.through._meta.auto_created
+    ]
+    queryset = model._base_manager.using(using).order_by('pk')
+    if natural_fks:
+        queryset = queryset.select_related(*natural_fks)
+    if m2m_fields:
+        queryset = queryset.prefetch_related(*m2m_fields)
+    return queryset
+
+
+def print_progress(label, done, total):
+    """
+    دالة التقدم الافتراضية
+    """
+    if total:
+        print(f"  {label}: {done:,}/{total:,} ({done * 100 // total}%)")
+    else:
+        print(f"  {label}: {done:,}")
+
+
+class StreamingBackupWriter:
+    """
+    كاتب نسخة احتياطية متدفق بتنسيق JSON مفصول بالأسطر داخل gzip
+
+    بنية الملف:
+        {"_backup": {...}}            سطر الرأس
+        {"_model": "app.Model", ...}  بداية نموذج
+        {"model": ..., "pk": ..., "fields": {...}}  سجل (نفس تنسيق تسلسل Django)
+        {"_model_end": "app.Model", "count": N}  نهاية نموذج
+        {"_deleted": "app.model", "pks": [...]}  سجلات محذوفة (في النسخ التزايدية فقط)
+    """
+
+    def __init__(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE, progress=print_progress, using='default'):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.using = using
+
+    def _write_line(self, stream, data):
+        stream.write(json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder))
+        stream.write('\n')
+
+    def get_queryset(self, model):
+        """
+        السجلات المطلوب نسخها من النموذج (تعيد الأصناف الفرعية تعريفها للتصفية)
+        """
+        return _model_queryset(model, self.using)
+
+    def write_extra(self, stream):
+        """
+        كتابة أسطر إضافية بعد كل النماذج (تعيد الأصناف الفرعية تعريفها)
+        """
+
+    def _serialize_chunk(self, objects):
+        return serializers.serialize('python', objects, use_natural_foreign_keys=True)
+
+    def write_model(self, stream, model, total):
+        """
+        كتابة سجلات نموذج واحد على دفعات
+
+        Returns:
+            عدد السجلات المكتوبة
+        """
+        label = model._meta.label
+        queryset = self.get_queryset(model)
+        self._write_line(stream, {'_model': label, 'total': total})
+
+        written = 0
+        chunk = []
+        for obj in queryset.iterator(chunk_size=self.chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= self.chunk_size:
+                for record in self._serialize_chunk(chunk):
+                    self._write_line(stream, record)
+                written += len(chunk)
+                chunk = []
+                if self.progress:
+                    self.progress(label, written, total)
+        if chunk:
+            for record in self._serialize_chunk(chunk):
+                self._write_line(stream, record)
+            written += len(chunk)
+        if self.progress:
+            self.progress(label, written, total)
+
+        self._write_line(stream, {'_model_end': label, 'count': written})
+        return written
+
+    def write(self, models, backup_type='full', extra=None):
+        """
+        كتابة النسخة الاحتياطية كاملة في ملف مؤقت ثم نقله إلى المسار النهائي
+
+        Args:
+            models: قائمة النماذج بترتيب الاعتماديات
+            backup_type: نوع النسخة الاحتياطية (يُحفظ في الرأس)
+            extra: بيانات إضافية تُحفظ في سطر الرأس
+
+        Returns:
+            قاموس بعدد السجلات لكل نموذج
+        """
+        header = {
+            'format': STREAM_FORMAT,
+            'version': STREAM_VERSION,
+            'backup_type': backup_type,
+            'created_at': timezone.now(),
+            'models': [model._meta.label for model in models],
+        }
+        if extra:
+            header.update(extra)
+
+        counts = {}
+        temp_path = f"{self.file_path}.partial"
+        try:
+            with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=6) as stream:
+                self._write_line(stream, {'_backup': header})
+                for model in models:
+                    try:
+                        total = self.get_queryset(model).count()
+                    except DatabaseError as model_error:
+                        # نموذج بدون جدول (مثلاً تطبيق غير مهاجر) لا يوقف النسخة كاملة
+                        print(f"تخطي نموذج {model.__name__}: {str(model_error)}")
+                        continue
+                    counts[model._meta.label] = self.write_model(stream, model, total)
+                self.write_extra(stream)
+            os.replace(temp_path, self.file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return counts
+
+
+@contextmanager
+def open_stream_backup(file_path):
+    """
+    فتح محتوى النسخة المتدفقة كملف نصي: من ملف gzip، أو ملف NDJSON غير مضغوط
+    (مثل النسخ المحملة من مخزن الأجزاء)، أو من فهرس في مخزن الأجزاء
+
+    Args:
+        file_path: مسار الملف أو ملف ثنائي مفتوح للقراءة (لا يُغلق)
+    """
+    if isinstance(file_path, str) and is_chunked_backup(file_path):
+        with open_chunked_text(file_path) as stream:
+            yield stream
+        return
+
+    raw = open(file_path, 'rb') if isinstance(file_path, str) else file_path
+    try:
+        if raw.peek(2)[:2] == GZIP_MAGIC:
+            with gzip.open(raw, 'rt', encoding='utf-8') as stream:
+                yield stream
+        else:
+            stream = io.TextIOWrapper(raw, encoding='utf-8')
+            try:
+                yield stream
+            finally:
+                stream.detach()
+    finally:
+        if raw is not file_path:
+            raw.close()
+
+
+def is_stream_backup(file_path):
+    """
+    التحقق مما إذا كان الملف نسخة احتياطية متدفقة (من سطر الرأس بعد فك الضغط)
+    """
+    try:
+        with open_stream_backup(file_path) as stream:
+            first_line = stream.readline(4096)
+        return first_line.startswith('{"_backup"')
+    except (OSError, EOFError, UnicodeDecodeError, ValueError, ChunkStoreError):
+        return False
+
+
+def read_stream_backup(file_path):
+    """
+    قراءة ملف النسخة المتدفقة سطراً بسطر
+
+    Yields:
+        (نوع السطر، البيانات) حيث النوع هو 'header' أو 'model' أو 'record' أو 'model_end' أو 'deleted'
+    """
+    with open_stream_backup(file_path) as stream:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            if '_backup' in data:
+                yield 'header', data['_backup']
+            elif '_model' in data:
+                yield 'model', data
+            elif '_model_end' in data:
+                yield 'model_end', data
+            elif '_deleted' in data:
+                yield 'deleted', data
+            else:
+                yield 'record', data
@@ -0,0 +1,295 @@
+"""
+استعادة النسخ الاحتياطية المتدفقة على دفعات
+تُقرأ السجلات سطراً بسطر وتُدرج لكل نموذج باستخدام bulk_create داخل معاملة خاصة به،
+مع حفظ نقطة تقدم تسمح باستكمال الاستعادة من آخر نموذج مكتمل بعد أي فشل
+"""
+
+import json
+import os
+from itertools import groupby, islice
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import connections, transaction
+
+from odoo_db_manager.services.streaming_backup import print_progress, read_stream_backup
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def auto_timestamp_fields(model):
+    """
+    حقول التاريخ التي يملؤها Django عند الحفظ (auto_now و auto_now_add)
+    """
+    return [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+
+
+class StreamingRestorer:
+    """
+    محرك استعادة النسخ المتدفقة
+
+    - السجلات متجاورة لكل نموذج وبترتيب الاعتماديات كما كتبها StreamingBackupWriter
+    - كل نموذج يُستعاد في معاملة واحدة؛ الفشل يتراجع عن النموذج الحالي فقط
+    - الإدراج بـ bulk_create مع التحديث عند التعارض على المفتاح الأساسي، لذلك لا تُستدعى
+      دوال save() ولا إشارات الحفظ لكل سجل (مثل إبطال ذاكرة المنتجات وحسابات الطلبات)،
+      ويتم بدلاً من ذلك تفريغ التخزين المؤقت وإعادة ضبط التسلسلات مرة واحدة في النهاية
+    """
+
+    def __init__(self, file_path, batch_size=DEFAULT_BATCH_SIZE, resume=True,
+                 progress=print_progress, using='default', source=None, skip_errors=False):
+        """
+        Args:
+            source: ملف مفتوح للقراءة بدلاً من فتح file_path (مثلاً لتتبع عدد البايتات المقروءة)
+            skip_errors: عند فشل دفعة تُعاد سجلاتها واحداً واحداً مع تجاهل السجلات التالفة
+        """
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.resume = resume
+        self.progress = progress
+        self.using = using
+        self.source = source
+        self.skip_errors = skip_errors
+        self.skipped = 0
+        self.state_path = f"{file_path}.restore-state.json"
+        self._natural_keys = {}
+
+    # نقطة التقدم
+
+    def _load_state(self):
+        if self.resume and os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'completed': [], 'counts': {}}
+
+    def _save_state(self, state):
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    # المفاتيح الطبيعية
+
+    def _natural_pk(self, model, key):
+        """
+        تحويل مفتاح طبيعي إلى مفتاح أساسي مع الاحتفاظ بالنتيجة لبقية السجلات
+        """
+        cache_key = (model._meta.label, tuple(key))
+        if cache_key not in self._natural_keys:
+            obj = model._default_manager.db_manager(self.using).get_by_natural_key(*key)
+            self._natural_keys[cache_key] = obj.pk
+        return self._natural_keys[cache_key]
+
+    def _resolve_natural_keys(self, model, records):
+        """
+        استبدال المفاتيح الطبيعية بالمفاتيح الأساسية حتى لا يُنفذ استعلام لكل سجل
+        """
+        relations = [
+            field for field in model._meta.concrete_fields
+            if field.is_relation and hasattr(field.related_model, 'natural_key')
+        ]
+        m2m_fields = [
+            field for field in model._meta.many_to_many
+            if hasattr(field.related_model, 'natural_key')
+        ]
+        if not relations and not m2m_fields:
+            return records
+        for record in records:
+            fields = record['fields']
+            for field in relations:
+                value = fields.get(field.name)
+                if isinstance(value, (list, tuple)):
+                    fields[field.name] = self._natural_pk(field.related_model, value)
+            for field in m2m_fields:
+                values = fields.get(field.name)
+                if values:
+                    fields[field.name] = [
+                        self._natural_pk(field.related_model, value) if isinstance(value, (list, tuple)) else value
+                        for value in values
+                    ]
+        return records
+
+    # الإدراج
+
+    def _insert_batch(self, model, records):
+        """
+        إدراج دفعة من السجلات مع بيانات علاقات متعدد-لمتعدد
+        """
+        records = self._resolve_natural_keys(model, records)
+        deserialized = list(Deserializer(records, using=self.using, ignorenonexistent=True))
+        objects = [item.object for item in deserialized]
+        manager = model._base_manager.db_manager(self.using)
+
+        # الحفظ يستبدل حقول auto_now/auto_now_add بالوقت الحالي، لذلك تُحفظ قيمها من النسخة
+        # وتُعاد بعد الإدراج بـ bulk_update (لا يمر بـ pre_save) دون تعديل تعريف الحقول المشترك
+        timestamp_fields = auto_timestamp_fields(model)
+        timestamps = [[getattr(obj, field.attname) for field in timestamp_fields] for obj in objects]
+
+        if model._meta.parents:
+            # bulk_create لا يدعم الوراثة متعددة الجداول
+            for item in deserialized:
+                item.save(using=self.using)
+        else:
+            update_fields = [
+                field.name for field in model._meta.concrete_fields if not field.primary_key
+            ]
+            if update_fields:
+                manager.bulk_create(
+                    objects,
+                    update_conflicts=True,
+                    unique_fields=[model._meta.pk.name],
+                    update_fields=update_fields,
+                )
+            else:
+                manager.bulk_create(objects, ignore_conflicts=True)
+
+        if timestamp_fields and objects:
+            for obj, values in zip(objects, timestamps):
+                for field, value in zip(timestamp_fields, values):
+                    setattr(obj, field.attname, value)
+            manager.bulk_update(
+                objects, [field.name for field in timestamp_fields], batch_size=self.batch_size
+            )
+
+        if not model._meta.parents:
+            for field in model._meta.many_to_many:
+                through = field.remote_field.through
+                if not through._meta.auto_created:
+                    continue
+                source = field.m2m_field_name()
+                target = field.m2m_reverse_field_name()
+                rows = [
+                    through(**{f'{source}_id': item.object.pk, f'{target}_id': related_pk})
+                    for item in deserialized
+                    for related_pk in item.m2m_data.get(field.name, [])
+                ]
+                if rows:
+                    through._base_manager.db_manager(self.using).bulk_create(
+                        rows, ignore_conflicts=True, batch_size=self.batch_size
+                    )
+        return len(objects)
+
+    def _insert_batch_tolerant(self, model, records):
+        """
+        إدراج دفعة، وعند فشلها إعادة إدراج سجلاتها واحداً واحداً مع تخطي التالف منها
+        """
+        try:
+            with transaction.atomic(using=self.using):
+                return self._insert_batch(model, records)
+        except Exception as batch_error:
+            print(f"فشل إدراج دفعة من {model._meta.label}: {str(batch_error)[:200]} - إعادة المحاولة لكل سجل")
+
+        restored = 0
+        for record in records:
+            try:
+                with transaction.atomic(using=self.using):
+                    restored += self._insert_batch(model, [record])
+            except Exception as record_error:
+                self.skipped += 1
+                if self.skipped <= 3:
+                    print(f"تخطي سجل {record.get('model')}:{record.get('pk')}: {str(record_error)[:100]}")
+        return restored
+
+    def _restore_model(self, label, records, total=None):
+        """
+        استعادة كل سجلات نموذج واحد في معاملة واحدة
+        """
+        model = apps.get_model(label)
+        restored = 0
+        with transaction.atomic(using=self.using):
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                if self.skip_errors:
+                    restored += self._insert_batch_tolerant(model, batch)
+                else:
+                    restored += self._insert_batch(model, batch)
+                if self.progress:
+                    self.progress(label, restored, total)
+        return model, restored
+
+    def _apply_deletions(self, deleted):
+        """
+        حذف السجلات المسجلة كمحذوفة في النسخة التزايدية (مع الحذف المتتالي المعتاد)
+        """
+        counts = {}
+        with transaction.atomic(using=self.using):
+            for label, pks in deleted.items():
+                try:
+                    model = apps.get_model(label)
+                except LookupError:
+                    continue
+                values = [model._meta.pk.to_python(pk) for pk in pks]
+                for start in range(0, len(values), self.batch_size):
+                    model._base_manager.using(self.using).filter(
+                        pk__in=values[start:start + self.batch_size]
+                    ).delete()
+                counts[label] = len(values)
+        return counts
+
+    def _finalize(self, models):
+        """
+        الخطوات المؤجلة بعد الاستعادة: ضبط تسلسلات المفاتيح وتفريغ التخزين المؤقت
+        """
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        cache.clear()
+
+    def iter_lines(self):
+        """
+        أسطر النسخة بالشكل (النوع، البيانات) كما تعيدها read_stream_backup
+        """
+        return read_stream_backup(self.source or self.file_path)
+
+    def restore(self):
+        """
+        تنفيذ الاستعادة
+
+        Returns:
+            قاموس بعدد السجلات المستعادة لكل نموذج
+        """
+        state = self._load_state()
+        completed = set(state['completed'])
+        if completed:
+            print(f"استكمال الاستعادة: تخطي {len(completed)} نموذج مكتمل")
+
+        totals = {}
+        deleted = {}
+
+        def records():
+            for kind, data in self.iter_lines():
+                if kind == 'model':
+                    totals[data['_model'].lower()] = data['total']
+                elif kind == 'record':
+                    yield data
+                elif kind == 'deleted':
+                    deleted.setdefault(data['_deleted'], []).extend(data['pks'])
+
+        for label, model_records in groupby(records(), key=lambda record: record['model']):
+            if label in completed:
+                for _ in model_records:
+                    pass
+                continue
+            model, count = self._restore_model(label, model_records, totals.get(label))
+            state['completed'].append(label)
+            state['counts'][label] = count
+            self._save_state(state)
+
+        if deleted and not state.get('deleted_applied'):
+            state['deleted'] = self._apply_deletions(deleted)
+            state['deleted_applied'] = True
+            self._save_state(state)
+
+        self._finalize([apps.get_model(label) for label in state['completed']])
+        if os.path.exists(self.state_path):
+            os.unlink(self.state_path)
+        return state['counts']
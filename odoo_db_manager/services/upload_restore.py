@@ -0,0 +1,130 @@
+"""
+استعادة الملفات المرفوعة كمهمة خلفية
+يُفك الضغط ويُحلل الملف تدريجياً (بدون تحميله كاملاً في الذاكرة) ويُستعاد على دفعات،
+مع تحديث تقدم المهمة حسب عدد البايتات المقروءة من الملف المرفوع
+"""
+
+import gzip
+import io
+import json
+import os
+
+from odoo_db_manager.services.streaming_backup import is_stream_backup
+from odoo_db_manager.services.streaming_restore import StreamingRestorer
+
+GZIP_MAGIC = b'\x1f\x8b'
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE):
+    """
+    تحليل مصفوفة JSON (مثل ملفات dumpdata) عنصراً بعنصر من ملف نصي
+
+    لا يُحتفظ في الذاكرة إلا بجزء القراءة الحالي والعنصر الجاري تحليله
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    started = False
+
+    while True:
+        # تخطي المسافات والفواصل مع قراءة المزيد عند الحاجة
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            buffer, position = stream.read(chunk_size), 0
+            eof = not buffer
+
+        if position >= len(buffer):
+            if started:
+                raise ValueError("نهاية غير متوقعة لملف JSON")
+            return
+
+        if not started:
+            if buffer[position] != '[':
+                raise ValueError("الملف ليس مصفوفة JSON صالحة")
+            started = True
+            position += 1
+            continue
+
+        if buffer[position] == ']':
+            return
+
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # العنصر لم يكتمل في الجزء الحالي
+            more = stream.read(chunk_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+
+        yield item
+        if position > chunk_size:
+            buffer, position = buffer[position:], 0
+
+
+class JsonArrayRestorer(StreamingRestorer):
+    """
+    استعادة ملف JSON بتنسيق dumpdata (مضغوط أو غير مضغوط) بنفس آلية الدفعات
+    """
+
+    def iter_lines(self):
+        if self.source is None:
+            with open(self.file_path, 'rb') as raw:
+                yield from self._iter_records(raw)
+        else:
+            yield from self._iter_records(self.source)
+
+    def _iter_records(self, raw):
+        if raw.peek(2)[:2] == GZIP_MAGIC:
+            stream = gzip.open(raw, 'rt', encoding='utf-8')
+        else:
+            stream = io.TextIOWrapper(raw, encoding='utf-8')
+        try:
+            for item in iter_json_array(stream):
+                yield 'record', item
+        finally:
+            # فصل الغلاف النصي دون إغلاق الملف الأصلي
+            if isinstance(stream, io.TextIOWrapper):
+                stream.detach()
+            else:
+                stream.close()
+
+
+def run_upload_restore(job, progress):
+    """
+    معالج مهمة 'upload_restore'
+
+    Args:
+        job: سجل BackupJob (المعاملات: file_path)
+        progress: كائن JobProgress لتحديث التقدم
+    """
+    file_path = job.params['file_path']
+    total = os.path.getsize(file_path)
+    progress.update(0, total, "بدء الاستعادة")
+
+    with open(file_path, 'rb') as raw:
+        def report(label, done, model_total):
+            # موضع القراءة في الملف المضغوط يعكس التقدم الكلي
+            progress.update(raw.tell(), total, f"{label}: {done:,}")
+
+        if is_stream_backup(file_path):
+            print("ملف نسخة متدفقة - استعادة على دفعات")
+            restorer = StreamingRestorer(file_path, progress=report, source=raw, skip_errors=True)
+        else:
+            print("ملف JSON - تحليل تدريجي واستعادة على دفعات")
+            # قد يتكرر النموذج في أكثر من موضع بالملف لذلك لا يُستخدم الاستكمال
+            restorer = JsonArrayRestorer(
+                file_path, progress=report, source=raw, resume=False, skip_errors=True
+            )
+        counts = restorer.restore()
+
+    restored = sum(counts.values())
+    progress.update(total, total, f"تمت استعادة {restored:,} سجل", force=True)
+    return {'restored': restored, 'skipped': restorer.skipped, 'counts': counts}
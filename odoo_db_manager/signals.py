@@ -4,26 +4,51 @@
 
 import os
 import logging
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.conf import settings
 from django.apps import apps
 
-from .models import Database, Backup
+from .models import Database, Backup, BackupSchedule
 from .services.database_service import DatabaseService
+from .services.parallel_backup import remove_backup_path
+from .services.incremental_backup import (
+    connect_tombstone_receivers, mark_tracking_start, refresh_tombstone_receivers, tracking_required,
+)
 
 logger = logging.getLogger(__name__)
 
 # تم نقل مزامنة قواعد البيانات إلى ملف apps.py
 
+# تسجيل عمليات الحذف للنسخ التزايدية (أثناء وجود جدولة تزايدية نشطة فقط)
+connect_tombstone_receivers()
+
+@receiver(pre_save, sender=BackupSchedule)
+def remember_tombstone_tracking(sender, instance, **kwargs):
+    """حفظ ما إذا كان تسجيل الحذف مطلوباً قبل تعديل الجدولة"""
+    instance._tracking_was_required = tracking_required()
+
+@receiver(post_save, sender=BackupSchedule)
+def update_tombstone_tracking(sender, instance, **kwargs):
+    """بدء تسجيل الحذف عند تفعيل أول جدولة تزايدية، وإيقافه عند عدم الحاجة إليه"""
+    was_required = getattr(instance, '_tracking_was_required', True)
+    if not was_required and instance.is_active and instance.backup_type == 'incremental':
+        mark_tracking_start()
+    else:
+        refresh_tombstone_receivers(force=True)
+
+@receiver(post_delete, sender=BackupSchedule)
+def stop_tombstone_tracking(sender, instance, **kwargs):
+    refresh_tombstone_receivers(force=True)
+
 @receiver(post_delete, sender=Backup)
 def handle_backup_delete(sender, instance, **kwargs):
     """معالجة حذف النسخة الاحتياطية"""
-    # حذف ملف النسخة الاحتياطية
+    # حذف ملف (أو مجلد) النسخة الاحتياطية
     if instance.file_path and os.path.exists(instance.file_path):
         try:
-            os.remove(instance.file_path)
+            remove_backup_path(instance.file_path)
             logger.info(f"تم حذف ملف النسخة الاحتياطية: {instance.file_path}")
         except Exception as e:
             logger.error(f"حدث خطأ أثناء حذف ملف النسخة الاحتياطية: {str(e)}")
@@ -26,9 +26,15 @@ urlpatterns = [
     path('backups/<int:pk>/restore/', views.backup_restore, name='backup_restore'),
     path('backups/<int:pk>/delete/', views.backup_delete, name='backup_delete'),
     path('backups/<int:pk>/download/', views.backup_download, name='backup_download'),
+    path('backups/<int:pk>/verify/', views.backup_verify, name='backup_verify'),
     path('backups/upload/', views.backup_upload, name='backup_upload'),
     path('backups/upload/<int:database_id>/', views.backup_upload, name='backup_upload_for_database'),
 
+    # المهام الخلفية
+    path('jobs/<int:pk>/', views.backup_job_detail, name='backup_job_detail'),
+    path('jobs/<int:pk>/status/', views.backup_job_status, name='backup_job_status'),
+    path('jobs/<int:pk>/cancel/', views.backup_job_cancel, name='backup_job_cancel'),
+
     # جدولة النسخ الاحتياطية
     path('schedules/', views.schedule_list, name='schedule_list'),
     path('schedules/create/', views.schedule_create, name='schedule_create'),
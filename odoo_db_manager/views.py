@@ -3,21 +3,31 @@
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.http import HttpResponse, JsonResponse, FileResponse
+from django.http import HttpResponse, JsonResponse, FileResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.conf import settings
 from django.db.models import Q
 import os
+import base64
 import datetime
 import shutil
 
-from .models import Database, Backup, BackupSchedule
+from .models import Database, Backup, BackupJob, BackupSchedule
 from .services.database_service import DatabaseService
+from .services.database_discovery import ensure_databases_synced, get_discovered_databases, refresh_snapshot
 # تم إزالة BackupService لتجنب التضارب
 from .services.scheduled_backup_service import scheduled_backup_service
+from .services.parallel_backup import remove_backup_path
+from .services.backup_integrity import (
+    ENCODINGS, available_encodings, content_size, is_gzip_file, iter_backup_content, iter_encoded,
+    iter_file_range, parse_range, request_verification,
+)
+from .services.chunk_store import CHUNKED_SUFFIX, ChunkStore, ChunkStoreError, is_chunked_backup
+from .services.background_jobs import cancel_job, enqueue, get_worker, runs_in_process
 from .forms import BackupScheduleForm
 
 def is_staff_or_superuser(user):
@@ -28,6 +38,9 @@ def is_staff_or_superuser(user):
 @user_passes_test(is_staff_or_superuser)
 def dashboard(request):
     """عرض لوحة التحكم الرئيسية"""
+    # مزامنة قواعد البيانات عند الحاجة (لا تتم عند بدء التشغيل)
+    ensure_databases_synced()
+
     # الحصول على قواعد البيانات
     databases = Database.objects.all().order_by('-is_active', '-created_at')
 
@@ -64,6 +77,9 @@ def dashboard(request):
 @user_passes_test(is_staff_or_superuser)
 def database_list(request):
     """عرض قائمة قواعد البيانات"""
+    # مزامنة قواعد البيانات عند الحاجة (لا تتم عند بدء التشغيل)
+    ensure_databases_synced()
+
     # الحصول على قواعد البيانات
     databases = Database.objects.all().order_by('-is_active', '-created_at')
 
@@ -80,9 +96,8 @@ def database_discover(request):
     """اكتشاف قواعد البيانات الموجودة في PostgreSQL"""
     if request.method == 'POST':
         try:
-            # اكتشاف ومزامنة قواعد البيانات
-            database_service = DatabaseService()
-            database_service.sync_discovered_databases()
+            # اكتشاف ومزامنة قواعد البيانات الآن وتحديث لقطة الاكتشاف
+            refresh_snapshot(sync=True)
 
             messages.success(request, _('تم اكتشاف ومزامنة قواعد البيانات بنجاح.'))
         except Exception as e:
@@ -92,8 +107,7 @@ def database_discover(request):
 
     # عرض قواعد البيانات المكتشفة قبل المزامنة
     try:
-        database_service = DatabaseService()
-        discovered_dbs = database_service.discover_postgresql_databases()
+        discovered_dbs = get_discovered_databases()
 
         # التحقق من قواعد البيانات الموجودة في النظام
         existing_dbs = Database.objects.filter(db_type='postgresql').values_list('name', flat=True)
@@ -286,125 +300,19 @@ def backup_create(request, database_id=None):
         backup_type = request.POST.get('backup_type', 'full')
 
         try:
-            # طباعة معلومات تشخيصية
-            print(f"إنشاء نسخة احتياطية جديدة")
-            print(f"معرف قاعدة البيانات: {database_id}")
-            print(f"اسم النسخة الاحتياطية: {name}")
-            print(f"نوع النسخة الاحتياطية: {backup_type}")
-
-            # الحصول على قاعدة البيانات
             db = Database.objects.get(id=database_id)
-            print(f"معلومات قاعدة البيانات: {db.name}, {db.db_type}, {db.connection_info}")
-
-            # التأكد من وجود كلمة المرور الصحيحة
-            if db.db_type == 'postgresql' and (not db.connection_info.get('PASSWORD') or db.connection_info.get('PASSWORD') != '5525'):
-                # تحديث كلمة المرور
-                connection_info = db.connection_info
-                connection_info['PASSWORD'] = '5525'
-                db.connection_info = connection_info
-                db.save()
-                print(f"تم تحديث كلمة المرور لقاعدة البيانات: {db.name}")
-
-            # إنشاء نسخة احتياطية بسيطة عن طريق نسخ ملف قاعدة البيانات SQLite مباشرة
-            if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
-
-                # الحصول على مسار ملف قاعدة البيانات
-                db_file = settings.DATABASES['default']['NAME']
-                print(f"مسار ملف قاعدة البيانات: {db_file}")
-
-                # إنشاء اسم النسخة الاحتياطية إذا لم يتم توفيره
-                if not name:
-                    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                    name = f"{db.name}_{backup_type}_{timestamp}"
-
-                # إنشاء مجلد النسخ الاحتياطي إذا لم يكن موجود
-                backup_dir = os.path.join(settings.MEDIA_ROOT, 'backups')
-                os.makedirs(backup_dir, exist_ok=True)
-
-                # إنشاء مسار ملف النسخة الاحتياطية
-                backup_file = os.path.join(backup_dir, f"{name}.sqlite3")
-                print(f"مسار ملف النسخة الاحتياطية: {backup_file}")
-
-                # نسخ ملف قاعدة البيانات
-                shutil.copy2(db_file, backup_file)
-                print(f"تم نسخ ملف قاعدة البيانات بنجاح إلى: {backup_file}")
-
-                # إنشاء سجل النسخة الاحتياطية في قاعدة البيانات
-                backup = Backup.objects.create(
-                    name=name,
-                    database=db,
-                    backup_type=backup_type,
-                    file_path=backup_file,
-                    created_by=request.user
-                )
-                print(f"تم إنشاء سجل النسخة الاحتياطية بنجاح: {backup.id}")
-            else:
-                # إنشاء النسخة الاحتياطية لقاعدة بيانات PostgreSQL
-                if not name:
-                    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                    name = f"{db.name}_{backup_type}_{timestamp}"
-
-                # إنشاء مجلد النسخ الاحتياطي إذا لم يكن موجود
-                backup_dir = os.path.join(settings.MEDIA_ROOT, 'backups')
-                os.makedirs(backup_dir, exist_ok=True)
 
-                # إنشاء ملف JSON باستخدام Django dumpdata
-                backup_file = os.path.join(backup_dir, f"{name}.json")
-                print(f"🔄 إنشاء نسخة احتياطية JSON: {backup_file}")
-
-                try:
-                    # استخدام Django dumpdata لإنشاء النسخة الاحتياطية
-                    from django.core.management import call_command
-                    from io import StringIO
-
-                    # إنشاء buffer لحفظ البيانات
-                    output = StringIO()
-
-                    # تحديد التطبيقات المراد نسخها حسب نوع النسخة الاحتياطية
-                    if backup_type == 'customers':
-                        apps_to_backup = ['customers']
-                    elif backup_type == 'users':
-                        apps_to_backup = ['auth', 'accounts']
-                    elif backup_type == 'settings':
-                        apps_to_backup = ['odoo_db_manager']
-                    else:  # full
-                        apps_to_backup = ['customers', 'orders', 'inspections', 'inventory', 'installations', 'factory', 'accounts', 'odoo_db_manager']
-
-                    # تنفيذ dumpdata
-                    call_command('dumpdata', *apps_to_backup, stdout=output, format='json', indent=2)
-
-                    # حفظ البيانات في الملف
-                    with open(backup_file, 'w', encoding='utf-8') as f:
-                        f.write(output.getvalue())
-
-                    print(f"تم إنشاء ملف النسخة الاحتياطية: {backup_file}")
-                    print(f"حجم الملف: {os.path.getsize(backup_file)} بايت")
-
-                    # إنشاء سجل النسخة الاحتياطية في قاعدة البيانات
-                    backup = Backup.objects.create(
-                        name=name,
-                        database=db,
-                        backup_type=backup_type,
-                        file_path=backup_file,
-                        size=os.path.getsize(backup_file),
-                        created_by=request.user
-                    )
-                    print(f"تم إنشاء سجل النسخة الاحتياطية بنجاح: {backup.id}")
-
-                except Exception as backup_error:
-                    print(f"خطأ في إنشاء النسخة الاحتياطية: {str(backup_error)}")
-                    # في حالة الفشل، إنشاء سجل بدون ملف
-                    backup = Backup.objects.create(
-                        name=name,
-                        database=db,
-                        backup_type=backup_type,
-                        file_path="",
-                        created_by=request.user
-                    )
-                    raise backup_error
-
-            messages.success(request, _('تم إنشاء النسخة الاحتياطية بنجاح.'))
-            return redirect('odoo_db_manager:backup_detail', pk=backup.pk)
+            # النسخ يعمل في الخلفية ويُتابع من صفحة المهمة
+            job = enqueue(
+                'backup',
+                database=db,
+                params={'name': name, 'backup_type': backup_type},
+                user=request.user,
+            )
+            print(f"تمت إضافة مهمة نسخ احتياطي {job.pk} لقاعدة البيانات: {db.name} ({backup_type})")
+
+            messages.success(request, _('بدأ إنشاء النسخة الاحتياطية في الخلفية.'))
+            return redirect('odoo_db_manager:backup_job_detail', pk=job.pk)
         except Exception as e:
             messages.error(request, _(f'حدث خطأ أثناء إنشاء النسخة الاحتياطية: {str(e)}'))
             return redirect('odoo_db_manager:backup_create')
@@ -433,6 +341,7 @@ def backup_detail(request, pk):
 
     context = {
         'backup': backup,
+        'encodings': available_encodings(),
         'title': _('تفاصيل النسخة الاحتياطية'),
     }
 
@@ -445,107 +354,30 @@ def backup_restore(request, pk):
     # الحصول على النسخة الاحتياطية
     backup = get_object_or_404(Backup, pk=pk)
 
-    # حفظ معلومات النسخة الاحتياطية قبل استعادتها
-    backup_info = {
-        'id': backup.id,
-        'name': backup.name,
-        'database_id': backup.database.id,
-        'backup_type': backup.backup_type,
-        'file_path': backup.file_path,
-        'created_at': backup.created_at,
-        'created_by_id': backup.created_by.id if backup.created_by else None
-    }
-
     if request.method == 'POST':
-        # الحصول على خيار حذف البيانات القديمة
-        clear_data = request.POST.get('clear_data', 'off') == 'on'
-
         try:
             # التحقق من وجود الملف
             if not os.path.exists(backup.file_path):
                 raise FileNotFoundError(f"ملف النسخة الاحتياطية '{backup.file_path}' غير موجود")
 
-            # إذا كان ملف SQLite3، نقوم باستعادته مباشرة
-            if backup.file_path.endswith('.sqlite3'):
-                # الحصول على مسار ملف قاعدة البيانات الحالية
-                db_file = settings.DATABASES['default']['NAME']
-
-                # إنشاء نسخة احتياطية من قاعدة البيانات الحالية قبل الاستبدال
-                backup_current_db = f"{db_file}.bak"
-                shutil.copy2(db_file, backup_current_db)
-
-                try:
-                    # نسخ ملف النسخة الاحتياطية إلى مسار قاعدة البيانات الحالية
-                    shutil.copy2(backup.file_path, db_file)
-
-                    # إعادة إنشاء سجل النسخة الاحتياطية بعد استعادة قاعدة البيانات
-                    from accounts.models import User
-
-                    # الحصول على قاعدة البيانات
-                    try:
-                        db = Database.objects.get(id=backup_info['database_id'])
-                    except Database.DoesNotExist:
-                        # إذا لم تكن قاعدة البيانات موجودة، نستخدم أول قاعدة بيانات متاحة
-                        db = Database.objects.first()
-                        if not db:
-                            # إذا لم تكن هناك قواعد بيانات، نقوم بإنشاء واحدة
-                            db = Database.objects.create(
-                                name="Default Database",
-                                db_type="sqlite3",
-                                connection_info={}
-                            )
-
-                    # الحصول على المستخدم
-                    user_id = backup_info['created_by_id']
-                    user = None
-                    if user_id:
-                        try:
-                            user = User.objects.get(id=user_id)
-                        except User.DoesNotExist:
-                            # إذا لم يكن المستخدم موجودًا، نستخدم أول مستخدم متاح
-                            user = User.objects.first()
-
-                    # إعادة إنشاء سجل النسخة الاحتياطية
-                    try:
-                        Backup.objects.get(id=backup_info['id'])
-                    except Backup.DoesNotExist:
-                        Backup.objects.create(
-                            id=backup_info['id'],
-                            name=backup_info['name'],
-                            database=db,
-                            backup_type=backup_info['backup_type'],
-                            file_path=backup_info['file_path'],
-                            created_at=backup_info['created_at'],
-                            created_by=user
-                        )
-
-                    messages.success(request, _('تم استعادة النسخة الاحتياطية بنجاح.'))
-                except Exception as e:
-                    # استعادة النسخة الاحتياطية في حالة حدوث خطأ
-                    shutil.copy2(backup_current_db, db_file)
-                    raise RuntimeError(f"فشل استعادة قاعدة البيانات: {str(e)}")
-                finally:
-                    # حذف النسخة الاحتياطية المؤقتة
-                    if os.path.exists(backup_current_db):
-                        os.unlink(backup_current_db)
-            else:
-                # استعادة النسخة الاحتياطية بطريقة مبسطة
-                # تم إزالة BackupService لتجنب التعقيدات
-                if backup.file_path.endswith('.json'):
-                    _restore_json_simple(backup.file_path)
-                else:
-                    raise ValueError("نوع ملف غير مدعوم. يرجى استخدام ملفات JSON.")
-                messages.success(request, _('تم استعادة النسخة الاحتياطية بنجاح.'))
-
-            return redirect('odoo_db_manager:dashboard')
+            # الاستعادة تعمل في الخلفية وتُتابع من صفحة المهمة
+            job = enqueue(
+                'restore',
+                database=backup.database,
+                params={
+                    'backup_id': backup.pk,
+                    'file_name': os.path.basename(backup.file_path),
+                    # جداول محددة من نسخة متوازية (pg_restore --table)
+                    'tables': request.POST.getlist('tables'),
+                },
+                user=request.user,
+            )
+
+            messages.success(request, _('بدأت استعادة النسخة الاحتياطية في الخلفية.'))
+            return redirect('odoo_db_manager:backup_job_detail', pk=job.pk)
         except Exception as e:
             messages.error(request, _(f'حدث خطأ أثناء استعادة النسخة الاحتياطية: {str(e)}'))
-            try:
-                # محاولة الوصول إلى صفحة تفاصيل النسخة الاحتياطية
-                return redirect('odoo_db_manager:backup_detail', pk=backup.pk)
-            except:
-                # إذا لم يكن سجل النسخة الاحتياطية موجودًا، نعود إلى لوحة التحكم
-                return redirect('odoo_db_manager:dashboard')
+            return redirect('odoo_db_manager:backup_detail', pk=backup.pk)
 
     context = {
         'backup': backup,
@@ -564,13 +396,19 @@ def backup_delete(request, pk):
     if request.method == 'POST':
         try:
             # حذف النسخة الاحتياطية بطريقة مبسطة
-            # حذف الملف إذا كان موجوداً
-            if backup.file_path and os.path.exists(backup.file_path):
-                os.unlink(backup.file_path)
+            # حذف الملف (أو مجلد النسخة المتوازية) إذا كان موجوداً
+            remove_backup_path(backup.file_path)
 
             # حذف السجل من قاعدة البيانات
             backup.delete()
 
+            # حذف أجزاء مخزن النسخ التي لم تعد تشير إليها أي نسخة
+            if is_chunked_backup(backup.file_path):
+                try:
+                    ChunkStore().collect_garbage()
+                except ChunkStoreError as e:
+                    messages.warning(request, _(f'لم يتم تنظيف مخزن النسخ: {str(e)}'))
+
             messages.success(request, _('تم حذف النسخة الاحتياطية بنجاح.'))
             return redirect('odoo_db_manager:dashboard')
         except Exception as e:
@@ -587,7 +425,7 @@ def backup_delete(request, pk):
 @login_required
 @user_passes_test(is_staff_or_superuser)
 def backup_download(request, pk):
-    """تحميل ملف النسخة الاحتياطية"""
+    """تحميل ملف النسخة الاحتياطية مع دعم الاستكمال (Range) والتحقق (ETag) وإعادة الضغط"""
     # الحصول على النسخة الاحتياطية
     backup = get_object_or_404(Backup, pk=pk)
 
@@ -596,12 +434,103 @@ def backup_download(request, pk):
         messages.error(request, _('ملف النسخة الاحتياطية غير موجود.'))
         return redirect('odoo_db_manager:backup_detail', pk=backup.pk)
 
-    # إنشاء استجابة الملف
-    response = FileResponse(open(backup.file_path, 'rb'))
-    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(backup.file_path)}"'
+    encoding = request.GET.get('encoding', '')
+    if encoding and encoding not in available_encodings():
+        messages.error(request, _('صيغة الضغط المطلوبة غير متاحة.'))
+        return redirect('odoo_db_manager:backup_detail', pk=backup.pk)
+    # الملف المضغوط بـ gzip يُرسل كما هو بدلاً من ضغطه مرة أخرى
+    if encoding == 'gzip' and is_gzip_file(backup.file_path):
+        encoding = ''
+
+    checksum = backup.checksum
+    if checksum:
+        etag = f'"{checksum}-{encoding}"' if encoding else f'"{checksum}"'
+    else:
+        # نسخة قديمة بدون بصمة: تُحسب في الخلفية ويُرسل الملف الآن بدون ETag
+        request_verification(backup, request.user)
+        etag = None
+    if etag and etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    file_name = os.path.basename(os.path.normpath(backup.file_path))
+    if os.path.isdir(backup.file_path):
+        file_name += '.tar'
+    elif is_chunked_backup(backup.file_path):
+        file_name = file_name[:-len(CHUNKED_SUFFIX)] + '.ndjson'
+
+    # المحتوى المولد أثناء الإرسال (tar أو إعادة ضغط) لا يدعم التحميل الجزئي
+    if encoding or os.path.isdir(backup.file_path):
+        content = iter_backup_content(backup.file_path)
+        content_type = 'application/x-tar'
+        if encoding:
+            extension, content_type = ENCODINGS[encoding]
+            content = iter_encoded(content, encoding)
+            file_name += extension
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Accept-Ranges'] = 'none'
+    else:
+        size = content_size(backup.file_path)
+        byte_range = None
+        # If-Range: يُرسل الجزء فقط إذا لم يتغير الملف منذ بدء التحميل
+        if request.headers.get('Range') and request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(request.headers['Range'], size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                iter_file_range(backup.file_path, start, end),
+                status=206,
+                content_type='application/octet-stream',
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        elif is_chunked_backup(backup.file_path):
+            # نسخة في مخزن الأجزاء: يُعاد بناء محتواها (NDJSON) أثناء الإرسال
+            response = StreamingHttpResponse(
+                iter_backup_content(backup.file_path), content_type='application/octet-stream'
+            )
+            response['Content-Length'] = str(size)
+        else:
+            response = FileResponse(open(backup.file_path, 'rb'), content_type='application/octet-stream')
+            response['Content-Length'] = str(size)
+        response['Accept-Ranges'] = 'bytes'
+
+    if etag:
+        response['ETag'] = etag
+    if checksum and not encoding:
+        # بصمة المحتوى الكامل للتحقق بعد التحميل (sha256sum)
+        response['X-Checksum-SHA256'] = checksum
+        response['Digest'] = 'sha-256=' + base64.b64encode(bytes.fromhex(checksum)).decode()
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
 
     return response
 
+
+@login_required
+@user_passes_test(is_staff_or_superuser)
+def backup_verify(request, pk):
+    """التحقق من سلامة ملف النسخة الاحتياطية في الخلفية (مقارنة بصمة SHA-256 المحفوظة)"""
+    backup = get_object_or_404(Backup, pk=pk)
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'الطريقة غير مسموحة'}, status=405)
+    if not os.path.exists(backup.file_path):
+        return JsonResponse({'valid': False, 'error': 'ملف النسخة الاحتياطية غير موجود'}, status=404)
+
+    # النتيجة تُقرأ من حالة المهمة (result) عند انتهائها
+    job = request_verification(backup, request.user)
+    return JsonResponse({
+        'job_id': job.pk,
+        'status_url': reverse('odoo_db_manager:backup_job_status', args=[job.pk]),
+    }, status=202)
+
 @login_required
 @user_passes_test(is_staff_or_superuser)
 def backup_upload(request, database_id=None):
@@ -634,7 +563,6 @@ def backup_upload(request, database_id=None):
         clear_data = request.POST.get('clear_data', 'off') == 'on'
 
         try:
-            print("🚀 بدء عملية الاستعادة المباشرة...")
             print(f"📁 اسم الملف المرفوع: {uploaded_file.name}")
             print(f"📊 حجم الملف المرفوع: {uploaded_file.size} بايت")
 
@@ -644,84 +572,39 @@ def backup_upload(request, database_id=None):
 
             # إنشاء اسم ملف فريد
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_name = f"uploaded_{timestamp}_{uploaded_file.name}"
+            file_name = f"uploaded_{timestamp}_{os.path.basename(uploaded_file.name)}"
             file_path = os.path.join(backup_dir, file_name)
 
-            print(f"💾 حفظ الملف في: {file_path}")
-
-            # حفظ الملف
-            with open(file_path, 'wb') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
-
-            actual_size = os.path.getsize(file_path)
-            print(f"✅ تم حفظ الملف بنجاح - الحجم الفعلي: {actual_size} بايت")
-
-            # استعادة مباشرة
-            from django.core.management import call_command
+            # الملفات الكبيرة محفوظة مؤقتاً على القرص بالفعل فتُنقل بدلاً من نسخها
+            if hasattr(uploaded_file, 'temporary_file_path'):
+                shutil.move(uploaded_file.temporary_file_path(), file_path)
+            else:
+                with open(file_path, 'wb') as destination:
+                    for chunk in uploaded_file.chunks():
+                        destination.write(chunk)
+            print(f"💾 تم حفظ الملف في: {file_path}")
 
             if clear_data:
                 print("⚠️ تم تجاهل خيار حذف البيانات القديمة لتجنب مشاكل قاعدة البيانات")
 
-            # استعادة مبسطة جداً
-            print(f"🔄 بدء استعادة الملف: {file_path}")
-
-            # التحقق من نوع الملف
-            if uploaded_file.name.endswith('.gz'):
-                print("📦 ملف مضغوط - فك الضغط...")
-                import gzip
-                import tempfile
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.json') as temp_file:
-                    temp_path = temp_file.name
-
-                    try:
-                        print(f"🔓 فك ضغط من: {file_path}")
-                        with gzip.open(file_path, 'rt', encoding='utf-8') as gz_file:
-                            content = gz_file.read()
-
-                        print(f"📝 كتابة المحتوى المفكوك إلى: {temp_path}")
-                        with open(temp_path, 'w', encoding='utf-8') as json_file:
-                            json_file.write(content)
-
-                        temp_size = os.path.getsize(temp_path)
-                        print(f"✅ تم فك الضغط بنجاح - حجم الملف المفكوك: {temp_size} بايت")
-
-                        # استعادة من الملف المفكوك
-                        print("🔄 استعادة البيانات من الملف المفكوك...")
-                        _restore_json_simple(temp_path)
-
-                    except Exception as gz_error:
-                        print(f"❌ خطأ في فك الضغط: {str(gz_error)}")
-                        raise
-                    finally:
-                        # حذف الملف المؤقت
-                        if os.path.exists(temp_path):
-                            os.unlink(temp_path)
-                            print(f"🗑️ تم حذف الملف المؤقت: {temp_path}")
-            else:
-                print("📄 ملف JSON عادي - استعادة مباشرة...")
-                _restore_json_simple(file_path)
-
-            print("🎉 تمت الاستعادة بنجاح!")
-
-            messages.success(request, _('تم استعادة النسخة الاحتياطية بنجاح.'))
-            return redirect('odoo_db_manager:database_detail', pk=database_id)
+            # الاستعادة تعمل في الخلفية وتُتابع من صفحة المهمة
+            job = enqueue(
+                'upload_restore',
+                database=Database.objects.get(pk=database_id),
+                params={
+                    'file_path': file_path,
+                    'file_name': uploaded_file.name,
+                    'backup_type': backup_type,
+                },
+                user=request.user,
+                progress_total=os.path.getsize(file_path),
+            )
+
+            messages.success(request, _('تم رفع الملف وبدأت الاستعادة في الخلفية.'))
+            return redirect('odoo_db_manager:backup_job_detail', pk=job.pk)
         except Exception as e:
-            error_message = str(e)
-            print(f"خطأ في الاستعادة: {error_message}")
-
-            # رسالة خطأ مبسطة
-            if "flush" in error_message:
-                error_message = "مشكلة في إعدادات قاعدة البيانات. تم تجاهل حذف البيانات القديمة."
-            elif "JSON" in error_message or "fixture" in error_message:
-                error_message = "مشكلة في تنسيق الملف. تأكد من أن الملف بتنسيق JSON صالح."
-            elif "فشل تثبيت البيانات من الملف المضغوط" in error_message:
-                error_message = "مشكلة في الملف المضغوط. جرب ملف JSON غير مضغوط."
-            else:
-                error_message = f"خطأ في الاستعادة: {error_message[:200]}..."
-
-            messages.error(request, _(f'حدث خطأ أثناء استعادة النسخة الاحتياطية: {error_message}'))
+            print(f"خطأ في رفع الملف: {str(e)}")
+            messages.error(request, _(f'حدث خطأ أثناء رفع ملف النسخة الاحتياطية: {str(e)[:200]}'))
             return redirect('odoo_db_manager:backup_upload')
 
     # الحصول على قواعد البيانات
@@ -737,6 +620,61 @@ def backup_upload(request, database_id=None):
     return render(request, 'odoo_db_manager/backup_upload.html', context)
 
 
+@login_required
+@user_passes_test(is_staff_or_superuser)
+def backup_job_detail(request, pk):
+    """عرض تقدم مهمة خلفية"""
+    job = get_object_or_404(BackupJob.objects.select_related('database'), pk=pk)
+
+    # مهمة منتظرة من قبل إعادة تشغيل الخادم: التأكد من وجود عامل يحجزها
+    if job.status == 'pending' and runs_in_process():
+        get_worker().wake()
+
+    context = {
+        'job': job,
+        'title': _('تقدم المهمة'),
+    }
+
+    return render(request, 'odoo_db_manager/backup_job_detail.html', context)
+
+
+@login_required
+@user_passes_test(is_staff_or_superuser)
+def backup_job_status(request, pk):
+    """حالة المهمة الخلفية بصيغة JSON (للاستعلام الدوري من الصفحة)"""
+    job = get_object_or_404(BackupJob, pk=pk)
+
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': str(job.get_status_display()),
+        'percent': job.percent,
+        'progress_current': job.progress_current,
+        'progress_total': job.progress_total,
+        'message': job.message,
+        'eta_seconds': job.eta_seconds,
+        'cancel_requested': job.cancel_requested,
+        'result': job.result,
+        'error': job.error,
+        'finished': job.is_finished,
+    })
+
+
+@login_required
+@user_passes_test(is_staff_or_superuser)
+def backup_job_cancel(request, pk):
+    """إلغاء مهمة خلفية منتظرة أو قيد التنفيذ"""
+    job = get_object_or_404(BackupJob, pk=pk)
+
+    if request.method == 'POST':
+        if cancel_job(job):
+            messages.success(request, _('تم طلب إلغاء المهمة.'))
+        else:
+            messages.error(request, _('لا يمكن إلغاء مهمة منتهية.'))
+
+    return redirect('odoo_db_manager:backup_job_detail', pk=job.pk)
+
+
 @login_required
 @user_passes_test(is_staff_or_superuser)
 def schedule_list(request):
@@ -871,8 +809,7 @@ def schedule_delete(request, pk):
                 )
                 for backup in backups:
                     # حذف ملف النسخة الاحتياطية
-                    if os.path.exists(backup.file_path):
-                        os.unlink(backup.file_path)
+                    remove_backup_path(backup.file_path)
                     # حذف سجل النسخة الاحتياطية
                     backup.delete()
 
@@ -929,56 +866,13 @@ def schedule_run_now(request, pk):
     schedule = get_object_or_404(BackupSchedule, pk=pk)
 
     try:
-        # تشغيل الجدولة الآن
-        backup = scheduled_backup_service.run_job_now(schedule.id)
-        if backup:
-            messages.success(request, _('تم إنشاء النسخة الاحتياطية بنجاح.'))
-        else:
-            messages.error(request, _('فشل إنشاء النسخة الاحتياطية.'))
+        # إضافة الجدولة إلى قائمة المهام الخلفية الآن
+        job = scheduled_backup_service.run_job_now(schedule.id)
+        if job:
+            messages.success(request, _('بدأ إنشاء النسخة الاحتياطية في الخلفية.'))
+            return redirect('odoo_db_manager:backup_job_detail', pk=job.pk)
+        messages.error(request, _('فشل إنشاء النسخة الاحتياطية.'))
     except Exception as e:
         messages.error(request, _(f'حدث خطأ أثناء إنشاء النسخة الاحتياطية: {str(e)}'))
 
     return redirect('odoo_db_manager:schedule_detail', pk=schedule.pk)
-
-
-def _restore_json_simple(file_path):
-    """استعادة ملف JSON بطريقة مبسطة"""
-    import json
-    from django.core import serializers
-
-    try:
-        print(f"📖 قراءة ملف JSON: {file_path}")
-
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        print(f"✅ تم تحميل {len(data)} عنصر من الملف")
-
-        # استعادة البيانات عنصر بعنصر مع تجاهل الأخطاء
-        success_count = 0
-        error_count = 0
-
-        print("🔄 بدء استعادة العناصر...")
-
-        for i, item in enumerate(data):
-            try:
-                # تحويل العنصر إلى كائن Django
-                for obj in serializers.deserialize('json', json.dumps([item])):
-                    obj.save()
-                success_count += 1
-
-                # طباعة تقدم كل 10 عناصر
-                if (i + 1) % 10 == 0:
-                    print(f"📊 تم معالجة {i + 1} عنصر...")
-
-            except Exception as item_error:
-                error_count += 1
-                # طباعة تفاصيل الخطأ للعناصر القليلة الأولى فقط
-                if error_count <= 3:
-                    print(f"⚠️ خطأ في العنصر {i + 1}: {str(item_error)[:100]}...")
-
-        print(f"🎯 تمت الاستعادة: {success_count} عنصر بنجاح، {error_count} عنصر تم تجاهله")
-
-    except Exception as e:
-        print(f"❌ خطأ في قراءة الملف: {str(e)}")
-        raise
\ No newline at end of file
@@ -7,6 +7,7 @@ from django.utils import timezone
 from customers.models import Customer
 from inventory.models import Product
 from accounts.models import Salesperson
+from accounts.services.sequences import highest_sequence, next_value
 from accounts.utils import send_notification
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -136,29 +137,14 @@ class Order(models.Model):
 
             # تحقق من وجود رقم طلب
             if not self.order_number:
-                # Get the last order number for this customer
-                try:
-                    last_order = Order.objects.filter(
-                        customer=self.customer
-                    ).order_by('-order_number').first()
-
-                    if last_order:
-                        # Extract the number part and increment it
-                        try:
-                            last_num = int(last_order.order_number.split('-')[-1])
-                            next_num = last_num + 1
-                        except ValueError:
-                            next_num = 1
-                    else:
-                        next_num = 1
-
-                    # Generate new order number
-                    self.order_number = f"{self.customer.code}-{next_num:04d}"
-                except Exception as e:
-                    print(f"Error generating order number: {e}")
-                    # Use a fallback order number if we can't generate one
-                    import uuid
-                    self.order_number = f"ORD-{str(uuid.uuid4())[:8]}"
+                # الرقم التالي من عداد العميل (بدلاً من البحث عن آخر رقم طلب)
+                next_num = next_value(
+                    f'orders.order_number:{self.customer_id}',
+                    initial=lambda: highest_sequence(
+                        Order.objects.filter(customer_id=self.customer_id).values_list('order_number', flat=True)
+                    ),
+                )
+                self.order_number = f"{self.customer.code}-{next_num:04d}"
 
             # Validate selected types
             selected_types = self.selected_types or []
@@ -203,6 +189,11 @@ class Order(models.Model):
                     print(f"Error calculating final price: {e}")
                     self.final_price = 0
 
+            # الحفظ الجزئي (update_fields) يحدّث updated_at أيضاً حتى تلتقط النسخ التزايدية التغيير
+            update_fields = kwargs.get('update_fields')
+            if update_fields:
+                kwargs['update_fields'] = {*update_fields, 'updated_at'}
+
             # حفظ الطلب أولاً للحصول على مفتاح أساسي
             super().save(*args, **kwargs)
 
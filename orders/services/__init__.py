@@ -3,4 +3,6 @@
 توفر هذه الحزمة خدمات مختلفة لإدارة الطلبات
 """
 
-__all__ = []
+from .order_service import OrderBuilder, OrderService
+
+__all__ = ['OrderBuilder', 'OrderService']
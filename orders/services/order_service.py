@@ -3,14 +3,88 @@
 توفر هذه الوحدة خدمات لإدارة الطلبات
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import Q, Count, F, Sum, ExpressionWrapper, DecimalField
 from django.db.models.query import QuerySet
 from django.utils import timezone
 from datetime import timedelta
 
 from crm.services import BaseService
-from .models import Order, OrderItem, Payment
+from orders.models import Order, OrderItem, Payment
+
+BULK_BATCH_SIZE = 500
+
+
+class OrderBuilder:
+    """
+    بناء عناصر ودفعات الطلب دفعة واحدة
+    العناصر والدفعات تُجمع في الذاكرة وتُدخل بـ bulk_create عند الخروج من السياق، ثم يُحسب
+    السعر النهائي والمبلغ المدفوع مرة واحدة بدلاً من إعادة حسابهما وحفظ الطلب مع كل صف
+
+    مثال:
+        with OrderService.build(order) as builder:
+            builder.add_item(product=product, quantity=2, unit_price=50)
+            builder.add_payment(amount=100, payment_method='cash')
+    """
+
+    def __init__(self, order: Order):
+        if not order.pk:
+            raise ValidationError('يجب حفظ الطلب أولاً قبل إنشاء عنصر الطلب')
+        self.order = order
+        self.items: List[OrderItem] = []
+        self.payments: List[Payment] = []
+
+    def __enter__(self) -> 'OrderBuilder':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # عند حدوث خطأ داخل السياق لا يُحفظ شيء
+        if exc_type is None:
+            self.save()
+        return False
+
+    def add_item(self, item: OrderItem = None, **fields) -> OrderItem:
+        """
+        إضافة عنصر (كائن OrderItem غير محفوظ أو حقوله)
+        """
+        item = item or OrderItem(**fields)
+        item.order = self.order
+        self.items.append(item)
+        return item
+
+    def add_payment(self, payment: Payment = None, **fields) -> Payment:
+        """
+        إضافة دفعة (كائن Payment غير محفوظ أو حقوله)
+        """
+        payment = payment or Payment(**fields)
+        payment.order = self.order
+        self.payments.append(payment)
+        return payment
+
+    def save(self) -> Order:
+        """
+        إدخال العناصر والدفعات المجمعة وتحديث إجماليات الطلب في معاملة واحدة
+        """
+        if not self.items and not self.payments:
+            return self.order
+
+        with transaction.atomic():
+            if self.items:
+                OrderItem.objects.bulk_create(self.items, batch_size=BULK_BATCH_SIZE)
+            if self.payments:
+                Payment.objects.bulk_create(self.payments, batch_size=BULK_BATCH_SIZE)
+            OrderService.recalculate_totals(
+                self.order,
+                final_price=bool(self.items),
+                paid_amount=bool(self.payments),
+            )
+
+        self.items = []
+        self.payments = []
+        return self.order
+
 
 class OrderService(BaseService[Order]):
     """
@@ -149,6 +223,50 @@ class OrderService(BaseService[Order]):
 
         return float(total)
 
+    @classmethod
+    def build(cls, order: Order) -> OrderBuilder:
+        """
+        سياق لبناء عناصر ودفعات الطلب دفعة واحدة (انظر OrderBuilder)
+        """
+        return OrderBuilder(order)
+
+    @classmethod
+    def bulk_add(cls, order: Order, items: Iterable[Dict[str, Any]] = (), payments: Iterable[Dict[str, Any]] = ()) -> Order:
+        """
+        إضافة عناصر ودفعات للطلب دفعة واحدة
+
+        Args:
+            order: الطلب (يجب أن يكون محفوظاً)
+            items: حقول العناصر (product، quantity، unit_price، ...)
+            payments: حقول الدفعات (amount، payment_method، ...)
+
+        Returns:
+            الطلب بعد تحديث السعر النهائي والمبلغ المدفوع
+        """
+        with cls.build(order) as builder:
+            for fields in items:
+                builder.add_item(**fields)
+            for fields in payments:
+                builder.add_payment(**fields)
+        return order
+
+    @classmethod
+    def recalculate_totals(cls, order: Order, final_price: bool = True, paid_amount: bool = True) -> Order:
+        """
+        إعادة حساب السعر النهائي والمبلغ المدفوع للطلب وحفظهما بعملية حفظ واحدة
+        (نفس النتيجة التي يصل إليها حفظ العناصر والدفعات واحداً تلو الآخر)
+        """
+        update_fields = []
+        if final_price:
+            order.calculate_final_price()
+            update_fields.append('final_price')
+        if paid_amount:
+            order.paid_amount = order.payments.aggregate(total=Sum('amount'))['total'] or 0
+            update_fields.append('paid_amount')
+        if update_fields:
+            order.save(update_fields=update_fields)
+        return order
+
     @classmethod
     def add_payment(cls, order_id: int, amount: float, payment_method: str, reference_number: str = None, created_by_id: int = None) -> Optional[Payment]:
         """
@@ -177,12 +295,9 @@ class OrderService(BaseService[Order]):
             created_by_id=created_by_id
         )
 
+        # حفظ الدفعة يحدّث المبلغ المدفوع في الطلب
         payment.save()
 
-        # تحديث المبلغ المدفوع في الطلب
-        order.paid_amount = order.paid_amount + amount
-        order.save(update_fields=['paid_amount'])
-
         return payment
 
     @classmethod
@@ -209,7 +324,7 @@ class OrderService(BaseService[Order]):
         order.save(update_fields=['tracking_status'])
 
         # إنشاء سجل لتغيير الحالة
-        from .models import OrderStatusLog
+        from orders.models import OrderStatusLog
         OrderStatusLog.objects.create(
             order=order,
             old_status=old_status,
@@ -0,0 +1,148 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Branch
+from customers.models import Customer
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem, Payment
+from odoo_db_manager.services.incremental_backup import IncrementalBackupWriter
+from orders.services import OrderService
+
+
+class OrderBuilderTests(TestCase):
+    """
+    بناء الطلب دفعة واحدة يعطي نفس نتيجة حفظ العناصر والدفعات واحداً تلو الآخر
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        branch = Branch.objects.create(code='001', name='الفرع الرئيسي')
+        cls.customer = Customer.objects.create(branch=branch, name='عميل', phone='0100', address='-')
+        category = Category.objects.create(name='أقمشة')
+        products = [
+            Product.objects.create(name=f'منتج {i}', code=f'P{i}', category=category, price=10 + i)
+            for i in range(40)
+        ]
+        cls.lines = [
+            {'product': product, 'quantity': i + 1, 'unit_price': Decimal('10.25') + i}
+            for i, product in enumerate(products)
+        ]
+        cls.payments = [
+            {'amount': Decimal('100.50'), 'payment_method': 'cash'},
+            {'amount': Decimal('20.00'), 'payment_method': 'check', 'reference_number': 'CHK-1'},
+        ]
+
+    def create_order(self):
+        return Order.objects.create(customer=self.customer, selected_types=['inspection'])
+
+    def build_per_row(self):
+        order = self.create_order()
+        for line in self.lines:
+            OrderItem(order=order, **line).save()
+        for payment in self.payments:
+            Payment(order=order, **payment).save()
+        order.refresh_from_db()
+        return order
+
+    def assert_same_order(self, order, expected):
+        order.refresh_from_db()
+        self.assertEqual(order.final_price, expected.final_price)
+        self.assertEqual(order.paid_amount, expected.paid_amount)
+        self.assertEqual(order.items.count(), expected.items.count())
+        self.assertEqual(order.payments.count(), expected.payments.count())
+
+    def test_builder_matches_per_row_path(self):
+        expected = self.build_per_row()
+
+        order = self.create_order()
+        with OrderService.build(order) as builder:
+            for line in self.lines:
+                builder.add_item(**line)
+            for payment in self.payments:
+                builder.add_payment(**payment)
+
+        self.assert_same_order(order, expected)
+        self.assertEqual(order.final_price, sum(line['quantity'] * line['unit_price'] for line in self.lines))
+        self.assertEqual(order.paid_amount, Decimal('120.50'))
+
+    def test_bulk_add_matches_per_row_path(self):
+        expected = self.build_per_row()
+
+        order = OrderService.bulk_add(self.create_order(), self.lines, self.payments)
+
+        self.assert_same_order(order, expected)
+
+    def test_builder_uses_constant_number_of_queries(self):
+        order = self.create_order()
+        with self.assertNumQueries(9):
+            OrderService.bulk_add(order, self.lines, self.payments)
+
+    def test_exception_inside_builder_writes_nothing(self):
+        order = self.create_order()
+        final_price, paid_amount = order.final_price, order.paid_amount
+
+        with self.assertRaises(RuntimeError):
+            with OrderService.build(order) as builder:
+                for line in self.lines:
+                    builder.add_item(**line)
+                builder.add_payment(**self.payments[0])
+                raise RuntimeError('فشل أثناء بناء الطلب')
+
+        order.refresh_from_db()
+        self.assertFalse(order.items.exists())
+        self.assertFalse(order.payments.exists())
+        self.assertEqual(order.final_price, final_price)
+        self.assertEqual(order.paid_amount, paid_amount)
+
+    def test_unsaved_order_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            OrderService.build(Order(customer=self.customer))
+
+
+class OrderChangeTrackingTests(TestCase):
+    """
+    التحديثات الجزئية للطلب (update_fields) تحدّث updated_at فتلتقطها النسخ التزايدية
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        branch = Branch.objects.create(code='001', name='الفرع الرئيسي')
+        customer = Customer.objects.create(branch=branch, name='عميل', phone='0100', address='-')
+        category = Category.objects.create(name='أقمشة')
+        cls.product = Product.objects.create(name='منتج', code='P1', category=category, price=10)
+        cls.order = Order.objects.create(customer=customer, selected_types=['inspection'])
+
+    def setUp(self):
+        self.since = timezone.now() - timedelta(hours=1)
+        Order.objects.filter(pk=self.order.pk).update(updated_at=self.since - timedelta(hours=1))
+        self.order.refresh_from_db()
+
+    def assert_in_incremental_backup(self):
+        writer = IncrementalBackupWriter(None, since=self.since, until=timezone.now())
+        self.assertIn(self.order.pk, writer.get_queryset(Order).values_list('pk', flat=True))
+
+    def test_unchanged_order_is_not_in_incremental_backup(self):
+        writer = IncrementalBackupWriter(None, since=self.since, until=timezone.now())
+        self.assertFalse(writer.get_queryset(Order).filter(pk=self.order.pk).exists())
+
+    def test_item_save_marks_order_changed(self):
+        OrderItem(order=self.order, product=self.product, quantity=2, unit_price=Decimal('5')).save()
+        self.assert_in_incremental_backup()
+
+    def test_payment_save_marks_order_changed(self):
+        Payment(order=self.order, amount=Decimal('5'), payment_method='cash').save()
+        self.assert_in_incremental_backup()
+
+    def test_status_update_marks_order_changed(self):
+        # نفس الحفظ الجزئي الذي يقوم به OrderService.update_order_status
+        self.order.tracking_status = 'processing'
+        self.order.save(update_fields=['tracking_status'])
+        self.assert_in_incremental_backup()
+
+    def test_recalculate_totals_marks_order_changed(self):
+        OrderService.recalculate_totals(self.order)
+        self.assert_in_incremental_backup()
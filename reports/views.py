@@ -227,14 +227,16 @@ class ReportDetailView(LoginRequiredMixin, DetailView):
 
     def generate_inventory_report(self, report):
         """Generate inventory report data"""
-        products = Product.objects.all()
+        products = Product.objects.select_related('category', 'stock_balance').with_stock_level()
 
         # Get all products first
         all_products = list(products)
 
         data = {
             'total_items': len(all_products),
-            'total_value': sum(product.current_stock * product.price for product in all_products),
+            'total_value': products.aggregate(
+                total=Sum(F('current_stock_calc') * F('price'))
+            )['total'] or 0,
             'low_stock_items': [product for product in all_products if product.needs_restock],
             'out_of_stock_items': [product for product in all_products if product.current_stock == 0],
             'items': all_products